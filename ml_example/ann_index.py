@@ -0,0 +1,297 @@
+"""
+Recuperación aproximada (ANN) de roadmaps parecidos a un perfil de usuario
+La similitud exacta recorre las filas de cada tag del usuario, que con tags
+populares son casi todo el catálogo. Este índice devuelve en tiempo sublineal
+unos mil candidatos, y la similitud exacta solo se calcula sobre ellos.
+
+- Embedding: TF-IDF sobre los tags (y, con menos peso, las palabras del nombre)
+  de cada roadmap, reducido con SVD aleatorizada y normalizado (coseno).
+- Índice IVF: k-means esférico divide el catálogo en ~sqrt(N) listas de
+  roadmaps parecidos entre sí. order_by() ordena cada lista por un score
+  (p. ej. final_score), y una consulta toma las primeras filas de las listas
+  cuyo centroide es más cercano al perfil: los mejores roadmaps de cada grupo
+  parecido, no solo los más parecidos.
+
+Todo es NumPy/SciPy (sin scikit-learn). El índice se guarda en
+ml_example/models/ann_<clave>/ (una .npy por array, abiertas con memory-map);
+la clave depende de ids, nombres y tags del catálogo y de los parámetros.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from recommender_common import remove_old_artifacts, save_directory
+
+# Subir cuando cambie el embedding o el formato del índice
+ANN_VERSION = 1
+
+# Dimensiones del embedding (SVD)
+ANN_DIM = 32
+
+# Peso de las palabras del nombre frente a los tags
+NAME_WEIGHT = 0.5
+
+# Filas que se toman de cada lista recorrida
+ANN_PER_LIST = 4
+
+ANN_ARRAYS = ['centroids', 'list_rows', 'list_offsets', 'components']
+
+
+def _normalize_rows(matrix):
+    """Normalizar filas a norma 1 (las filas nulas quedan en 0)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def randomized_svd_components(X, n_components, n_oversamples=10, n_iter=4, seed=0):
+    """
+    Componentes principales (filas de Vt) de una matriz dispersa con SVD aleatorizada
+
+    Returns:
+        np.ndarray: (n_components, n_columnas)
+    """
+    rng = np.random.default_rng(seed)
+    n_random = min(n_components + n_oversamples, X.shape[1])
+
+    Q = X @ rng.standard_normal((X.shape[1], n_random))
+    for _ in range(n_iter):
+        Q, _ = np.linalg.qr(Q)
+        Q = X @ (X.T @ Q)
+    Q, _ = np.linalg.qr(Q)
+
+    B = np.asarray((X.T @ Q).T)
+    _, _, vt = np.linalg.svd(B, full_matrices=False)
+    return vt[:n_components]
+
+
+def spherical_kmeans(X, n_clusters, n_iter=10, sample_size=100000, seed=0, batch_rows=65536):
+    """
+    k-means sobre vectores normalizados (similitud coseno)
+
+    Se entrena con una muestra y después se asigna todo el catálogo por bloques.
+
+    Returns:
+        tuple: (centroides normalizados, lista asignada a cada fila)
+    """
+    rng = np.random.default_rng(seed)
+    sample = X[rng.choice(len(X), size=min(len(X), sample_size), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        # Las listas vacías conservan su centroide
+        empty = counts == 0
+        sums[empty] = centroids[empty]
+        centroids = _normalize_rows(sums)
+
+    labels = np.empty(len(X), dtype=np.int64)
+    for start in range(0, len(X), batch_rows):
+        labels[start:start + batch_rows] = np.argmax(X[start:start + batch_rows] @ centroids.T, axis=1)
+
+    return centroids, labels
+
+
+def _name_tokens(names, n_rows):
+    """Matriz dispersa fila x palabra del nombre (1 si el nombre la contiene)"""
+    tokens = (
+        pd.Series(np.asarray(names, dtype=object), index=np.arange(n_rows))
+        .fillna('')
+        .astype(str)
+        .str.lower()
+        .str.findall(r'\w+')
+        .explode()
+        .dropna()
+    )
+    tokens = tokens[tokens.str.len() > 1]
+    pairs = pd.DataFrame({'row': tokens.index.values.astype(np.int64), 'token': tokens.values}).drop_duplicates()
+    codes, vocabulary = pd.factorize(pairs['token'], sort=True)
+
+    return sparse.csr_matrix(
+        (np.ones(len(pairs)), (pairs['row'].values, codes)),
+        shape=(n_rows, len(vocabulary))
+    )
+
+
+class AnnIndex:
+    """Índice IVF sobre embeddings de roadmaps para buscar por perfil de tags"""
+
+    def __init__(self, tag_vocabulary, centroids, list_rows, list_offsets, components):
+        self.tag_vocabulary = list(tag_vocabulary)
+        self._tag_ids = {tag: i for i, tag in enumerate(self.tag_vocabulary)}
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+        self.components = components
+
+    @property
+    def n_rows(self):
+        return len(self.list_rows)
+
+    @classmethod
+    def build(cls, tag_index, names, dim=ANN_DIM, n_lists=None, seed=0):
+        """
+        Construir el índice a partir del índice de tags y los nombres
+
+        Args:
+            tag_index: TagIndex del catálogo (su incidencia roadmap x tag)
+            names: Nombres de los roadmaps (mismo orden)
+            n_lists: Listas del IVF (por defecto ~sqrt(N))
+        """
+        n_rows = tag_index.n_rows
+        counts = sparse.hstack([
+            tag_index.incidence,
+            _name_tokens(names, n_rows) * NAME_WEIGHT
+        ]).tocsr()
+
+        # TF-IDF (idf suavizado) con filas normalizadas
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1 + n_rows) / (1 + document_frequency)) + 1
+        tfidf = counts @ sparse.diags(idf)
+        row_norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        tfidf = sparse.diags(np.divide(1.0, row_norms, out=np.zeros(n_rows), where=row_norms > 0)) @ tfidf
+
+        dim = max(1, min(dim, tfidf.shape[1] - 1, n_rows - 1))
+        components = randomized_svd_components(tfidf.tocsr(), dim, seed=seed)
+        embeddings = _normalize_rows(np.asarray(tfidf @ components.T)).astype(np.float32)
+
+        if n_lists is None:
+            n_lists = int(np.sqrt(n_rows))
+        n_lists = max(1, min(n_lists, n_rows))
+        centroids, labels = spherical_kmeans(embeddings, n_lists, seed=seed)
+
+        # Listas contiguas (formato CSR): filas de la lista i en list_rows[offsets[i]:offsets[i+1]]
+        list_rows = np.argsort(labels, kind='stable')
+        list_offsets = np.searchsorted(labels[list_rows], np.arange(n_lists + 1))
+
+        return cls(
+            tag_index.vocabulary, centroids.astype(np.float32),
+            list_rows, list_offsets, components
+        )
+
+    def query_vector(self, user_tags):
+        """Embedding normalizado de un conjunto de tags (None si ninguno es conocido)"""
+        tag_ids = [self._tag_ids[tag] for tag in user_tags if tag in self._tag_ids]
+        if not tag_ids:
+            return None
+
+        # Sin idf: la similitud exacta cuenta tags compartidos sin pesos, y
+        # los tags populares del perfil son los que más roadmaps cubren
+        vector = self.components[:, np.asarray(tag_ids, dtype=np.int64)].sum(axis=1)
+        norm = np.linalg.norm(vector)
+        return (vector / norm).astype(np.float32) if norm > 0 else None
+
+    def order_by(self, scores):
+        """
+        Copia del índice con cada lista ordenada por `scores` (de mayor a menor)
+
+        Los arrays grandes se comparten; solo list_rows se copia.
+        """
+        list_ids = np.repeat(np.arange(len(self.list_offsets) - 1), np.diff(self.list_offsets))
+        rows = np.asarray(self.list_rows)
+        order = np.lexsort((-np.asarray(scores)[rows], list_ids))
+
+        return AnnIndex(
+            self.tag_vocabulary, self.centroids,
+            rows[order], self.list_offsets, self.components
+        )
+
+    def search(self, user_tags, k=1000, per_list=ANN_PER_LIST):
+        """
+        Candidatos para un perfil de tags
+
+        Se recorren las ceil(k / per_list) listas de centroide más cercano y de
+        cada una se toman sus primeras `per_list` filas (las de mayor score si
+        el índice se ordenó con order_by).
+
+        Returns:
+            np.ndarray: Hasta k posiciones, ordenadas de menor a mayor
+        """
+        query = self.query_vector(user_tags)
+        if query is None or k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        n_lists = len(self.list_offsets) - 1
+        n_probes = min(n_lists, -(-k // per_list))
+        closeness = self.centroids @ query
+        probes = np.argpartition(-closeness, n_probes - 1)[:n_probes] if n_probes < n_lists else np.arange(n_lists)
+
+        starts = self.list_offsets[probes]
+        ends = np.minimum(starts + per_list, self.list_offsets[probes + 1])
+        candidates = np.concatenate([self.list_rows[start:end] for start, end in zip(starts, ends)])
+
+        return np.sort(candidates)
+
+    def save(self, path):
+        """Guardar en un directorio (ver save_directory)"""
+        def write(tmp_path):
+            for name in ANN_ARRAYS:
+                np.save(os.path.join(tmp_path, f'{name}.npy'), getattr(self, name))
+            with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'version': ANN_VERSION, 'tag_vocabulary': self.tag_vocabulary}, f, ensure_ascii=False)
+
+        return save_directory(path, write)
+
+    @classmethod
+    def load(cls, path):
+        """Cargar un índice guardado con save() (arrays con memory-map)"""
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != ANN_VERSION:
+            raise ValueError(f"Versión de índice ANN no soportada: {meta.get('version')}")
+
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ANN_ARRAYS}
+        return cls(meta['tag_vocabulary'], **arrays)
+
+
+def ann_index_key(df, dim=ANN_DIM, n_lists=None, tag_index=None):
+    """
+    Clave del índice: ids, nombres y tags del catálogo + parámetros
+
+    En un catálogo compacto (sin columna 'tags') se usan los arrays del texto
+    de los tags guardados en `tag_index`.
+    """
+    digest = hashlib.sha1(f'{ANN_VERSION}:{dim}:{n_lists}'.encode('utf-8'))
+    columns = [col for col in ('roadmap_id', 'name', 'tags') if col in df.columns]
+    digest.update(pd.util.hash_pandas_object(df[columns], index=False).values.tobytes())
+    if 'tags' not in df.columns:
+        digest.update(json.dumps(tag_index.text_tokens, ensure_ascii=False).encode('utf-8'))
+        for values in tag_index.text_arrays():
+            digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()[:20]
+
+
+def load_or_build_ann_index(df, tag_index, path='ml_example/models/', dim=ANN_DIM, n_lists=None, keep_last=3):
+    """
+    Cargar el índice ANN del catálogo, o construirlo y guardarlo
+
+    Si no se puede escribir el directorio, el índice se usa solo en memoria.
+    """
+    index_path = os.path.join(path, f'ann_{ann_index_key(df, dim, n_lists, tag_index)}')
+
+    if os.path.isdir(index_path):
+        try:
+            index = AnnIndex.load(index_path)
+            if index.n_rows == len(df):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = AnnIndex.build(tag_index, df['name'], dim, n_lists)
+
+    try:
+        os.makedirs(path, exist_ok=True)
+        index.save(index_path)
+    except OSError:
+        return index
+
+    remove_old_artifacts(path, 'ann_*', keep_last)
+    return index
@@ -0,0 +1,69 @@
+"""
+Recomendaciones personalizadas por lotes
+Genera las recomendaciones {'similar', 'new'} de muchos usuarios con una sola
+carga del dataset y del modelo, pensado para precalcular por la noche el feed
+de recomendaciones de todos los usuarios.
+
+Entrada (JSON lines, un usuario por línea):
+    {"user_id": 7, "completed_roadmaps": ["rm1", "rm2"], "completed_nodes": [3, 9], "tag": "python"}
+
+Salida (JSON lines, en el mismo orden): el mismo JSON que
+personalized_recommender.py, más user_id si venía en la entrada.
+
+Uso:
+    python ml_example/batch_recommend.py <dataset_path> <users.jsonl> [--output recs.jsonl] [--top-n 5] [--batch-size 1000]
+"""
+
+import argparse
+import json
+import sys
+
+from personalized_recommender import PersonalizedRecommender
+from recommender_common import json_default
+
+
+def read_users(path):
+    """Leer usuarios de un archivo JSON lines sin cargarlo completo"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def main():
+    """Función principal para usar desde línea de comandos"""
+    parser = argparse.ArgumentParser(description='Recomendaciones personalizadas por lotes')
+    parser.add_argument('dataset_path', help='Dataset (CSV, Parquet o directorio .npyds)')
+    parser.add_argument('users_path', help='Usuarios en formato JSON lines')
+    parser.add_argument('--output', help='Archivo JSON lines de salida (por defecto stdout)')
+    parser.add_argument('--top-n', type=int, default=5, help='Recomendaciones por categoría')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Usuarios por producto disperso')
+    args = parser.parse_args()
+
+    try:
+        recommender = PersonalizedRecommender(args.dataset_path, {})
+        output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+        try:
+            results = recommender.iter_batch_recommendations(
+                read_users(args.users_path),
+                top_n=args.top_n,
+                batch_size=args.batch_size
+            )
+            for result in results:
+                output.write(json.dumps(result, ensure_ascii=False, default=json_default) + '\n')
+                output.flush()
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    except Exception as e:
+        print(json.dumps({
+            'error': str(e)
+        }, ensure_ascii=False), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+Benchmarks de los recomendadores de roadmaps
+Genera catálogos sintéticos con las mismas columnas que exporta
+`php artisan ml:export-dataset` (de 1k a 1M roadmaps y de 10 a 10k tags
+distintos) y mide por separado cada etapa de roadmap_recommender.py y
+personalized_recommender.py:
+
+- cold_start_*: el CLI completo en un proceso nuevo (como lo llama PHP)
+- load_dataset, prepare_data, tag_index, train_model
+- tag_filter: búsqueda de un tag en el índice invertido
+- similarity: similitud usuario -> catálogo
+- get_best_roadmap_by_tag / get_recommendations: consulta de punta a punta,
+  con la caché de resultados vacía en cada repetición
+- *_cached: la misma consulta respondida desde la caché de resultados
+
+La salida es JSON para poder comparar versiones y detectar regresiones.
+
+Uso:
+    python ml_example/benchmark_recommenders.py [--roadmaps 1000,10000] [--tags 10,1000] [--output bench.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.preprocessing import StandardScaler
+
+from dataset_store import load_dataset, npy_dataset_path, save_npy_dataset
+from personalized_recommender import PersonalizedRecommender
+from recommender_common import FEATURES, create_quality_model
+from roadmap_recommender import RoadmapRecommender
+from tag_index import TagIndex, split_tags
+
+BENCHMARK_VERSION = 2
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_ROADMAPS = [1000, 10000, 100000, 1000000]
+DEFAULT_TAGS = [10, 100, 1000, 10000]
+
+
+def generate_catalogue(n_roadmaps, n_tags, seed=0):
+    """
+    Catálogo sintético con las columnas del exportador
+
+    La popularidad de los tags sigue una ley de Zipf, como en un catálogo
+    real (unos pocos tags muy frecuentes y una cola larga de tags raros).
+    """
+    rng = np.random.default_rng(seed)
+
+    vocabulary = np.array([f'tag{i:05d}' for i in range(n_tags)], dtype=object)
+    popularity = 1.0 / np.arange(1, n_tags + 1) ** 1.1
+    popularity /= popularity.sum()
+
+    tags_per_row = rng.integers(1, min(5, n_tags) + 1, n_roadmaps)
+    tag_ids = rng.choice(n_tags, tags_per_row.sum(), p=popularity)
+    tags = [
+        ','.join(dict.fromkeys(vocabulary[ids]))
+        for ids in np.split(tag_ids, np.cumsum(tags_per_row)[:-1])
+    ]
+
+    completion_count = rng.integers(0, 500, n_roadmaps)
+    dropout_count = rng.integers(0, 200, n_roadmaps)
+    avg_hours_spent = rng.uniform(1, 80, n_roadmaps)
+    avg_nodes_completed = rng.uniform(1, 50, n_roadmaps)
+    bookmark_count = rng.integers(0, 300, n_roadmaps)
+    usefulness_score = rng.uniform(1, 5, n_roadmaps)
+    attempts = np.maximum(1, completion_count + dropout_count)
+
+    created_at = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, n_roadmaps), unit='s')
+
+    return pd.DataFrame({
+        'roadmap_id': [f'rm{i:07d}' for i in range(n_roadmaps)],
+        'name': [f'Roadmap {i}' for i in range(n_roadmaps)],
+        'tags': tags,
+        'completion_count': completion_count,
+        'dropout_count': dropout_count,
+        'avg_hours_spent': avg_hours_spent,
+        'avg_nodes_completed': avg_nodes_completed,
+        'bookmark_count': bookmark_count,
+        'usefulness_score': usefulness_score,
+        'completion_rate': np.round(completion_count / attempts, 4),
+        'dropout_rate': np.round(dropout_count / attempts, 4),
+        'efficiency_rate': np.round(avg_nodes_completed / avg_hours_spent, 4),
+        'engagement_score': np.round(bookmark_count * usefulness_score, 2),
+        'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+
+
+def generate_users(df, n_users, seed=0):
+    """Usuarios sintéticos: algunos roadmaps y nodos (tags) completados"""
+    rng = np.random.default_rng(seed + 1)
+    roadmap_ids = df['roadmap_id'].to_numpy()
+    tags = df['tags'].to_numpy()
+
+    users = []
+    for _ in range(n_users):
+        completed = rng.choice(len(df), min(3, len(df)), replace=False)
+        users.append({
+            'completed_roadmaps': [str(roadmap_ids[i]) for i in completed],
+            'completed_nodes': split_tags(tags[rng.integers(len(df))])
+        })
+    return users
+
+
+def query_tags(tag_index):
+    """Tags de consulta: el más frecuente, uno intermedio y uno raro"""
+    counts = np.asarray(tag_index.incidence.sum(axis=0)).ravel()
+    order = np.argsort(-counts, kind='stable')
+    picks = [order[0], order[len(order) // 2], order[-1]]
+    return [tag_index.vocabulary[i] for i in picks]
+
+
+def measure(func, repeats, setup=None):
+    """
+    Ejecutar func `repeats` veces y resumir los tiempos en milisegundos
+
+    `setup` (si se indica) corre antes de cada repetición, fuera del tiempo medido.
+    """
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return summarize(times)
+
+
+def summarize(times):
+    """Mediana, mínimo y p95 de una lista de tiempos (ms)"""
+    times = np.asarray(times, dtype=np.float64)
+    return {
+        'repeats': len(times),
+        'median_ms': round(float(np.median(times)), 3),
+        'min_ms': round(float(times.min()), 3),
+        'p95_ms': round(float(np.percentile(times, 95)), 3)
+    }
+
+
+def fit_model(recommender, max_train_rows):
+    """
+    Entrenar el modelo del recomendador y medir cuánto tarda
+
+    Por encima de max_train_rows se entrena con una muestra (el MLP con
+    batch_size=32 tardaría horas con 1M de filas); la huella sigue siendo la
+    del dataset completo, así que los CLI cargan este modelo igual.
+    """
+    start = time.perf_counter()
+
+    if len(recommender.df) <= max_train_rows:
+        recommender.train_model()
+        train_rows = len(recommender.df)
+    else:
+        sample = recommender.df.sample(max_train_rows, random_state=0)
+        recommender.scaler = StandardScaler()
+        recommender.model = create_quality_model()
+        recommender.model.fit(recommender.scaler.fit_transform(sample[FEATURES]), sample['quality_score'])
+        recommender.precompute_scores()
+        train_rows = max_train_rows
+
+    return {**summarize([(time.perf_counter() - start) * 1000]), 'train_rows': train_rows}
+
+
+def run_cli(args, repeats):
+    """Tiempo de un CLI en un proceso nuevo (sin servidor persistente)"""
+    env = {**os.environ, 'ROADMAP_RECOMMENDER_URL': ''}
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return summarize(times)
+
+
+def benchmark_catalogue(n_roadmaps, n_tags, options):
+    """Medir todas las etapas para un tamaño de catálogo"""
+    df = generate_catalogue(n_roadmaps, n_tags, options.seed)
+    dataset_path = os.path.join(os.getcwd(), f'roadmaps_{n_roadmaps}_{n_tags}.csv')
+    df.to_csv(dataset_path, index=False)
+    if options.format == 'npyds':
+        save_npy_dataset(df, npy_dataset_path(dataset_path))
+    del df
+
+    stages = {}
+    repeats = options.repeats
+
+    stages['load_dataset'] = measure(lambda: load_dataset(dataset_path), repeats)
+
+    # Recomendador general
+    roadmap = RoadmapRecommender(dataset_path)
+    stages['prepare_data'] = measure(roadmap.prepare_data, repeats)
+    stages['tag_index'] = measure(lambda: TagIndex(roadmap.df['tags']), repeats)
+    stages['train_model'] = fit_model(roadmap, options.max_train_rows)
+    roadmap.save_model()
+
+    tags = query_tags(roadmap.tag_index)
+    queries = options.queries
+    stages['tag_filter'] = measure(
+        lambda: [roadmap.tag_index.match(tag) for tag in tags], queries
+    )
+    stages['get_best_roadmap_by_tag'] = measure(
+        lambda: [roadmap.get_best_roadmap_by_tag(tag) for tag in tags], queries, roadmap.result_cache.clear
+    )
+    stages['get_best_roadmap_by_tag_cached'] = measure(
+        lambda: [roadmap.get_best_roadmap_by_tag(tag) for tag in tags], queries
+    )
+
+    # Recomendador personalizado (mismo modelo, guardado con la huella del dataset)
+    personalized = PersonalizedRecommender(dataset_path, {})
+    personalized.model, personalized.scaler = roadmap.model, roadmap.scaler
+    personalized.save_model()
+    personalized.precompute_scores()
+
+    users = generate_users(personalized.df, queries, options.seed)
+    views = [personalized.for_user(user) for user in users]
+    user_tags = [view.get_user_completed_nodes() for view in views]
+
+    stages['similarity'] = summarize([
+        measure(lambda: personalized.tag_index.similarity(tags_), 1)['median_ms'] for tags_ in user_tags
+    ])
+    stages['get_recommendations'] = summarize([
+        measure(lambda: view.get_recommendations(top_n=5), 1, personalized.result_cache.clear)['median_ms']
+        for view in views
+    ])
+    stages['get_recommendations_cached'] = summarize([
+        measure(lambda: view.get_recommendations(top_n=5), 1, lambda: view.get_recommendations(top_n=5))['median_ms']
+        for view in views
+    ])
+    stages['get_recommendations_tag'] = summarize([
+        measure(lambda: view.get_recommendations(tag=tags[0], top_n=5), 1, personalized.result_cache.clear)['median_ms']
+        for view in views
+    ])
+
+    # Arranque en frío: el CLI completo, como lo ejecuta PHP
+    if options.cold_repeats > 0:
+        user_json = json.dumps(users[0])
+        stages['cold_start_roadmap'] = run_cli(
+            [os.path.join(SCRIPT_DIR, 'roadmap_recommender.py'), dataset_path, tags[0]],
+            options.cold_repeats
+        )
+        stages['cold_start_personalized'] = run_cli(
+            [os.path.join(SCRIPT_DIR, 'personalized_recommender.py'), dataset_path, user_json, tags[0]],
+            options.cold_repeats
+        )
+
+    return {
+        'n_roadmaps': n_roadmaps,
+        'n_tags': n_tags,
+        'distinct_tags': len(roadmap.tag_index.vocabulary),
+        'query_tags': tags,
+        'stages': stages
+    }
+
+
+def parse_sizes(value):
+    """'1000,1e4,100k,1M' -> [1000, 10000, 100000, 1000000]"""
+    sizes = []
+    for item in value.split(','):
+        item = item.strip().lower()
+        factor = {'k': 1000, 'm': 1000000}.get(item[-1:], 1)
+        sizes.append(int(float(item.rstrip('km')) * factor))
+    return sizes
+
+
+def main():
+    """Función principal para usar desde línea de comandos"""
+    parser = argparse.ArgumentParser(description='Benchmarks de los recomendadores de roadmaps')
+    parser.add_argument('--roadmaps', type=parse_sizes, default=DEFAULT_ROADMAPS,
+                        help='Tamaños de catálogo, p. ej. 1k,10k,100k,1M')
+    parser.add_argument('--tags', type=parse_sizes, default=DEFAULT_TAGS,
+                        help='Tags distintos, p. ej. 10,100,1k,10k')
+    parser.add_argument('--format', choices=['csv', 'npyds'], default='csv',
+                        help='Formato del dataset que leen los recomendadores')
+    parser.add_argument('--repeats', type=int, default=3, help='Repeticiones de las etapas de carga')
+    parser.add_argument('--queries', type=int, default=20, help='Consultas / usuarios por etapa')
+    parser.add_argument('--cold-repeats', type=int, default=3,
+                        help='Ejecuciones del CLI en frío (0 para omitirlas)')
+    parser.add_argument('--max-train-rows', type=int, default=100000,
+                        help='Por encima, el modelo se entrena con una muestra')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='Directorio para datasets y modelos (por defecto uno temporal)')
+    parser.add_argument('--output', help='Archivo JSON de salida (por defecto stdout)')
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix='roadmap_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+
+    try:
+        # Los recomendadores guardan los modelos en ml_example/models/ relativo al cwd
+        os.chdir(workdir)
+
+        results = []
+        for n_roadmaps in args.roadmaps:
+            for n_tags in args.tags:
+                results.append(benchmark_catalogue(n_roadmaps, n_tags, args))
+                print(f'{n_roadmaps} roadmaps / {n_tags} tags: OK', file=sys.stderr)
+
+        report = {
+            'benchmark_version': BENCHMARK_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'sklearn': sklearn.__version__
+            },
+            'config': {
+                'format': args.format,
+                'repeats': args.repeats,
+                'queries': args.queries,
+                'cold_repeats': args.cold_repeats,
+                'max_train_rows': args.max_train_rows,
+                'seed': args.seed
+            },
+            'results': results
+        }
+    except Exception as e:
+        print(json.dumps({'error': str(e)}, ensure_ascii=False))
+        sys.exit(1)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Modo compacto del catálogo (más roadmaps por worker con la misma memoria)
+Por defecto cada recomendador guarda el DataFrame tal como se cargó: features
+en float64, contadores en int64 y la columna 'tags' como un string de Python
+por fila, que además se repite dentro del índice de tags. Con
+ROADMAP_CATALOGUE=compact (o `--compact` en el servidor):
+
+- Features float64 -> float32 (la red ya hace la inferencia en float32)
+- Contadores int64 -> el entero más pequeño que alcanza (int8/16/32)
+- Columnas de texto con muchos valores repetidos -> Categorical
+- 'tags' sale del DataFrame: su texto queda en el TagIndex codificado con
+  diccionario (CSR de ids, ver TagIndex.store_text) y los arrays del índice
+  pasan a int32/float32
+
+quality_score y los scores precalculados siguen en float64 (se calculan antes
+de compactar), así los rankings no cambian; los valores de la respuesta pueden
+diferir en el último decimal. Un delta sobre un catálogo compacto pide recarga
+completa (SchemaChangedError).
+
+Uso (reporte de memoria de un dataset, normal frente a compacto):
+    python ml_example/compact_catalogue.py <dataset>
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import load_dataset
+from recommender_common import SCORE_COLUMNS, compute_quality_score, json_default
+from tag_index import TagIndex
+
+CATALOGUE_ENV = 'ROADMAP_CATALOGUE'
+
+# Columnas de texto que se codifican como Categorical si tienen como mucho
+# esta fracción de valores distintos
+CATEGORICAL_RATIO = 0.5
+
+
+def compact_enabled(compact=None):
+    """¿Usar el modo compacto? Por defecto según ROADMAP_CATALOGUE=compact"""
+    if compact is None:
+        return os.environ.get(CATALOGUE_ENV, '').lower() == 'compact'
+    return bool(compact)
+
+
+def is_compact(df):
+    """¿Es un DataFrame ya compactado (sin la columna de texto 'tags')?"""
+    return 'tags' not in df.columns
+
+
+def compact_frame(df):
+    """
+    DataFrame con tipos reducidos y sin la columna 'tags'
+
+    Las columnas de score (SCORE_COLUMNS) no se tocan.
+    """
+    data = {}
+    for col in df.columns:
+        if col == 'tags':
+            continue
+
+        values = df[col]
+        if col in SCORE_COLUMNS or values.dtype.kind == 'b':
+            data[col] = values
+        elif values.dtype.kind == 'f':
+            data[col] = values.to_numpy(dtype=np.float32)
+        elif values.dtype.kind in 'iu':
+            data[col] = pd.to_numeric(values.to_numpy(), downcast='integer')
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            data[col] = values
+        elif values.nunique(dropna=False) <= len(values) * CATEGORICAL_RATIO:
+            data[col] = values.astype('category')
+        else:
+            data[col] = values
+
+    return pd.DataFrame(data, copy=False)
+
+
+def compact_catalogue(df, tag_index):
+    """
+    Compactar un catálogo ya preparado (con quality_score y TagIndex)
+
+    Returns:
+        tuple: (DataFrame compacto, el mismo TagIndex con el texto de los tags)
+    """
+    if is_compact(df):
+        return df, tag_index
+
+    tag_index.store_text(df['tags'])
+    return compact_frame(df), tag_index.compact()
+
+
+def memory_report(df, tag_index):
+    """
+    Bytes ocupados por el catálogo: columna a columna y por parte del índice
+
+    Las columnas abiertas con memory-map cuentan su tamaño completo aunque se
+    compartan entre procesos.
+    """
+    columns = {col: int(df[col].memory_usage(index=False, deep=True)) for col in df.columns}
+    index = {part: int(size) for part, size in tag_index.memory_usage().items()}
+
+    return {
+        'compact': is_compact(df),
+        'rows': len(df),
+        'dtypes': {col: str(dtype) for col, dtype in df.dtypes.items()},
+        'columns': columns,
+        'tag_index': index,
+        'dataframe_bytes': sum(columns.values()),
+        'tag_index_bytes': sum(index.values()),
+        'total_bytes': sum(columns.values()) + sum(index.values())
+    }
+
+
+def main():
+    """Comparar la memoria del catálogo normal y la del compacto"""
+    if len(sys.argv) < 2:
+        print(json.dumps({'error': 'Uso: python compact_catalogue.py <dataset_path>'}))
+        sys.exit(1)
+
+    try:
+        df = load_dataset(sys.argv[1])
+        df['quality_score'] = compute_quality_score(df)
+        tag_index = TagIndex(df['tags'])
+
+        standard = memory_report(df, tag_index)
+        compact = memory_report(*compact_catalogue(df, tag_index))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}, ensure_ascii=False))
+        sys.exit(1)
+
+    print(json.dumps({
+        'standard': standard,
+        'compact': compact,
+        'ratio': round(compact['total_bytes'] / max(standard['total_bytes'], 1), 3)
+    }, indent=2, ensure_ascii=False, default=json_default))
+
+
+if __name__ == '__main__':
+    main()
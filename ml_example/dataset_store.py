@@ -0,0 +1,217 @@
+"""
+Formatos binarios del dataset de roadmaps
+Leer el CSV exportado por `php artisan ml:export-dataset` domina el arranque en
+frío cuando el catálogo crece. Este módulo convierte el dataset a:
+
+- Directorio NumPy (.npyds): una .npy por columna numérica y las columnas de
+  texto (tags, name, ...) codificadas con diccionario. Se abre con memory-map,
+  sin copiar los datos.
+- Parquet (requiere pyarrow)
+
+Los recomendadores cargan cualquiera de los tres formatos con load_dataset(),
+y si reciben un CSV que ya tiene su versión .npyds al día, usan esta última.
+
+Uso:
+    python ml_example/dataset_store.py <dataset.csv> [--format npyds|parquet] [--output <ruta>]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+NPY_DATASET_SUFFIX = '.npyds'
+NPY_DATASET_META = 'dataset.json'
+NPY_DATASET_VERSION = 1
+
+
+def npy_dataset_path(csv_path):
+    """Ruta del directorio .npyds que corresponde a un CSV"""
+    return os.path.splitext(csv_path)[0] + NPY_DATASET_SUFFIX
+
+
+def is_npy_dataset(path):
+    """¿Es `path` un dataset en formato directorio NumPy?"""
+    return os.path.isfile(os.path.join(path, NPY_DATASET_META))
+
+
+def save_npy_dataset(df, path):
+    """
+    Guardar el dataset como directorio NumPy
+
+    Columnas numéricas: <col>.npy con su dtype original.
+    Columnas de texto: <col>.codes.npy (int32) + diccionario de valores en el JSON.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for col in df.columns:
+        values = df[col]
+
+        if values.dtype.kind in 'biuf':
+            np.save(os.path.join(tmp_path, f'{col}.npy'), values.to_numpy())
+            columns.append({'name': col, 'encoding': 'plain'})
+        else:
+            # Codificación con diccionario (NaN -> código -1)
+            codes, uniques = pd.factorize(values)
+            np.save(os.path.join(tmp_path, f'{col}.codes.npy'), codes.astype(np.int32))
+            columns.append({
+                'name': col,
+                'encoding': 'dictionary',
+                'dictionary': [str(value) for value in uniques]
+            })
+
+    with open(os.path.join(tmp_path, NPY_DATASET_META), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': NPY_DATASET_VERSION,
+            'rows': len(df),
+            'columns': columns
+        }, f, ensure_ascii=False)
+
+    # Reemplazar el directorio anterior (si existía) por el nuevo
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_npy_dataset(path):
+    """
+    Cargar un directorio NumPy con memory-map (sin copiar las columnas)
+
+    Las columnas de texto se devuelven como Categorical: solo los códigos
+    están en memoria mapeada y el diccionario se comparte entre filas.
+    """
+    with open(os.path.join(path, NPY_DATASET_META), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    if meta.get('version') != NPY_DATASET_VERSION:
+        raise ValueError(f"Versión de dataset no soportada: {meta.get('version')}")
+
+    data = {}
+    for column in meta['columns']:
+        col = column['name']
+        if column['encoding'] == 'plain':
+            data[col] = np.load(os.path.join(path, f'{col}.npy'), mmap_mode='r')
+        else:
+            codes = np.load(os.path.join(path, f'{col}.codes.npy'), mmap_mode='r')
+            data[col] = pd.Categorical.from_codes(codes, categories=column['dictionary'])
+
+    # copy=False mantiene cada columna apuntando al archivo mapeado
+    return pd.DataFrame(data, copy=False)
+
+
+def load_dataset(path):
+    """
+    Cargar el dataset en cualquiera de los formatos soportados
+
+    - Directorio .npyds: memory-map
+    - .parquet: pyarrow con memory-map (si pyarrow no está instalado, se usa
+      el CSV con el mismo nombre si existe)
+    - .csv: se usa su .npyds si existe y es más reciente; si no, pd.read_csv
+    """
+    if os.path.isdir(path):
+        return load_npy_dataset(path)
+
+    base_path = os.path.splitext(path)[0]
+
+    if path.endswith('.parquet'):
+        try:
+            return pd.read_parquet(path, memory_map=True)
+        except ImportError:
+            if os.path.exists(f'{base_path}.csv'):
+                return pd.read_csv(f'{base_path}.csv')
+            raise
+
+    converted_path = npy_dataset_path(path)
+    if is_npy_dataset(converted_path) and os.path.getmtime(converted_path) >= os.path.getmtime(path):
+        try:
+            return load_npy_dataset(converted_path)
+        except (OSError, ValueError):
+            pass
+
+    return pd.read_csv(path)
+
+
+def iter_dataset_chunks(path, chunksize=100000, start_chunk=0):
+    """
+    Recorrer el dataset en bloques de `chunksize` filas sin cargarlo completo
+
+    - Directorio .npyds: rebanadas de las columnas mapeadas (saltar bloques es gratis)
+    - .parquet: lotes de pyarrow
+    - .csv: pd.read_csv(chunksize=...); los bloques saltados se leen y descartan
+
+    Args:
+        start_chunk: Primer bloque a devolver (para reanudar un recorrido)
+
+    Yields:
+        tuple: (índice del bloque, DataFrame)
+    """
+    # Igual que load_dataset: un CSV con su .npyds al día se lee del .npyds
+    npy_path = path if os.path.isdir(path) else npy_dataset_path(path)
+    if os.path.isdir(path) or (
+        not path.endswith('.parquet') and is_npy_dataset(npy_path)
+        and os.path.getmtime(npy_path) >= os.path.getmtime(path)
+    ):
+        df = load_npy_dataset(npy_path)
+        for index, start in enumerate(range(0, len(df), chunksize)):
+            if index >= start_chunk:
+                # copy(): el bloque deja de depender del archivo mapeado
+                yield index, df.iloc[start:start + chunksize].copy()
+        return
+
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize)
+        for index, batch in enumerate(batches):
+            if index >= start_chunk:
+                yield index, batch.to_pandas()
+        return
+
+    with pd.read_csv(path, chunksize=chunksize) as reader:
+        for index, chunk in enumerate(reader):
+            if index >= start_chunk:
+                yield index, chunk
+
+
+def convert_dataset(csv_path, output_format='npyds', output_path=None):
+    """Convertir el CSV exportado por Laravel a formato binario"""
+    df = pd.read_csv(csv_path)
+
+    if output_format == 'parquet':
+        output_path = output_path or os.path.splitext(csv_path)[0] + '.parquet'
+        df.to_parquet(output_path, engine='pyarrow', compression='snappy')
+    else:
+        output_path = output_path or npy_dataset_path(csv_path)
+        save_npy_dataset(df, output_path)
+
+    return output_path, len(df)
+
+
+def main():
+    """Convertir un dataset desde línea de comandos"""
+    parser = argparse.ArgumentParser(description='Convertir el dataset de roadmaps a formato binario')
+    parser.add_argument('dataset_path', help='CSV exportado por ml:export-dataset')
+    parser.add_argument('--format', choices=['npyds', 'parquet'], default='npyds')
+    parser.add_argument('--output', help='Ruta de salida (por defecto junto al CSV)')
+    args = parser.parse_args()
+
+    try:
+        output_path, rows = convert_dataset(args.dataset_path, args.format, args.output)
+    except Exception as e:
+        print(json.dumps({'error': str(e)}, ensure_ascii=False))
+        sys.exit(1)
+
+    print(json.dumps({'output': output_path, 'rows': rows}, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Inferencia de la red neuronal sin scikit-learn
+Los recomendadores solo necesitan el modelo ya entrenado para puntuar el
+catálogo. Importar scikit-learn tarda casi dos segundos en cada arranque en frío
+del CLI, así que al guardar un modelo también se exportan sus pesos a .npz:
+
+- scaler: mean_ y scale_ del StandardScaler
+- red: coefs_ e intercepts_ de cada capa del MLPRegressor
+
+Este módulo carga el .npz y hace el forward pass con NumPy. Solo importa NumPy.
+
+Para puntuar el catálogo completo se usa FoldedMLP: el scaler se pliega en los
+pesos de la primera capa (x - mean) / scale · W = x · (W / scale) - (mean / scale) · W
+y la red corre en float32 por bloques de filas, sin la pasada extra de
+StandardScaler.transform ni la copia en float64. El kernel se valida contra la
+predicción de scikit-learn (float64) y, si el error supera KERNEL_TOLERANCE, se
+usa float64.
+"""
+
+import hashlib
+import os
+import warnings
+import weakref
+
+import numpy as np
+
+NPZ_FORMAT_VERSION = 1
+
+# Subir cuando cambie el kernel de inferencia (invalida los scores precalculados)
+KERNEL_VERSION = 1
+
+# Error absoluto máximo admitido del kernel float32 frente a scikit-learn
+KERNEL_TOLERANCE = 1e-4
+
+# Filas por bloque del forward pass (las capas ocultas caben en caché)
+KERNEL_BATCH_ROWS = 4096
+
+# Validación del kernel por modelo: modelo -> (weights_digest, error)
+_kernel_errors = weakref.WeakKeyDictionary()
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _tanh(x):
+    return np.tanh(x, out=x)
+
+
+def _logistic(x):
+    # Igual que scipy.special.expit
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1
+    return np.reciprocal(x, out=x)
+
+
+def _identity(x):
+    return x
+
+
+ACTIVATIONS = {'relu': _relu, 'tanh': _tanh, 'logistic': _logistic, 'identity': _identity}
+
+
+class NumpyStandardScaler:
+    """StandardScaler ya ajustado: solo transform()"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class NumpyMLPRegressor:
+    """MLPRegressor ya entrenado: solo predict() (capas ocultas + salida identidad)"""
+
+    def __init__(self, coefs, intercepts, activation='relu'):
+        if activation not in ACTIVATIONS:
+            raise ValueError(f'Activación no soportada: {activation}')
+
+        self.coefs_ = [np.asarray(coef, dtype=np.float64) for coef in coefs]
+        self.intercepts_ = [np.asarray(intercept, dtype=np.float64) for intercept in intercepts]
+        self.activation = activation
+
+    def predict(self, X):
+        activation = np.asarray(X, dtype=np.float64)
+        hidden_activation = ACTIVATIONS[self.activation]
+        last = len(self.coefs_) - 1
+
+        for i, (coef, intercept) in enumerate(zip(self.coefs_, self.intercepts_)):
+            activation = activation @ coef
+            activation += intercept
+            if i != last:
+                hidden_activation(activation)
+
+        return activation.ravel() if activation.shape[1] == 1 else activation
+
+
+class FoldedMLP:
+    """
+    Kernel de inferencia: scaler plegado en la primera capa, en float32
+
+    predict() recibe los features sin escalar (catálogo completo) y devuelve
+    la predicción en float64.
+    """
+
+    def __init__(self, coefs, intercepts, activation='relu', dtype=np.float32):
+        if activation not in ACTIVATIONS:
+            raise ValueError(f'Activación no soportada: {activation}')
+
+        self.dtype = np.dtype(dtype)
+        self.coefs = [np.ascontiguousarray(coef, dtype=self.dtype) for coef in coefs]
+        self.intercepts = [np.ascontiguousarray(intercept, dtype=self.dtype) for intercept in intercepts]
+        self.activation = activation
+
+        # Los pesos que quedan subnormales en float32 multiplican el tiempo de
+        # cada matmul; su aporte es menor que el redondeo, así que se anulan
+        tiny = np.finfo(self.dtype).tiny
+        for array in self.coefs + self.intercepts:
+            array[np.abs(array) < tiny] = 0
+
+    @classmethod
+    def from_model(cls, model, scaler, dtype=np.float32):
+        """Plegar mean_/scale_ del scaler en la primera capa del MLP"""
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+        first = np.asarray(model.coefs_[0], dtype=np.float64)
+
+        coefs = [first / scale[:, None]] + list(model.coefs_[1:])
+        intercepts = [model.intercepts_[0] - (mean / scale) @ first] + list(model.intercepts_[1:])
+        return cls(coefs, intercepts, model.activation, dtype)
+
+    def predict(self, X, batch_rows=KERNEL_BATCH_ROWS):
+        X = np.asarray(X, dtype=self.dtype)
+        hidden_activation = ACTIVATIONS[self.activation]
+        last = len(self.coefs) - 1
+        output = np.empty(len(X), dtype=np.float64)
+
+        for start in range(0, len(X), batch_rows):
+            activation = X[start:start + batch_rows]
+            for i, (coef, intercept) in enumerate(zip(self.coefs, self.intercepts)):
+                activation = activation @ coef
+                activation += intercept
+                if i != last:
+                    hidden_activation(activation)
+            output[start:start + batch_rows] = activation[:, 0]
+
+        return output
+
+
+def kernel_error(model, scaler, n_samples=4096, seed=0):
+    """
+    Error absoluto máximo del kernel float32 frente a model.predict (float64)
+
+    Se evalúa sobre entradas sintéticas con la media y la escala del scaler,
+    así no hace falta el dataset de entrenamiento.
+    """
+    rng = np.random.default_rng(seed)
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+    X = mean + scale * rng.standard_normal((n_samples, len(mean)))
+
+    with warnings.catch_warnings():
+        # scikit-learn avisa de que X no trae nombres de columnas
+        warnings.simplefilter('ignore', UserWarning)
+        reference = model.predict(scaler.transform(X))
+    folded = FoldedMLP.from_model(model, scaler, np.float32).predict(X)
+    return float(np.max(np.abs(folded - reference)))
+
+
+def validated_kernel_error(model, scaler):
+    """
+    kernel_error de un modelo, calculado una sola vez por modelo y pesos
+
+    Los modelos cargados del .npz traen el resultado de la validación hecha al
+    exportarlos; los demás se validan la primera vez y el resultado se guarda
+    mientras no cambien sus pesos.
+    """
+    error = getattr(model, 'kernel_error', None)
+    if error is not None:
+        return error
+
+    digest = weights_digest(model, scaler)
+    cached = _kernel_errors.get(model)
+    if cached is None or cached[0] != digest:
+        cached = (digest, kernel_error(model, scaler))
+        _kernel_errors[model] = cached
+    return cached[1]
+
+
+def quality_kernel(model, scaler):
+    """
+    Kernel validado para un modelo (MLPRegressor o NumpyMLPRegressor)
+
+    float32 si su error frente a scikit-learn está dentro de KERNEL_TOLERANCE;
+    si no, float64 (ver validated_kernel_error).
+    """
+    error = validated_kernel_error(model, scaler)
+
+    dtype = np.float32 if error <= KERNEL_TOLERANCE else np.float64
+    return FoldedMLP.from_model(model, scaler, dtype)
+
+
+def predict_quality(model, scaler, X):
+    """Predicción del modelo sobre features sin escalar (kernel plegado si es un MLP)"""
+    if hasattr(model, 'coefs_') and hasattr(scaler, 'mean_') and getattr(model, 'activation', None) in ACTIVATIONS:
+        return quality_kernel(model, scaler).predict(X)
+
+    return model.predict(scaler.transform(X))
+
+
+def export_model_npz(model, scaler, path):
+    """
+    Exportar los pesos de un MLPRegressor y su StandardScaler a .npz
+
+    La escritura es atómica (archivo temporal + rename).
+    """
+    arrays = {
+        'format_version': np.array(NPZ_FORMAT_VERSION),
+        'activation': np.array(model.activation),
+        'mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'n_layers': np.array(len(model.coefs_)),
+        'kernel_error': np.array(kernel_error(model, scaler))
+    }
+    for i, (coef, intercept) in enumerate(zip(model.coefs_, model.intercepts_)):
+        arrays[f'coef_{i}'] = coef
+        arrays[f'intercept_{i}'] = intercept
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_model_npz(path):
+    """
+    Cargar un modelo exportado con export_model_npz
+
+    Returns:
+        tuple: (NumpyMLPRegressor, NumpyStandardScaler)
+
+    Raises:
+        ValueError: Si el archivo no tiene el formato esperado
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['format_version']) != NPZ_FORMAT_VERSION:
+            raise ValueError(f'Versión de pesos no soportada: {int(data["format_version"])}')
+
+        n_layers = int(data['n_layers'])
+        model = NumpyMLPRegressor(
+            [data[f'coef_{i}'] for i in range(n_layers)],
+            [data[f'intercept_{i}'] for i in range(n_layers)],
+            str(data['activation'])
+        )
+        scaler = NumpyStandardScaler(data['mean'], data['scale'])
+        if 'kernel_error' in data:
+            model.kernel_error = float(data['kernel_error'])
+
+    return model, scaler
+
+
+def weights_digest(model, scaler):
+    """
+    Hash de los pesos del modelo y del scaler
+
+    Es el mismo para el MLPRegressor entrenado y para su versión NumPy cargada
+    del .npz, así ambos comparten el almacén de scores precalculados.
+    """
+    digest = hashlib.sha1()
+    digest.update(f"kernel-v{KERNEL_VERSION}:{getattr(model, 'activation', '')}".encode('utf-8'))
+    for array in [scaler.mean_, scaler.scale_, *model.coefs_, *model.intercepts_]:
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
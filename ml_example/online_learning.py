@@ -0,0 +1,344 @@
+"""
+Aprendizaje en línea a partir de eventos de los roadmaps
+Sin esto, el modelo solo se actualiza con una nueva exportación
+(`ml:export-dataset`) y un train_model() completo. Aquí cada lote de eventos:
+
+1. Actualiza las métricas de los roadmaps afectados con las mismas fórmulas
+   del exportador (completion_rate, dropout_rate, efficiency_rate,
+   engagement_score).
+2. Recalcula su quality_score (el target de la red) y sus scores.
+3. Entrena una copia de la red con partial_fit en mini-lotes: las filas
+   afectadas más una muestra del resto del catálogo (replay), para que la red
+   no olvide lo que ya sabía. La copia reemplaza al modelo vivo.
+
+Cada SNAPSHOT_EVENTS eventos o SNAPSHOT_SECONDS segundos se guarda una
+instantánea: el modelo donde lo cargan los recomendadores y los scores de todo
+el catálogo con el modelo actualizado (ver snapshot_model de cada recomendador).
+
+Eventos (JSON lines, JSON, CSV o DataFrame), una fila por evento:
+    {"roadmap_id": "rm1", "event": "completion", "hours": 12.5, "nodes": 20}
+    {"roadmap_id": "rm1", "event": "dropout"}
+    {"roadmap_id": "rm1", "event": "like"}            (también bookmark / unlike / unbookmark)
+    {"roadmap_id": "rm1", "event": "rating", "value": 4.2}   (nuevo usefulness_score promedio)
+`count` (opcional) repite el evento.
+
+Uso:
+    python ml_example/online_learning.py <dataset> <eventos.jsonl> [--batch-size 64]
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from mlp_inference import validated_kernel_error
+from recommender_common import (
+    FEATURES, apply_metric_updates, create_quality_model, load_tuned_params,
+    quality_score_maxima, read_delta, rescore_rows, roadmap_positions
+)
+
+# Contador que suma cada tipo de evento (+1 / -1 por evento)
+EVENT_COUNTERS = {
+    'completion': ('completion_count', 1),
+    'dropout': ('dropout_count', 1),
+    'like': ('bookmark_count', 1),
+    'bookmark': ('bookmark_count', 1),
+    'unlike': ('bookmark_count', -1),
+    'unbookmark': ('bookmark_count', -1),
+}
+
+EVENT_TYPES = set(EVENT_COUNTERS) | {'rating'}
+
+# Filas por mini-lote de partial_fit
+ONLINE_BATCH_SIZE = 64
+
+# Filas del resto del catálogo por cada fila afectada (replay)
+REPLAY_RATIO = 1.0
+
+# Instantánea cada tantos eventos o segundos (lo que ocurra primero)
+SNAPSHOT_EVENTS = 10000
+SNAPSHOT_SECONDS = 300
+
+
+def read_events(events):
+    """Eventos como DataFrame (roadmap_id, event, count, hours, nodes, value)"""
+    events = read_delta(events) if not isinstance(events, list) else pd.DataFrame(events)
+
+    missing = [col for col in ('roadmap_id', 'event') if col not in events.columns]
+    if missing:
+        raise ValueError(f'Faltan columnas en los eventos: {missing}')
+
+    events = events.copy()
+    events['event'] = events['event'].astype(str).str.lower()
+    unknown = sorted(set(events['event']) - EVENT_TYPES)
+    if unknown:
+        raise ValueError(f'Tipos de evento no soportados: {unknown}')
+
+    for col in ('count', 'hours', 'nodes', 'value'):
+        events[col] = pd.to_numeric(events[col], errors='coerce') if col in events.columns else np.nan
+    events['count'] = events['count'].fillna(1).astype(np.int64)
+    return events
+
+
+def metric_updates(df, events):
+    """
+    Nuevas métricas de los roadmaps con eventos
+
+    Las horas y nodos de cada completado se promedian con los del roadmap
+    (pesados por completion_count); un rating reemplaza usefulness_score.
+
+    Returns:
+        tuple: (DataFrame para apply_metric_updates, roadmaps ignorados por no
+            estar en el catálogo)
+    """
+    event_ids = events['roadmap_id']
+    if df['roadmap_id'].dtype.kind in 'iuf':
+        # Ids numéricos leídos desde JSON como texto
+        event_ids = pd.to_numeric(event_ids, errors='coerce')
+    # Se agrupa por posición de fila (sirve igual con ids en Categorical)
+    event_rows = roadmap_positions(df, event_ids)
+    known = event_rows >= 0
+    ignored = event_ids[~known].nunique()
+    events, event_rows = events[known], event_rows[known]
+
+    deltas = pd.DataFrame({'row': event_rows}, index=events.index)
+    for counter in sorted({counter for counter, _ in EVENT_COUNTERS.values()}):
+        signs = events['event'].map({event: sign for event, (col, sign) in EVENT_COUNTERS.items() if col == counter})
+        deltas[counter] = signs.fillna(0).astype(np.int64) * events['count']
+
+    # Horas / nodos informados en los completados
+    completed = events['event'] == 'completion'
+    for col in ('hours', 'nodes'):
+        reported = completed & events[col].notna()
+        deltas[f'{col}_total'] = np.where(reported, events[col] * events['count'], 0.0)
+        deltas[f'{col}_n'] = np.where(reported, events['count'], 0)
+
+    totals = deltas.groupby('row', sort=True).sum()
+    positions = totals.index.to_numpy()
+    rated = (events['event'] == 'rating') & events['value'].notna()
+    ratings = events['value'][rated].groupby(event_rows[rated.to_numpy()]).last()
+
+    def current(col):
+        return df[col].to_numpy(dtype=np.float64)[positions]
+
+    completions = current('completion_count') + totals['completion_count'].to_numpy()
+    dropouts = current('dropout_count') + totals['dropout_count'].to_numpy()
+    bookmarks = np.maximum(current('bookmark_count') + totals['bookmark_count'].to_numpy(), 0)
+
+    def running_mean(col, prefix):
+        old, weight = current(col), current('completion_count')
+        total, n = totals[f'{prefix}_total'].to_numpy(), totals[f'{prefix}_n'].to_numpy()
+        return np.where(n > 0, (old * weight + total) / np.maximum(weight + n, 1), old)
+
+    hours = running_mean('avg_hours_spent', 'hours')
+    nodes = running_mean('avg_nodes_completed', 'nodes')
+    usefulness = ratings.reindex(totals.index).to_numpy(dtype=np.float64)
+    usefulness = np.where(np.isnan(usefulness), current('usefulness_score'), usefulness)
+
+    # Mismas fórmulas que ExportRoadmapDatasetML.php
+    attempts = np.maximum(completions + dropouts, 1)
+    updates = pd.DataFrame({
+        'roadmap_id': df['roadmap_id'].to_numpy()[positions],
+        'completion_count': completions.astype(np.int64),
+        'dropout_count': dropouts.astype(np.int64),
+        'avg_hours_spent': hours,
+        'avg_nodes_completed': nodes,
+        'bookmark_count': bookmarks.astype(np.int64),
+        'usefulness_score': usefulness,
+        'completion_rate': np.round(completions / attempts, 4),
+        'dropout_rate': np.round(dropouts / attempts, 4),
+        'efficiency_rate': np.round(nodes / np.maximum(hours, 1), 4),
+        'engagement_score': np.round(bookmarks * usefulness, 2)
+    })
+    return updates[[col for col in updates.columns if col in df.columns]], int(ignored)
+
+
+def trainable_model(model):
+    """
+    Copia del modelo que admite partial_fit (MLPRegressor de scikit-learn)
+
+    Un modelo cargado del .npz (solo pesos) se convierte en un MLPRegressor
+    con la misma arquitectura y esos pesos.
+    """
+    if hasattr(model, 'partial_fit') and getattr(model, 'solver', None) in ('adam', 'sgd'):
+        trainable = copy.deepcopy(model)
+        # partial_fit no admite early stopping
+        trainable.set_params(early_stopping=False)
+        if getattr(trainable, 'best_loss_', None) is None:
+            # Entrenado con early stopping: no registró la mejor pérdida de entrenamiento
+            trainable.best_loss_ = np.inf
+        return trainable
+
+    trainable = create_quality_model({
+        **load_tuned_params('quality_model'),
+        'hidden_layer_sizes': tuple(coef.shape[1] for coef in model.coefs_[:-1]),
+        'activation': model.activation,
+        'solver': 'adam',
+        'early_stopping': False
+    })
+    # Un partial_fit sobre ceros crea la estructura interna; luego se ponen los pesos
+    n_features = model.coefs_[0].shape[0]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        trainable.partial_fit(np.zeros((2, n_features)), np.zeros(2))
+    trainable.coefs_ = [np.array(coef, dtype=np.float64) for coef in model.coefs_]
+    trainable.intercepts_ = [np.array(intercept, dtype=np.float64) for intercept in model.intercepts_]
+    # Adam empieza de cero con los pesos reales
+    del trainable._optimizer
+    return trainable
+
+
+def partial_fit_rows(model, scaler, df, rows, batch_size=ONLINE_BATCH_SIZE, replay_ratio=REPLAY_RATIO, seed=None):
+    """
+    partial_fit en mini-lotes sobre las filas indicadas más una muestra de replay
+
+    Returns:
+        int: Filas usadas para entrenar
+    """
+    rng = np.random.default_rng(seed)
+    n_replay = min(int(len(rows) * replay_ratio), len(df))
+    replay = rng.choice(len(df), size=n_replay, replace=False) if n_replay else np.empty(0, dtype=np.int64)
+
+    train_rows = rng.permutation(np.concatenate([rows, replay]).astype(np.int64))
+    X = scaler.transform(df[FEATURES].iloc[train_rows])
+    y = df['quality_score'].to_numpy(dtype=np.float64)[train_rows]
+
+    with warnings.catch_warnings():
+        # Un mini-lote nunca "converge": es esperado
+        warnings.simplefilter('ignore')
+        for start in range(0, len(train_rows), batch_size):
+            model.partial_fit(X[start:start + batch_size], y[start:start + batch_size])
+
+    return len(train_rows)
+
+
+def apply_metric_events(df, events, model, scaler, batch_size=ONLINE_BATCH_SIZE, replay_ratio=REPLAY_RATIO):
+    """
+    Aplicar un lote de eventos a un catálogo y a su modelo
+
+    Ni `df` ni `model` se modifican (se devuelven copias actualizadas).
+
+    Returns:
+        tuple: (nuevo DataFrame, nuevo modelo, dict con estadísticas)
+    """
+    events = read_events(events)
+    updates, ignored = metric_updates(df, events)
+
+    df, stats = apply_metric_updates(df, updates, model, scaler)
+    stats = {'events': len(events), 'roadmaps': stats['updated'], 'ignored_roadmaps': ignored,
+             'rescored_all': stats['rescored_all']}
+    if model is None or len(updates) == 0:
+        return df, model, {**stats, 'trained_rows': 0}
+
+    rows = roadmap_positions(df, updates['roadmap_id'])
+    rows = np.sort(rows[rows >= 0])
+
+    error = validated_kernel_error(model, scaler)
+    model = trainable_model(model)
+    stats['trained_rows'] = partial_fit_rows(model, scaler, df, rows, batch_size, replay_ratio)
+    # Unos mini-lotes no cambian la precisión del kernel float32: se hereda la
+    # validación del modelo anterior (la instantánea la repite al exportar)
+    model.kernel_error = error
+    stats['loss'] = float(model.loss_)
+
+    # Scores de las filas afectadas con el modelo ya actualizado
+    rescore_rows(df, rows, quality_score_maxima(df), model, scaler)
+    return df, model, stats
+
+
+class SnapshotSchedule:
+    """Cuándo guardar una instantánea: cada `every_events` eventos o `every_seconds` segundos"""
+
+    def __init__(self, every_events=SNAPSHOT_EVENTS, every_seconds=SNAPSHOT_SECONDS):
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        self.pending_events = 0
+        self.last_snapshot = time.monotonic()
+
+    def record(self, n_events):
+        """Sumar eventos aplicados; True si toca instantánea"""
+        self.pending_events += n_events
+        return (
+            self.pending_events >= self.every_events
+            or time.monotonic() - self.last_snapshot >= self.every_seconds
+        )
+
+    def mark(self):
+        """Registrar que se acaba de guardar una instantánea"""
+        self.pending_events = 0
+        self.last_snapshot = time.monotonic()
+
+
+def iter_event_batches(path, batch_events):
+    """Lotes de `batch_events` eventos de un archivo (JSON lines se lee por bloques)"""
+    if path.endswith('.jsonl'):
+        with pd.read_json(path, lines=True, dtype=False, chunksize=batch_events) as reader:
+            yield from reader
+        return
+
+    events = read_delta(path)
+    for start in range(0, len(events), batch_events):
+        yield events.iloc[start:start + batch_events]
+
+
+def main():
+    """Aplicar un archivo de eventos (al servidor si está corriendo, o en este proceso)"""
+    parser = argparse.ArgumentParser(description='Actualizar métricas y modelo a partir de eventos')
+    parser.add_argument('dataset_path', help='Dataset (CSV, Parquet o directorio .npyds)')
+    parser.add_argument('events_path', help='Eventos (JSON lines, JSON o CSV)')
+    parser.add_argument('--batch-size', type=int, default=ONLINE_BATCH_SIZE, help='Filas por mini-lote de partial_fit')
+    parser.add_argument('--events-per-update', type=int, default=1000, help='Eventos por actualización')
+    parser.add_argument('--snapshot-every', type=int, default=SNAPSHOT_EVENTS, help='Eventos entre instantáneas')
+    args = parser.parse_args()
+
+    if min(args.batch_size, args.events_per_update, args.snapshot_every) < 1:
+        parser.error('--batch-size, --events-per-update y --snapshot-every deben ser positivos')
+
+    from recommender_client import request_server
+
+    try:
+        result = request_server('apply_events', args.dataset_path, {
+            'events_path': os.path.abspath(args.events_path),
+            'batch_size': args.batch_size
+        })
+        if result is None:
+            # Sin servidor: actualizar y guardar el modelo de ambos recomendadores aquí
+            from personalized_recommender import PersonalizedRecommender
+            from roadmap_recommender import build_recommender
+
+            personalized = PersonalizedRecommender(args.dataset_path, {})
+            personalized.ensure_model()
+            recommenders = {'roadmap': build_recommender(args.dataset_path), 'personalized': personalized}
+
+            schedule = SnapshotSchedule(args.snapshot_every, float('inf'))
+            result = {'events': 0, 'updates': 0, 'snapshots': 0}
+            for batch in iter_event_batches(args.events_path, args.events_per_update):
+                for recommender in recommenders.values():
+                    stats = recommender.apply_events(batch, args.batch_size)
+                result['events'] += stats['events']
+                result['updates'] += 1
+                if schedule.record(stats['events']):
+                    for recommender in recommenders.values():
+                        recommender.snapshot_model()
+                    schedule.mark()
+                    result['snapshots'] += 1
+
+            if schedule.pending_events:
+                for recommender in recommenders.values():
+                    recommender.snapshot_model()
+                result['snapshots'] += 1
+    except Exception as e:
+        print(json.dumps({'error': str(e)}, ensure_ascii=False))
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
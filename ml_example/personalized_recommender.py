@@ -4,28 +4,115 @@ Recomendador Personalizado de Roadmaps
 - Nuevos: Roadmaps con nodos diferentes para explorar
 """
 
+import sys
+
+if __name__ == '__main__':
+    # Como script, delegar en el servidor antes de importar pandas/NumPy/SciPy
+    # (ver recommender_cli.py); este módulo se importa solo si hay que calcular aquí
+    from recommender_cli import personalized_main
+    personalized_main()
+    sys.exit()
+
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.neural_network import MLPRegressor
-import json
-import sys
+import copy
+import hashlib
+import os
 import warnings
+from ann_index import load_or_build_ann_index
+from compact_catalogue import compact_catalogue, compact_enabled, is_compact, memory_report
+from dataset_store import load_dataset
+from online_learning import ONLINE_BATCH_SIZE, apply_metric_events
+from profiling import count_rows, stage
+from recommender_common import (
+    FEATURES, MODEL_VERSION, SCORE_COLUMNS, apply_catalogue_delta,
+    compute_quality_score, create_quality_model, dataset_fingerprint,
+    load_model_artifact, load_or_compute_scores, save_model_artifact,
+    take_columns, top_k_indices, with_columns
+)
+from result_cache import ResultCache, next_scores_version
+from tag_index import TagIndex
+from tag_query import as_tag_query, format_tag_query, is_tag_query, parse_tag_query, query_rows
+from user_profiles import UserProfileStore, build_profile, normalize_nodes
 warnings.filterwarnings('ignore')
 
+# Columnas que se devuelven por cada roadmap recomendado
+RESULT_COLUMNS = [
+    'roadmap_id', 'name', 'tags', 'final_score', 'completion_rate',
+    'usefulness_score', 'efficiency_rate', 'avg_hours_spent', 'bookmark_count'
+]
+
+# Recuperación de la categoría "similares": 'exact' (todo el catálogo) o 'ann'
+# (candidatos del índice ANN, ver ann_index.py)
+RETRIEVAL_ENV = 'ROADMAP_RETRIEVAL'
+
+# Candidatos que devuelve el índice ANN para el scoring exacto
+ANN_CANDIDATES = 1000
+
+# Por debajo de este tamaño de catálogo la similitud exacta es más barata
+ANN_MIN_ROWS = 20000
+
 class PersonalizedRecommender:
-    def __init__(self, dataset_path, user_data):
+    def __init__(self, dataset_path, user_data, catalogue=None, compact=None):
         """
         Inicializar recomendador personalizado
         
         Args:
-            dataset_path: Ruta al CSV del dataset
+            dataset_path: Ruta al dataset (CSV, Parquet o directorio .npyds)
             user_data: Dict con completed_roadmaps, completed_nodes, etc.
+            catalogue: (df preparado, huella, TagIndex) ya cargados, p. ej. de un
+                catálogo compartido (ver shared_catalogue.py); sin él se lee
+                `dataset_path`
+            compact: Catálogo compacto (ver compact_catalogue.py); por defecto
+                según ROADMAP_CATALOGUE
         """
-        self.df = pd.read_csv(dataset_path)
+        if catalogue is not None:
+            self.df, self.fingerprint, self.tag_index = catalogue
+        else:
+            with stage('load_dataset'):
+                self.df = load_dataset(dataset_path)
+            with stage('fingerprint'):
+                self.fingerprint = dataset_fingerprint(self.df)
+        # Huella del dataset cargado: bajo ella se guardan las instantáneas del modelo
+        self.source_fingerprint = self.fingerprint
+        count_rows('dataset', len(self.df))
+        # Perfiles por user_id, compartidos con las vistas de for_user
+        self.profiles = UserProfileStore()
+        self.set_user_data(user_data)
+        
+        # scikit-learn solo se importa si hay que entrenar (ver train_model)
+        self.scaler = None
+        self.model = None
+        self.result_cache = ResultCache()
+        self._scores_version = next_scores_version()
+        # Filas e ids de tags del catálogo (los perfiles guardados dependen de ellos)
+        self._catalogue_version = next_scores_version()
+        self.retrieval = os.environ.get(RETRIEVAL_ENV, 'exact').lower()
+        # Compartido con las vistas de for_user (copy.copy copia la referencia);
+        # una copia que se va a actualizar necesita el suyo (ver copy_for_update)
+        self._ann_cache = {}
+        if catalogue is None:
+            self.prepare_data()
+            with stage('tag_index'):
+                self.tag_index = TagIndex(self.df['tags'])
+            if compact_enabled(compact):
+                with stage('compact'):
+                    self.df, self.tag_index = compact_catalogue(self.df, self.tag_index)
+        self.compact = is_compact(self.df)
+    
+    def set_user_data(self, user_data):
+        """
+        Asignar los datos del usuario (roadmaps y nodos completados)
         
+        Con `user_id` el perfil se guarda en self.profiles; si falta alguna de
+        las listas se usa la del perfil guardado (ver user_profile).
+        """
+        self.user_data = user_data
+        self.user_id = None
+        self._profile = None
         # Manejar ambos formatos: lista simple o dict con datos
         if isinstance(user_data, dict):
+            self.user_id = user_data.get('user_id')
             self.user_roadmap_ids = user_data.get('completed_roadmaps', [])
             self.user_node_ids = user_data.get('completed_nodes', [])
             self.total_roadmaps_completed = user_data.get('total_roadmaps_completed', len(self.user_roadmap_ids))
@@ -36,109 +123,340 @@ class PersonalizedRecommender:
             self.user_node_ids = []
             self.total_roadmaps_completed = len(self.user_roadmap_ids)
             self.total_nodes_completed = 0
-            
-        self.scaler = StandardScaler()
-        self.model = None
-        self.prepare_data()
+    
+    def for_user(self, user_data):
+        """
+        Crear una vista del recomendador para otro usuario
+        
+        Comparte dataset, scaler y modelo (sin copiarlos), de modo que un
+        proceso persistente puede atender a muchos usuarios con una sola carga.
+        """
+        view = copy.copy(self)
+        view.set_user_data(user_data)
+        return view
         
     def prepare_data(self):
         """Preparar datos y calcular quality score"""
         # Crear score de calidad
-        self.df['quality_score'] = (
-            self.df['completion_rate'] * 0.35 +
-            self.df['usefulness_score'] / 5 * 0.30 +
-            (1 - self.df['dropout_rate']) * 0.20 +
-            self.df['efficiency_rate'] / self.df['efficiency_rate'].max() * 0.15
-        )
-        
-        # Normalizar engagement_score
-        max_engagement = self.df['engagement_score'].max()
-        if max_engagement > 0:
-            self.df['quality_score'] += (self.df['engagement_score'] / max_engagement) * 0.10
-        
-        # Asegurar que esté entre 0 y 1
-        self.df['quality_score'] = self.df['quality_score'].clip(0, 1)
+        with stage('prepare_data'):
+            self.df['quality_score'] = compute_quality_score(self.df)
         
     def train_model(self):
         """Entrenar Red Neuronal para predecir calidad"""
-        features = [
-            'completion_count', 'dropout_count', 'avg_hours_spent',
-            'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
-            'completion_rate', 'efficiency_rate', 'engagement_score'
-        ]
+        from sklearn.preprocessing import StandardScaler
         
-        X = self.df[features]
+        X = self.df[FEATURES]
         y = self.df['quality_score']
         
         # Escalar features
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
         # Red Neuronal
-        self.model = MLPRegressor(
-            hidden_layer_sizes=(64, 32, 16),
-            activation='relu',
-            solver='adam',
-            alpha=0.001,
-            batch_size=32,
-            learning_rate='adaptive',
-            learning_rate_init=0.001,
-            max_iter=1000,
-            random_state=42,
-            early_stopping=True,
-            validation_fraction=0.1,
-            n_iter_no_change=50,
-            verbose=False
+        self.model = create_quality_model()
+        
+        with stage('train_model'):
+            self.model.fit(X_scaled, y)
+            score = self.model.score(X_scaled, y)
+        
+        self.precompute_scores()
+        
+        return score
+    
+    def precompute_scores(self, path='ml_example/models/'):
+        """Precalcular (o cargar del almacén) los scores de todo el catálogo"""
+        with stage('precompute_scores'):
+            scores = load_or_compute_scores(self.df, self.fingerprint, self.model, self.scaler, path)
+            self.df = with_columns(self.df, scores)
+        self._scores_version = next_scores_version()
+        # Las listas del índice ANN y score_order dependen de final_score
+        self._ann_cache.clear()
+    
+    def copy_for_update(self):
+        """
+        Copia para aplicar un delta o eventos y luego reemplazar a esta
+        
+        Comparte dataset, modelo y perfiles (versionados por catálogo) hasta que
+        se actualicen, pero no las cachés de resultados, del índice ANN ni de
+        ids: lo que la copia invalide o guarde no afecta a las peticiones que
+        siguen usando esta instancia.
+        """
+        updated = copy.copy(self)
+        updated.result_cache = ResultCache(self.result_cache.maxsize)
+        updated._ann_cache = {}
+        updated._id_index_df = None
+        return updated
+    
+    def apply_delta(self, delta):
+        """
+        Aplicar roadmaps nuevos o modificados sin recargar el dataset
+        
+        Args:
+            delta: Ruta a un JSON lines / CSV con filas completas, o DataFrame
+            
+        Raises:
+            SchemaChangedError: Si cambia el esquema (hace falta recarga completa)
+        """
+        self.df, self.tag_index, stats = apply_catalogue_delta(
+            self.df, delta, self.tag_index, self.model, self.scaler
         )
+        self.fingerprint = dataset_fingerprint(self.df.drop(columns=SCORE_COLUMNS, errors='ignore'))
+        self._scores_version = next_scores_version()
+        # La huella no cubre los tags: un delta puede cambiar el vocabulario
+        self._catalogue_version = next_scores_version()
+        # El índice ANN se reconstruye en la próxima consulta que lo use
+        self._ann_cache.clear()
+        return stats
+    
+    def apply_events(self, events, batch_size=ONLINE_BATCH_SIZE):
+        """
+        Actualizar métricas y modelo con eventos de los roadmaps (ver online_learning.py)
         
-        self.model.fit(X_scaled, y)
-        return self.model.score(X_scaled, y)
+        Solo se re-puntúan los roadmaps con eventos; el resto del catálogo toma
+        el modelo actualizado en la próxima instantánea (snapshot_model).
+        """
+        self.df, self.model, stats = apply_metric_events(self.df, events, self.model, self.scaler, batch_size)
+        self.fingerprint = dataset_fingerprint(self.df.drop(columns=SCORE_COLUMNS, errors='ignore'))
+        self._scores_version = next_scores_version()
+        self._ann_cache.clear()
+        return stats
     
-    def get_user_completed_nodes(self):
-        """Obtener todos los nodos/tags que el usuario ha completado"""
-        user_tags = set()
-        
-        # Si tenemos nodos completados directamente, usarlos
-        if self.user_node_ids:
-            # Los node_ids son los tags/temas reales
-            user_tags.update([str(node_id).lower() for node_id in self.user_node_ids])
-        
-        # También incluir tags de roadmaps completados
-        if self.user_roadmap_ids:
-            user_roadmaps = self.df[self.df['roadmap_id'].isin(self.user_roadmap_ids)]
-            for tags_str in user_roadmaps['tags'].dropna():
-                tags = [t.strip().lower() for t in str(tags_str).split(',')]
-                user_tags.update(tags)
-        
-        return user_tags
+    def snapshot_model(self, path='ml_example/models/'):
+        """
+        Guardar el modelo actualizado y re-puntuar todo el catálogo con él
+        
+        Se guarda bajo la huella del dataset cargado, así el próximo arranque
+        con ese mismo dataset usa el modelo ya actualizado.
+        """
+        if self.model is None:
+            return
+        save_model_artifact(path, 'personalized_model', self.source_fingerprint, self.model, self.scaler)
+        self.precompute_scores(path)
     
-    def calculate_similarity(self, roadmap_tags, user_tags):
+    def ann_index(self, path='ml_example/models/'):
         """
-        Calcular similitud entre un roadmap y los tags del usuario
+        Índice ANN del catálogo (se carga o construye la primera vez)
+        
+        Cada lista se ordena por final_score para que la búsqueda devuelva los
+        mejores roadmaps de cada grupo parecido al perfil.
         
         Returns:
-            float: Porcentaje de tags en común (0 a 1)
+            tuple: (índice, orden global por final_score), ambos del mismo df
+        """
+        # Una sola lectura del dict: otro hilo puede vaciarlo entre medio
+        cached = self._ann_cache.get('ann')
+        if cached is None:
+            with stage('ann_index'):
+                final_score = self.df['final_score'].to_numpy(dtype=np.float64)
+                index = load_or_build_ann_index(self.df, self.tag_index, path)
+                # Orden global por final_score: de ahí salen los "nuevos"
+                score_order = np.lexsort((np.arange(len(final_score)), -final_score))
+                cached = (index.order_by(final_score), score_order)
+                self._ann_cache['ann'] = cached
+        return cached
+    
+    def _uses_ann(self):
+        """¿Recuperar los similares con el índice ANN en lugar de todo el catálogo?"""
+        return self.retrieval == 'ann' and len(self.df) >= ANN_MIN_ROWS
+    
+    def _ann_similarity(self, tag, top_n, user_tags):
+        """
+        (cols, sims) de get_recommendations a partir del índice ANN
+        
+        Los similares salen de los candidatos del índice. Para los nuevos se
+        añaden los mejores roadmaps por final_score hasta tener top_n con
+        similitud < 0.3: así nunca se recomienda como nuevo un roadmap parecido
+        que el índice no devolvió. Con filtro de tag basta la similitud exacta
+        de las filas del tag.
+        """
+        if tag:
+            with stage('similarity'):
+                candidates = self._tag_rows(tag)
+                similarity = self.tag_index.similarity_rows(candidates, user_tags)
+        else:
+            index, score_order = self.ann_index()
+            with stage('ann_search'):
+                candidates = index.search(user_tags, ANN_CANDIDATES)
+            with stage('similarity'):
+                similarity = self.tag_index.similarity_rows(candidates, user_tags)
+                
+                needed = top_n + len(self.user_roadmap_ids)
+                blocks, block_sims = [candidates], [similarity]
+                for start in range(0, len(score_order), ANN_CANDIDATES):
+                    block = score_order[start:start + ANN_CANDIDATES]
+                    blocks.append(block)
+                    block_sims.append(self.tag_index.similarity_rows(block, user_tags))
+                    needed -= np.count_nonzero(block_sims[-1] < 0.3)
+                    if needed <= 0:
+                        break
+                
+                candidates, first = np.unique(np.concatenate(blocks), return_index=True)
+                similarity = np.concatenate(block_sims)[first]
+        
+        count_rows('ann_candidates', len(candidates))
+        nonzero = similarity > 0
+        return candidates[nonzero], similarity[nonzero]
+    
+    def _tag_rows(self, tag, exclude_rows=None):
+        """
+        Filas del filtro de get_recommendations, sin las de `exclude_rows`
+        
+        Un tag simple se busca con match(); una consulta ('q:python AND data')
+        se evalúa con bitmaps y las excluidas se quitan con un AND NOT.
+        """
+        if is_tag_query(tag):
+            return query_rows(self.tag_index, tag, exclude_rows)
+        
+        rows = self.tag_index.match(tag.lower().strip())
+        if exclude_rows is None:
+            return rows
+        return np.setdiff1d(rows, exclude_rows, assume_unique=True)
+    
+    def memory_report(self):
+        """Memoria del catálogo residente (ver compact_catalogue.memory_report)"""
+        return memory_report(self.df, self.tag_index)
+    
+    def _cache_version(self):
+        """Versión de los resultados: dataset + modelo + scores precalculados"""
+        return (self.fingerprint['schema'], self.fingerprint['content'], MODEL_VERSION, self._scores_version)
+    
+    def _recommendation_key(self, tag, top_n, user_tags, completed):
+        """
+        Clave de caché de un usuario: hash de su conjunto de tags y de los
+        roadmaps que completó (usuarios con el mismo perfil comparten entrada)
+        """
+        digest = hashlib.sha1()
+        digest.update('\x1f'.join(sorted(user_tags)).encode('utf-8'))
+        digest.update(np.asarray(completed, dtype=np.int64).tobytes())
+        if tag and is_tag_query(tag):
+            tag = ('query', format_tag_query(parse_tag_query(tag)))
+        elif tag:
+            tag = tag.lower().strip()
+        return ('recommendations', tag or None, top_n, digest.hexdigest())
+    
+    def save_model(self, path='ml_example/models/'):
+        """Guardar modelo entrenado (versionado por la huella del dataset)"""
+        return save_model_artifact(path, 'personalized_model', self.fingerprint, self.model, self.scaler)
+    
+    def load_model(self, path='ml_example/models/'):
+        """Cargar modelo entrenado si corresponde al dataset actual"""
+        with stage('load_model'):
+            artifact = load_model_artifact(path, 'personalized_model', self.fingerprint)
+        if artifact is None:
+            return False
+        
+        self.model, self.scaler = artifact
+        self.precompute_scores(path)
+        return True
+    
+    def ensure_model(self):
+        """Cargar el modelo guardado; entrenar solo si el dataset cambió"""
+        if self.model is not None:
+            return
+        
+        if not self.load_model():
+            self.train_model()
+            self.save_model()
+    
+    def get_user_completed_nodes(self):
+        """
+        Obtener todos los nodos/tags que el usuario ha completado
+        
+        Los node_ids son los tags/temas reales; a ellos se suman los tags de los
+        roadmaps completados (desde el índice de tags). Ver user_profile.
+        """
+        return self.user_profile().tags(self.tag_index)
+    
+    def _profile_version(self):
+        """
+        Versión del catálogo de la que dependen filas e ids de tags de un perfil
+
+        Los eventos (apply_events) solo cambian métricas; un delta puede cambiar
+        filas y vocabulario de tags aunque la huella (columnas numéricas) no cambie.
         """
-        if not user_tags:
-            return 0.0
+        return (self.fingerprint['schema'], self.fingerprint['content'], self._catalogue_version)
+    
+    def _build_profile(self, version, roadmap_ids, node_tags, base=None):
+        """build_profile sobre el índice y las filas de este catálogo"""
+        return build_profile(self.tag_index, self._roadmap_rows, version, roadmap_ids, node_tags, base)
+    
+    def user_profile(self):
+        """
+        Perfil del usuario: filas de sus roadmaps completados e ids de sus tags
         
-        roadmap_tag_set = set([t.strip().lower() for t in str(roadmap_tags).split(',')])
+        Con user_id sale del almacén de perfiles (una petición repetida no lo
+        reconstruye); sin él se construye para esta petición.
+        """
+        version = self._profile_version()
+        if self._profile is not None and self._profile.version == version:
+            return self._profile
+        
+        if self.user_id is None:
+            self._profile = self._build_profile(
+                version, frozenset(self.user_roadmap_ids), normalize_nodes(self.user_node_ids)
+            )
+            return self._profile
+        
+        data = self.user_data
+        self._profile = self.profiles.resolve(
+            self.user_id, version, self._build_profile,
+            data.get('completed_roadmaps'), data.get('completed_nodes')
+        )
         
-        # Intersección de tags
-        common_tags = roadmap_tag_set.intersection(user_tags)
+        # Listas que no vinieron en la petición: las del perfil guardado
+        if data.get('completed_roadmaps') is None:
+            self.user_roadmap_ids = list(self._profile.roadmap_ids)
+            self.total_roadmaps_completed = data.get('total_roadmaps_completed', len(self.user_roadmap_ids))
+        if data.get('completed_nodes') is None:
+            self.user_node_ids = list(self._profile.node_tags)
+            self.total_nodes_completed = data.get('total_nodes_completed', len(self.user_node_ids))
+        return self._profile
+    
+    def record_completion(self, user_id, roadmap_ids=(), node_ids=()):
+        """
+        Agregar roadmaps y/o nodos completados al perfil guardado de un usuario
+        
+        Solo se procesan los nuevos (ver user_profiles.py).
+        """
+        profile = self.profiles.record_completion(
+            user_id, self._profile_version(), self._build_profile, roadmap_ids, node_ids
+        )
+        return {
+            'user_id': user_id,
+            'completed_roadmaps': len(profile.roadmap_ids),
+            'completed_nodes': len(profile.node_tags),
+            'user_tags_count': len(profile.tag_ids) + len(profile.extra_tags)
+        }
+    
+    def _roadmap_id_index(self):
+        """Índice roadmap_id -> posición (se reconstruye si cambia self.df)"""
+        if getattr(self, '_id_index_df', None) is not self.df:
+            self._id_index = pd.Index(self.df['roadmap_id'])
+            self._id_index_df = self.df
+        return self._id_index
+    
+    def _roadmap_rows(self, roadmap_ids):
+        """Posiciones (ordenadas) de los roadmaps con esos ids; ignora ids desconocidos"""
+        index = self._roadmap_id_index()
+        if len(roadmap_ids) == 0:
+            return np.empty(0, dtype=np.int64)
         
-        # Similitud = tags en común / total de tags del roadmap
-        if len(roadmap_tag_set) == 0:
-            return 0.0
+        if not index.is_unique:
+            return np.flatnonzero(self.df['roadmap_id'].isin(roadmap_ids))
         
-        return len(common_tags) / len(roadmap_tag_set)
+        positions = index.get_indexer(pd.Index(list(roadmap_ids)))
+        return np.unique(positions[positions >= 0])
     
-    def get_recommendations(self, tag=None, top_n=5):
+    def get_recommendations(self, tag=None, top_n=5, query=None):
         """
         Obtener recomendaciones personalizadas en dos categorías
         
         Args:
-            tag: Tag opcional para filtrar
+            tag: Tag opcional para filtrar (con el prefijo 'q:' se toma como
+                consulta)
             top_n: Número de recomendaciones por categoría
+            query: Consulta booleana de tags opcional en lugar de `tag`,
+                p. ej. 'python AND data, NOT beginner' (ver tag_query.py)
             
         Returns:
             dict: {
@@ -146,129 +464,209 @@ class PersonalizedRecommender:
                 'new': [...]       # Roadmaps nuevos para explorar
             }
         """
-        # Obtener tags del usuario
-        user_tags = self.get_user_completed_nodes()
-        
-        # Filtrar roadmaps que el usuario ya completó
-        available = self.df[~self.df['roadmap_id'].isin(self.user_roadmap_ids)].copy()
-        
-        # Si se especificó un tag, filtrar por él
-        if tag:
-            tag = tag.lower().strip()
-            available = available[
-                available['tags'].str.lower().str.contains(tag, na=False, regex=False)
-            ]
+        if query is not None:
+            # Validar antes de cargar nada (ValueError si está mal formada)
+            parse_tag_query(query)
+            tag = as_tag_query(query)
         
-        if available.empty:
-            return {'similar': [], 'new': [], 'user_has_completed': len(self.user_roadmap_ids)}
-        
-        # Calcular similitud para cada roadmap
-        available['similarity'] = available['tags'].apply(
-            lambda tags: self.calculate_similarity(tags, user_tags)
-        )
+        # Cargar modelo guardado (o entrenar si el dataset cambió); esto deja
+        # precalculado final_score (predicción ML + quality score) por roadmap
+        self.ensure_model()
         
-        # Entrenar modelo si no está entrenado
-        if self.model is None:
-            self.train_model()
-        
-        # Predecir calidad con ML
-        features = [
-            'completion_count', 'dropout_count', 'avg_hours_spent',
-            'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
-            'completion_rate', 'efficiency_rate', 'engagement_score'
-        ]
-        
-        X = available[features]
-        X_scaled = self.scaler.transform(X)
-        available['predicted_quality'] = self.model.predict(X_scaled)
-        
-        # Score final combinando predicción ML y quality score
-        available['final_score'] = (
-            available['predicted_quality'] * 0.6 +
-            available['quality_score'] * 0.4
-        )
-        
-        # CATEGORÍA 1: SIMILARES (alta similitud con roadmaps completados)
-        # Ordenar por similitud y luego por calidad
-        similar = available[available['similarity'] > 0.2].copy()  # Al menos 20% de similitud
-        similar['combined_score'] = similar['similarity'] * 0.5 + similar['final_score'] * 0.5
-        similar = similar.nlargest(top_n, 'combined_score')
+        # Obtener tags del usuario
+        with stage('user_tags'):
+            user_tags = self.get_user_completed_nodes()
         
-        # CATEGORÍA 2: NUEVOS (baja similitud, para explorar)
-        # Ordenar por calidad pero con baja similitud
-        new = available[available['similarity'] < 0.3].copy()  # Menos de 30% de similitud
-        new = new.nlargest(top_n, 'final_score')
+        def user_similarity():
+            if self._uses_ann():
+                # Candidatos del índice ANN, con similitud exacta
+                return self._ann_similarity(tag, top_n, user_tags)
+            
+            # Calcular similitud de todo el catálogo en una sola operación dispersa
+            with stage('similarity'):
+                similarity = self.tag_index.similarity(user_tags)
+                cols = np.flatnonzero(similarity)
+            return cols, similarity[cols]
         
-        # Formatear resultados
-        similar_results = self._format_results(similar)
-        new_results = self._format_results(new)
+        final_score = self.df['final_score'].to_numpy(dtype=np.float64)
         
+        # Ranking sobre posiciones con argpartition (sin copiar ni ordenar frames)
+        return self._rank_for_user(tag, top_n, user_tags, user_similarity, final_score)
+    
+    def _build_response(self, similar_results, new_results, user_tags, total_available):
+        """Respuesta JSON de get_recommendations"""
         return {
             'similar': similar_results,
             'new': new_results,
             'user_has_completed': self.total_roadmaps_completed,
             'user_nodes_completed': self.total_nodes_completed,
             'user_tags_count': len(user_tags),
-            'total_available': len(available),
+            'total_available': total_available,
             'model_type': 'Neural Network (MLP)',
             'personalized': True
         }
     
-    def _format_results(self, df):
-        """Formatear resultados para JSON"""
-        results = []
-        for idx, row in df.iterrows():
-            results.append({
-                'roadmap_id': row['roadmap_id'],
-                'name': row['name'],
-                'tags': row['tags'],
-                'quality_score': round(float(row['final_score']), 4),
-                'similarity': round(float(row['similarity']), 4) if 'similarity' in row else 0,
-                'completion_rate': round(float(row['completion_rate']), 4),
-                'usefulness_score': round(float(row['usefulness_score']), 2),
-                'efficiency_rate': round(float(row['efficiency_rate']), 4),
-                'avg_hours_spent': round(float(row['avg_hours_spent']), 2),
-                'bookmark_count': int(row['bookmark_count']),
-            })
-        return results
-
-
-def main():
-    """Función principal para usar desde línea de comandos"""
-    if len(sys.argv) < 3:
-        print(json.dumps({
-            'error': 'Uso: python personalized_recommender.py <dataset_path> <user_roadmap_ids_json> [tag]'
-        }))
-        sys.exit(1)
+    def iter_batch_recommendations(self, users, top_n=5, batch_size=1000):
+        """
+        Recomendaciones para muchos usuarios con una sola carga de dataset y modelo
+        
+        La similitud de cada bloque de usuarios contra todo el catálogo se calcula
+        con un único producto disperso (usuarios x tags) · (tags x roadmaps).
+        
+        Args:
+            users: Iterable de dicts con completed_roadmaps, completed_nodes y,
+                opcionalmente, tag y user_id
+            top_n: Número de recomendaciones por categoría
+            batch_size: Usuarios por producto disperso
+            
+        Yields:
+            dict: Lo mismo que get_recommendations (con user_id si venía), en el
+                orden de entrada
+        """
+        self.ensure_model()
+        self._roadmap_id_index()
+        
+        final_score = self.df['final_score'].to_numpy(dtype=np.float64)
+        
+        # Orden global por final_score (empates por posición, como nlargest)
+        score_order = np.lexsort((np.arange(len(self.df)), -final_score))
+        
+        batch = []
+        for user in users:
+            batch.append(user)
+            if len(batch) >= batch_size:
+                yield from self._recommend_batch(batch, top_n, final_score, score_order)
+                batch = []
+        
+        if batch:
+            yield from self._recommend_batch(batch, top_n, final_score, score_order)
     
-    dataset_path = sys.argv[1]
-    user_roadmap_ids_arg = sys.argv[2]
-    tag = sys.argv[3] if len(sys.argv) > 3 else None
+    def _recommend_batch(self, users, top_n, final_score, score_order):
+        """Recomendaciones de un bloque de usuarios (ver iter_batch_recommendations)"""
+        views = [self.for_user(user) for user in users]
+        user_tags = [view.get_user_completed_nodes() for view in views]
+        
+        # Similitud de todos los usuarios del bloque en un solo producto disperso
+        overlap = (self.tag_index.tag_matrix(user_tags) @ self.tag_index.incidence.T).tocsr()
+        overlap.sort_indices()
+        
+        for i, (user, view) in enumerate(zip(users, views)):
+            cols = overlap.indices[overlap.indptr[i]:overlap.indptr[i + 1]]
+            sims = overlap.data[overlap.indptr[i]:overlap.indptr[i + 1]] / self.tag_index.row_tag_counts[cols]
+            
+            result = view._rank_for_user(
+                user.get('tag') if isinstance(user, dict) else None,
+                top_n, user_tags[i], lambda: (cols, sims), final_score, score_order
+            )
+            
+            if isinstance(user, dict) and 'user_id' in user:
+                result = {'user_id': user['user_id'], **result}
+            
+            yield result
     
-    try:
-        # Parsear datos del usuario
-        # Si empieza con @, leer desde archivo
-        if user_roadmap_ids_arg.startswith('@'):
-            file_path = user_roadmap_ids_arg[1:]  # Quitar el @
-            with open(file_path, 'r', encoding='utf-8') as f:
-                user_data = json.load(f)
-        else:
-            user_data = json.loads(user_roadmap_ids_arg)
+    def _rank_for_user(self, tag, top_n, user_tags, similarity, final_score, score_order=None):
+        """
+        Categorías similares / nuevos de un usuario, con caché LRU por perfil
         
-        # Inicializar recomendador
-        recommender = PersonalizedRecommender(dataset_path, user_data)
+        Args:
+            similarity: Función que devuelve (cols, sims): roadmaps con similitud
+                > 0 (posiciones ordenadas) y su similitud; solo se llama si el
+                resultado no está en caché
+            score_order: Orden global por final_score (lotes); sin él se usa
+                argpartition sobre el catálogo
+        """
+        completed = self.user_profile().rows
+        
+        version = self._cache_version()
+        key = self._recommendation_key(tag, top_n, user_tags, completed)
+        ranking = self.result_cache.get(version, key)
         
-        # Obtener recomendaciones
-        recommendations = recommender.get_recommendations(tag=tag, top_n=5)
+        if ranking is None:
+            cols, sims = similarity()
+            with stage('ranking'):
+                ranking = self._rank_rows(tag, top_n, completed, cols, sims, final_score, score_order)
+            self.result_cache.put(version, key, ranking)
+        count_rows('available', ranking['total_available'])
+        
+        if ranking['total_available'] == 0:
+            return {'similar': [], 'new': [], 'user_has_completed': len(self.user_roadmap_ids)}
         
-        print(json.dumps(recommendations, indent=2, ensure_ascii=False))
+        return self._build_response(ranking['similar'], ranking['new'], user_tags, ranking['total_available'])
     
-    except Exception as e:
-        print(json.dumps({
-            'error': str(e)
-        }, ensure_ascii=False))
-        sys.exit(1)
-
-
-if __name__ == '__main__':
-    main()
+    def _rank_rows(self, tag, top_n, completed, cols, sims, final_score, score_order):
+        """Categorías similares / nuevos trabajando con posiciones (sin caché)"""
+        if tag:
+            with stage('tag_filter'):
+                available = self._tag_rows(tag, completed)
+            count_rows('candidates', len(available))
+            total_available = len(available)
+        else:
+            available = None
+            total_available = len(self.df) - len(completed)
+        
+        if total_available == 0:
+            return {'similar': [], 'new': [], 'total_available': 0}
+        
+        # SIMILARES: similitud > 0.2, por similitud y calidad
+        mask = (sims > 0.2) & ~np.isin(cols, completed)
+        if available is not None:
+            mask &= np.isin(cols, available)
+        similar_rows = cols[mask]
+        combined_score = sims[mask] * 0.5 + final_score[similar_rows] * 0.5
+        top = top_k_indices(combined_score, top_n)
+        
+        # NUEVOS: similitud < 0.3, por calidad
+        excluded = np.union1d(completed, cols[sims >= 0.3])
+        if available is not None:
+            new_rows = available[~np.isin(available, excluded)]
+            new_rows = new_rows[top_k_indices(final_score[new_rows], top_n)]
+        elif score_order is None:
+            # Los excluidos quedan al final; se descartan si no hay suficientes
+            scores = final_score.copy()
+            scores[excluded] = -np.inf
+            new_rows = top_k_indices(scores, top_n)
+            new_rows = new_rows[~np.isin(new_rows, excluded)]
+        else:
+            # Recorrer el orden global saltando excluidos hasta juntar top_n
+            new_rows = []
+            step = max(top_n * 4, 64)
+            for start in range(0, len(score_order), step):
+                segment = score_order[start:start + step]
+                new_rows.extend(segment[~np.isin(segment, excluded)][:top_n - len(new_rows)])
+                if len(new_rows) >= top_n:
+                    break
+            new_rows = np.asarray(new_rows, dtype=np.int64)
+        
+        # Similitud de los nuevos (0 si no comparten tags con el usuario)
+        new_sims = np.zeros(len(new_rows))
+        if len(cols):
+            lookup = np.minimum(np.searchsorted(cols, new_rows), len(cols) - 1)
+            found = cols[lookup] == new_rows
+            new_sims[found] = sims[lookup[found]]
+        
+        with stage('formatting'):
+            return {
+                'similar': self._format_rows(similar_rows[top], sims[mask][top]),
+                'new': self._format_rows(new_rows, new_sims),
+                'total_available': total_available
+            }
+    
+    def _format_rows(self, rows, similarity):
+        """Formatear para JSON las filas indicadas (posiciones) con su similitud"""
+        values = take_columns(self.df, rows, RESULT_COLUMNS, self.tag_index)
+        
+        results = []
+        for i in range(len(rows)):
+            results.append({
+                'roadmap_id': values['roadmap_id'][i],
+                'name': values['name'][i],
+                'tags': values['tags'][i],
+                'quality_score': round(float(values['final_score'][i]), 4),
+                'similarity': round(float(similarity[i]), 4),
+                'completion_rate': round(float(values['completion_rate'][i]), 4),
+                'usefulness_score': round(float(values['usefulness_score'][i]), 2),
+                'efficiency_rate': round(float(values['efficiency_rate'][i]), 4),
+                'avg_hours_spent': round(float(values['avg_hours_spent'][i]), 2),
+                'bookmark_count': int(values['bookmark_count'][i]),
+            })
+        return results
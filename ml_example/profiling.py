@@ -0,0 +1,198 @@
+"""
+Instrumentación opcional de los recomendadores
+Mide el tiempo de cada etapa de una petición (carga del dataset, prepare_data,
+modelo, filtrado por tag, similitud, formateo...), el pico de memoria (RSS) y
+las filas procesadas, y lo agrega a la salida JSON como bloque `timings`.
+
+Se activa por petición:
+- CLI: `--profile` (y `--profile-dump <ruta>` para guardar un perfil completo)
+- Variables de entorno: ROADMAP_RECOMMENDER_PROFILE=1 y
+  ROADMAP_RECOMMENDER_PROFILE_DUMP=<ruta>
+- Servidor: `"profile": true` en los params
+
+El perfil completo se guarda con cProfile (.prof, se abre con snakeviz o
+pstats) o, si la ruta termina en .html y pyinstrument está instalado, con
+pyinstrument. Sin perfil activo, `stage()` no hace nada.
+"""
+
+import contextvars
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+PROFILE_ENV = 'ROADMAP_RECOMMENDER_PROFILE'
+PROFILE_DUMP_ENV = 'ROADMAP_RECOMMENDER_PROFILE_DUMP'
+
+# Perfil de la petición en curso (uno por hilo del servidor)
+_current_profile = contextvars.ContextVar('roadmap_request_profile', default=None)
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso en MB (None si no se puede medir)"""
+    try:
+        import resource
+    except ImportError:
+        # Windows no tiene el módulo resource
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB y macOS en bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class RequestProfile:
+    """Tiempos por etapa y filas procesadas durante una petición"""
+
+    def __init__(self):
+        self.stages = {}
+        self.rows = {}
+        self.dump_path = None
+        self._stack = []
+        self._start = time.perf_counter()
+        self._end = None
+
+    def add_stage(self, name, elapsed_ms):
+        """Acumular el tiempo de una etapa (las anidadas se nombran padre/hija)"""
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def finish(self):
+        """Marcar el fin de la petición"""
+        self._end = time.perf_counter()
+
+    def report(self):
+        """Bloque `timings` de la salida JSON"""
+        end = self._end if self._end is not None else time.perf_counter()
+        report = {
+            'total_ms': round((end - self._start) * 1000, 3),
+            'stages_ms': {name: round(ms, 3) for name, ms in self.stages.items()},
+            'rows': dict(self.rows),
+            'peak_rss_mb': peak_rss_mb()
+        }
+        if self.dump_path:
+            report['profile_dump'] = self.dump_path
+        return report
+
+
+@contextmanager
+def stage(name):
+    """Medir una etapa de la petición en curso (no hace nada si no hay perfil)"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    profile._stack.append(name)
+    path = '/'.join(profile._stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_stage(path, (time.perf_counter() - start) * 1000)
+        profile._stack.pop()
+
+
+def count_rows(name, count):
+    """Registrar cuántas filas procesó una etapa"""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.rows[name] = int(count)
+
+
+def _start_profiler(dump_path):
+    """Iniciar pyinstrument (si la ruta es .html y está instalado) o cProfile"""
+    if dump_path.endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            pass
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, dump_path):
+    """Detener el perfilador y guardar el resultado"""
+    if hasattr(profiler, 'output_html'):
+        profiler.stop()
+        with open(dump_path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+        return dump_path
+
+    profiler.disable()
+    if dump_path.endswith('.html'):
+        # pyinstrument no está instalado: guardar el perfil de cProfile
+        dump_path = os.path.splitext(dump_path)[0] + '.prof'
+    profiler.dump_stats(dump_path)
+    return dump_path
+
+
+@contextmanager
+def profile_request(enabled=True, dump_path=None):
+    """
+    Activar la instrumentación durante una petición
+
+    El bloque `timings` se obtiene con profile.report() al salir del `with`
+    (el perfil completo se guarda al salir).
+
+    Yields:
+        RequestProfile o None si no está activada
+    """
+    if not enabled:
+        yield None
+        return
+
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    profiler = _start_profiler(dump_path) if dump_path else None
+
+    try:
+        yield profile
+    finally:
+        profile.finish()
+        if profiler is not None:
+            profile.dump_path = _stop_profiler(profiler, dump_path)
+        _current_profile.reset(token)
+
+
+def add_timings(result, profile):
+    """Agregar el bloque `timings` a la respuesta (con el del servidor si respondió él)"""
+    timings = profile.report()
+    if 'timings' in result:
+        timings['server'] = result['timings']
+    return {**result, 'timings': timings}
+
+
+def parse_profile_args(argv):
+    """
+    Separar las opciones de perfilado de los argumentos posicionales del CLI
+
+    Returns:
+        tuple: (argv sin las opciones, perfil activado, ruta del volcado o None)
+    """
+    enabled = os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes')
+    dump_path = os.environ.get(PROFILE_DUMP_ENV) or None
+
+    args = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--profile':
+            enabled = True
+        elif arg == '--profile-dump' and i + 1 < len(argv):
+            dump_path = argv[i + 1]
+            i += 1
+        elif arg.startswith('--profile-dump='):
+            dump_path = arg.split('=', 1)[1]
+        else:
+            args.append(arg)
+        i += 1
+
+    # Pedir un volcado implica activar el perfil
+    return args, enabled or dump_path is not None, dump_path
@@ -0,0 +1,118 @@
+"""
+Línea de comandos de roadmap_recommender.py y personalized_recommender.py
+Solo usa la librería estándar: con el servidor persistente corriendo, cada
+`exec` de PHP le delega la petición sin importar pandas, NumPy, SciPy ni el
+resto de los módulos del recomendador. Estos se importan solo si el servidor no
+responde y hay que calcular en este proceso.
+"""
+
+import json
+import sys
+
+from profiling import add_timings, parse_profile_args, profile_request, stage
+from recommender_client import request_server
+
+
+def roadmap_main():
+    """CLI de roadmap_recommender.py: mejor roadmap para un tag"""
+    # --profile / --profile-dump <ruta>: agregar 'timings' a la salida
+    args, profiling, dump_path = parse_profile_args(sys.argv[1:])
+
+    if len(args) < 2:
+        print(json.dumps({
+            'error': 'Uso: python roadmap_recommender.py <dataset_path> <tag> [exclude_roadmaps] [--profile]'
+        }))
+        sys.exit(1)
+
+    dataset_path = args[0]
+    tag = args[1]
+    exclude_roadmaps = args[2].split(',') if len(args) > 2 and args[2] else []
+
+    try:
+        with profile_request(profiling, dump_path) as profile:
+            params = {
+                'tag': tag,
+                'exclude_roadmaps': exclude_roadmaps
+            }
+            if profiling:
+                params['profile'] = True
+
+            # Si el servidor persistente está corriendo, delegar en él
+            with stage('server_request'):
+                result = request_server('get_best_roadmap_by_tag', dataset_path, params)
+
+            if result is None:
+                # Sin servidor: cargar dataset y modelo en este proceso
+                from roadmap_recommender import build_recommender, recommend_best_roadmap
+                recommender = build_recommender(dataset_path)
+                result = recommend_best_roadmap(recommender, tag, exclude_roadmaps)
+
+        if profile is not None:
+            result = add_timings(result, profile)
+
+        if 'error' in result:
+            print(json.dumps(result, ensure_ascii=False))
+        else:
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    except Exception as e:
+        print(json.dumps({
+            'error': str(e)
+        }, ensure_ascii=False))
+        sys.exit(1)
+
+
+def personalized_main():
+    """CLI de personalized_recommender.py: recomendaciones para un usuario"""
+    # --profile / --profile-dump <ruta>: agregar 'timings' a la salida
+    args, profiling, dump_path = parse_profile_args(sys.argv[1:])
+
+    if len(args) < 2:
+        print(json.dumps({
+            'error': 'Uso: python personalized_recommender.py <dataset_path> <user_roadmap_ids_json> [tag] [--profile]'
+        }))
+        sys.exit(1)
+
+    dataset_path = args[0]
+    user_roadmap_ids_arg = args[1]
+    tag = args[2] if len(args) > 2 else None
+
+    try:
+        # Parsear datos del usuario
+        # Si empieza con @, leer desde archivo
+        if user_roadmap_ids_arg.startswith('@'):
+            file_path = user_roadmap_ids_arg[1:]  # Quitar el @
+            with open(file_path, 'r', encoding='utf-8') as f:
+                user_data = json.load(f)
+        else:
+            user_data = json.loads(user_roadmap_ids_arg)
+
+        with profile_request(profiling, dump_path) as profile:
+            params = {
+                'user_data': user_data,
+                'tag': tag,
+                'top_n': 5
+            }
+            if profiling:
+                params['profile'] = True
+
+            # Si el servidor persistente está corriendo, delegar en él
+            with stage('server_request'):
+                recommendations = request_server('get_recommendations', dataset_path, params)
+
+            if recommendations is None:
+                # Sin servidor: cargar dataset y entrenar en este proceso
+                from personalized_recommender import PersonalizedRecommender
+                recommender = PersonalizedRecommender(dataset_path, user_data)
+                recommendations = recommender.get_recommendations(tag=tag, top_n=5)
+
+        if profile is not None:
+            recommendations = add_timings(recommendations, profile)
+
+        print(json.dumps(recommendations, indent=2, ensure_ascii=False))
+
+    except Exception as e:
+        print(json.dumps({
+            'error': str(e)
+        }, ensure_ascii=False))
+        sys.exit(1)
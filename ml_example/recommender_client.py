@@ -0,0 +1,70 @@
+"""
+Cliente del servidor persistente de recomendaciones
+Solo usa la librería estándar: los scripts de línea de comandos lo usan para
+delegar en recommender_server.py cuando está corriendo, y si no responde
+calculan la recomendación en su propio proceso como siempre.
+"""
+
+import json
+import os
+import socket
+import urllib.error
+import urllib.request
+
+DEFAULT_SERVER_URL = 'http://127.0.0.1:8765'
+# Segundos para conectar y para cada lectura: un servidor colgado no debe
+# retener la petición de PHP (ROADMAP_RECOMMENDER_TIMEOUT lo cambia)
+DEFAULT_TIMEOUT = 5
+
+
+def get_server_url():
+    """URL del servidor (ROADMAP_RECOMMENDER_URL vacío desactiva el modo servidor)"""
+    return os.environ.get('ROADMAP_RECOMMENDER_URL', DEFAULT_SERVER_URL).rstrip('/')
+
+
+def request_server(method, dataset_path, params, timeout=None):
+    """
+    Ejecutar un método del recomendador en el servidor persistente
+
+    Args:
+        method: get_best_roadmap_by_tag, get_top_roadmaps_by_tag o get_recommendations
+        dataset_path: Ruta al dataset exportado por Laravel
+        params: Dict con los argumentos del método
+
+    Returns:
+        dict: Respuesta del servidor, o None si el servidor no está disponible
+    """
+    url = get_server_url()
+    if not url:
+        return None
+
+    if timeout is None:
+        timeout = float(os.environ.get('ROADMAP_RECOMMENDER_TIMEOUT', DEFAULT_TIMEOUT))
+
+    payload = json.dumps({
+        'method': method,
+        'dataset_path': os.path.abspath(dataset_path),
+        'params': params
+    }, ensure_ascii=False).encode('utf-8')
+
+    request = urllib.request.Request(
+        f'{url}/recommend',
+        data=payload,
+        headers={'Content-Type': 'application/json'}
+    )
+
+    # El servidor es local: no pasar por proxies configurados en el entorno
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        # El servidor respondió pero falló al calcular: propagar su error
+        try:
+            error = json.loads(e.read().decode('utf-8')).get('error', str(e))
+        except ValueError:
+            error = str(e)
+        raise RuntimeError(error)
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None
@@ -0,0 +1,751 @@
+"""
+Utilidades compartidas por los recomendadores de roadmaps
+- Features del modelo y cálculo del quality score
+- Huella (fingerprint) del dataset para versionar modelos guardados
+- Guardado/carga de artefactos del modelo y de los entrenamientos de train_roadmap_classifier.py
+- Almacén columnar de scores precalculados por roadmap
+- Deltas del catálogo y actualizaciones de métricas (re-puntuando solo las filas tocadas)
+"""
+
+import copy
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from mlp_inference import export_model_npz, load_model_npz, predict_quality, weights_digest
+
+# Features de entrada de la red neuronal (9 inputs)
+FEATURES = [
+    'completion_count', 'dropout_count', 'avg_hours_spent',
+    'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
+    'completion_rate', 'efficiency_rate', 'engagement_score'
+]
+
+# Columnas de las que depende el entrenamiento (features + las usadas en quality_score)
+TRAINING_COLUMNS = FEATURES + ['dropout_rate']
+
+# Subir cuando cambie la arquitectura, los features o el target del modelo
+MODEL_VERSION = 1
+
+# Columnas precalculadas por roadmap (una .npy por columna)
+SCORE_COLUMNS = ['quality_score', 'predicted_quality', 'final_score']
+
+
+class SchemaChangedError(ValueError):
+    """El delta no tiene el esquema del dataset residente: hace falta recarga completa"""
+
+
+def quality_score_maxima(df):
+    """Máximos del catálogo que normalizan el quality score"""
+    return df['efficiency_rate'].max(), df['engagement_score'].max()
+
+
+def compute_quality_score(df, maxima=None):
+    """
+    Score de calidad (0 a 1) combinando múltiples métricas
+
+    Args:
+        df: Roadmaps a puntuar
+        maxima: (max efficiency_rate, max engagement_score) del catálogo
+            completo; por defecto se calculan sobre `df`
+    """
+    max_efficiency, max_engagement = maxima if maxima is not None else quality_score_maxima(df)
+
+    quality_score = (
+        df['completion_rate'] * 0.35 +
+        df['usefulness_score'] / 5 * 0.30 +
+        (1 - df['dropout_rate']) * 0.20 +
+        df['efficiency_rate'] / max_efficiency * 0.15
+    )
+
+    # Normalizar engagement_score
+    if max_engagement > 0:
+        quality_score += (df['engagement_score'] / max_engagement) * 0.10
+
+    # Asegurar que esté entre 0 y 1
+    return quality_score.clip(0, 1)
+
+
+# Hiperparámetros ganadores de tune_models.py (los leen create_quality_model y
+# train_roadmap_classifier.py)
+TUNED_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'tuned_config.json')
+
+
+def load_tuned_config(path=TUNED_CONFIG_PATH):
+    """Configuración escrita por tune_models.py ({} si no existe o es de otra versión)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if config.get('version') != MODEL_VERSION:
+        return {}
+    return config
+
+
+def load_tuned_params(name, path=TUNED_CONFIG_PATH):
+    """Hiperparámetros ganadores de un modelo ('quality_model', 'classifier', 'regressor')"""
+    params = dict(load_tuned_config(path).get(name, {}).get('params', {}))
+    # JSON no tiene tuplas
+    if isinstance(params.get('hidden_layer_sizes'), list):
+        params['hidden_layer_sizes'] = tuple(params['hidden_layer_sizes'])
+    return params
+
+
+def create_quality_model(params=None):
+    """
+    RED NEURONAL (Multi-Layer Perceptron) que predice el quality score
+    Arquitectura: 9 inputs -> 64 neurons -> 32 neurons -> 16 neurons -> 1 output
+
+    Args:
+        params: Hiperparámetros que reemplazan a los de abajo; por defecto los
+            ganadores de tune_models.py (si se ejecutó)
+    """
+    # Solo se importa al entrenar: la inferencia usa mlp_inference (NumPy)
+    from sklearn.neural_network import MLPRegressor
+
+    config = dict(
+        hidden_layer_sizes=(64, 32, 16),  # 3 capas ocultas
+        activation='relu',                 # Función de activación ReLU
+        solver='adam',                     # Optimizador Adam
+        alpha=0.001,                       # Regularización L2
+        batch_size=32,                     # Tamaño de batch
+        learning_rate='adaptive',          # Learning rate adaptativo
+        learning_rate_init=0.001,          # Learning rate inicial
+        max_iter=1000,                     # Máximo de iteraciones
+        random_state=42,
+        early_stopping=True,               # Early stopping
+        validation_fraction=0.1,           # 10% para validación
+        n_iter_no_change=50,               # Paciencia para early stopping
+        verbose=False
+    )
+    config.update(load_tuned_params('quality_model') if params is None else params)
+
+    return MLPRegressor(**config)
+
+
+def json_default(value):
+    """Convertir tipos de NumPy a tipos nativos de Python (para json.dumps)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'Tipo no serializable: {type(value).__name__}')
+
+
+def _dtype_kind(dtype):
+    """Tipo lógico de una columna, igual para CSV, Parquet y .npyds"""
+    if dtype.kind in 'biuf':
+        return dtype.kind
+    return 'str'
+
+
+class DatasetFingerprint:
+    """
+    Huella del dataset calculada por bloques (ver dataset_fingerprint)
+
+    Recorrer el dataset en orden con update() da la misma huella que
+    dataset_fingerprint() sobre el DataFrame completo, sin tenerlo en memoria.
+    El esquema se toma del primer bloque.
+    """
+
+    def __init__(self):
+        self.schema = None
+        self._content = hashlib.sha1()
+
+    def update(self, chunk):
+        """Agregar el siguiente bloque de filas"""
+        if self.schema is None:
+            schema = json.dumps([[col, _dtype_kind(dtype)] for col, dtype in chunk.dtypes.items()])
+            self.schema = hashlib.sha1(schema.encode('utf-8')).hexdigest()[:16]
+
+        columns = [col for col in TRAINING_COLUMNS if col in chunk.columns]
+        self._content.update(pd.util.hash_pandas_object(chunk[columns], index=False).values.tobytes())
+
+    def result(self):
+        """dict con 'schema' y 'content'"""
+        return {'schema': self.schema, 'content': self._content.hexdigest()[:16]}
+
+
+def dataset_fingerprint(df):
+    """
+    Calcular la huella del dataset
+
+    Returns:
+        dict: {
+            'schema': hash de columnas y tipos lógicos,
+            'content': hash de los valores usados para entrenar
+        }
+    """
+    fingerprint = DatasetFingerprint()
+    fingerprint.update(df)
+    return fingerprint.result()
+
+
+def weights_path(artifact_path):
+    """Ruta de los pesos .npz de un artefacto (.joblib / .pkl)"""
+    return os.path.splitext(artifact_path)[0] + '.npz'
+
+
+def save_directory(path, write):
+    """
+    Escribir un directorio de artefactos de forma atómica
+
+    `write(tmp_path)` llena un directorio temporal que luego se renombra a
+    `path`, así otro proceso nunca lo lee a medio escribir. Si otro proceso ya
+    guardó el mismo directorio, se descarta el temporal.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+    return path
+
+
+def remove_old_artifacts(path, pattern, keep_last, companions=()):
+    """
+    Borrar los artefactos de `pattern` en `path` salvo los `keep_last` más recientes
+
+    `companions` son extensiones de archivos que acompañan a cada artefacto
+    (p. ej. '.npz' para los pesos de un .joblib) y se borran con él.
+    """
+    def modified(artifact):
+        try:
+            return os.path.getmtime(artifact)
+        except OSError:
+            return 0.0
+
+    artifacts = sorted(
+        (old for old in glob.glob(os.path.join(path, pattern)) if not old.endswith('.tmp')),
+        key=modified,
+        reverse=True
+    )
+    for old_path in artifacts[keep_last:]:
+        if os.path.isdir(old_path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            continue
+        stem = os.path.splitext(old_path)[0]
+        for old_file in [old_path] + [stem + extension for extension in companions]:
+            try:
+                os.remove(old_file)
+            except OSError:
+                pass
+
+
+def model_artifact_path(path, prefix, fingerprint):
+    """Ruta del artefacto versionado para una huella de dataset"""
+    return os.path.join(
+        path,
+        f"{prefix}_v{MODEL_VERSION}_{fingerprint['schema']}_{fingerprint['content']}.joblib"
+    )
+
+
+def save_model_artifact(path, prefix, fingerprint, model, scaler, keep_last=3):
+    """
+    Guardar modelo y scaler en un único artefacto versionado
+
+    Junto al .joblib se exportan los pesos a .npz (mismo nombre), que es lo que
+    cargan los recomendadores para puntuar sin importar scikit-learn.
+
+    La escritura es atómica (archivo temporal + rename) para que otro proceso
+    nunca lea un artefacto a medio escribir. Se conservan solo los últimos
+    `keep_last` artefactos del mismo prefijo.
+    """
+    import joblib
+
+    os.makedirs(path, exist_ok=True)
+    artifact_path = model_artifact_path(path, prefix, fingerprint)
+    tmp_path = f'{artifact_path}.{os.getpid()}.tmp'
+
+    joblib.dump({
+        'version': MODEL_VERSION,
+        'fingerprint': fingerprint,
+        'model': model,
+        'scaler': scaler
+    }, tmp_path)
+    os.replace(tmp_path, artifact_path)
+    if hasattr(model, 'coefs_'):
+        export_model_npz(model, scaler, weights_path(artifact_path))
+
+    remove_old_artifacts(path, f'{prefix}_v*.joblib', keep_last, companions=('.npz',))
+
+    return artifact_path
+
+
+def load_model_artifact(path, prefix, fingerprint):
+    """
+    Cargar el artefacto que corresponde a la huella del dataset
+
+    Se usan los pesos .npz (inferencia con NumPy, sin scikit-learn) si existen;
+    si no, el .joblib completo.
+
+    Returns:
+        tuple: (model, scaler) o None si no existe o no coincide la versión
+    """
+    artifact_path = model_artifact_path(path, prefix, fingerprint)
+    if not os.path.exists(artifact_path):
+        return None
+
+    # El nombre ya incluye versión y huella, así que los pesos valen tal cual
+    if os.path.exists(weights_path(artifact_path)):
+        try:
+            return load_model_npz(weights_path(artifact_path))
+        except (OSError, KeyError, ValueError):
+            pass
+
+    import joblib
+
+    try:
+        artifact = joblib.load(artifact_path)
+    except Exception:
+        return None
+
+    if artifact.get('version') != MODEL_VERSION or artifact.get('fingerprint') != fingerprint:
+        return None
+
+    # Artefacto anterior a los .npz: exportar los pesos para el próximo arranque
+    if hasattr(artifact['model'], 'coefs_'):
+        try:
+            export_model_npz(artifact['model'], artifact['scaler'], weights_path(artifact_path))
+        except OSError:
+            pass
+
+    return artifact['model'], artifact['scaler']
+
+
+def training_run_path(path, fingerprint, prefix='efficiency'):
+    """Directorio versionado de un entrenamiento de train_roadmap_classifier.py"""
+    return os.path.join(path, f"{prefix}_v{MODEL_VERSION}_{fingerprint['schema']}_{fingerprint['content']}")
+
+
+def save_training_run(path, fingerprint, artifacts, manifest, prefix='efficiency', keep_last=3):
+    """
+    Guardar los artefactos de un entrenamiento en su directorio versionado
+
+    Cada artefacto se guarda con joblib (<nombre>.joblib) junto a un
+    manifest.json con la versión, la huella del dataset, los parámetros y las
+    métricas. El directorio se escribe aparte y se renombra al final, así que
+    un recomendador nunca ve un entrenamiento a medio guardar. Se conservan
+    solo los últimos `keep_last` directorios del mismo prefijo.
+    """
+    import joblib
+
+    os.makedirs(path, exist_ok=True)
+    run_path = training_run_path(path, fingerprint, prefix)
+    tmp_path = f'{run_path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, value in artifacts.items():
+        joblib.dump(value, os.path.join(tmp_path, f'{name}.joblib'))
+
+    manifest = {**manifest, 'version': MODEL_VERSION, 'fingerprint': fingerprint, 'artifacts': sorted(artifacts)}
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, default=json_default)
+
+    # Re-entrenar con el mismo dataset reemplaza el directorio anterior
+    shutil.rmtree(run_path, ignore_errors=True)
+    os.replace(tmp_path, run_path)
+
+    remove_old_artifacts(path, f'{prefix}_v*', keep_last)
+
+    return run_path
+
+
+def load_training_run(path, fingerprint, prefix='efficiency'):
+    """
+    Cargar los artefactos del entrenamiento que corresponde a la huella del dataset
+
+    Returns:
+        dict: {nombre: objeto, ..., 'manifest': dict} o None si no existe o no
+        coincide la versión
+    """
+    run_path = training_run_path(path, fingerprint, prefix)
+    try:
+        with open(os.path.join(run_path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != MODEL_VERSION or manifest.get('fingerprint') != fingerprint:
+        return None
+
+    import joblib
+
+    try:
+        run = {name: joblib.load(os.path.join(run_path, f'{name}.joblib')) for name in manifest['artifacts']}
+    except Exception:
+        return None
+
+    run['manifest'] = manifest
+    return run
+
+
+def predict_efficiency(run, df, tags):
+    """
+    Predicciones de los modelos de train_roadmap_classifier.py
+
+    Args:
+        run: Entrenamiento cargado con load_training_run()
+        df: Filas a predecir (con las columnas del exportador)
+        tags: Texto de los tags de esas filas (el primero es el tema principal)
+
+    Returns:
+        dict: 'efficiency_label' (Low/Medium/High) y 'predicted_usefulness', un
+            valor por fila
+    """
+    # Mismo código que LabelEncoder; un tema que no vio el entrenamiento queda en -1
+    topics = pd.Series(tags, dtype=object).astype(str).str.split(',').str[0]
+    topic_encoded = pd.Index(run['topic_encoder'].classes_).get_indexer(topics)
+
+    predictions = {}
+    for name, output in (('classifier', 'efficiency_label'), ('regressor', 'predicted_usefulness')):
+        part = run[name]
+        X = pd.DataFrame({
+            col: topic_encoded if col == 'topic_encoded' else df[col].to_numpy(dtype=np.float64)
+            for col in part['features']
+        })
+        predictions[output] = part['model'].predict(part['scaler'].transform(X))
+    return predictions
+
+
+def top_k_indices(scores, k):
+    """
+    Índices de los k mayores scores, de mayor a menor
+
+    Usa argpartition (O(n)) y solo ordena los seleccionados. Los empates se
+    resuelven por posición, igual que DataFrame.nlargest(keep='first').
+    """
+    scores = np.asarray(scores)
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if len(scores) > k:
+        # Umbral = k-ésimo mayor score; se conservan también sus empates
+        threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def with_columns(df, columns):
+    """
+    DataFrame con columnas nuevas o reemplazadas, sin copiar ningún array
+
+    `df[col] = array` copia el array; así las columnas abiertas con memory-map
+    (almacén de scores, catálogo compartido) siguen apuntando al archivo.
+    """
+    data = {col: columns[col] if col in columns else df[col] for col in df.columns}
+    data.update({col: values for col, values in columns.items() if col not in data})
+    return pd.DataFrame(data, copy=False)
+
+
+def take_columns(df, rows, columns, tag_index=None):
+    """
+    Valores (tipos nativos de Python) de las columnas indicadas para unas posiciones
+
+    En un catálogo compacto 'tags' no está en `df` y su texto sale de `tag_index`.
+    """
+    return {
+        col: tag_index.row_text(rows) if col not in df.columns and col == 'tags' and tag_index is not None
+        else df[col].iloc[rows].tolist()
+        for col in columns
+    }
+
+
+def score_catalogue(df, model, scaler):
+    """
+    Calcular los scores de todo el catálogo en una sola pasada
+
+    Returns:
+        dict: quality_score, predicted_quality y final_score (arrays por fila)
+    """
+    quality_score = df['quality_score'].to_numpy(dtype=np.float64)
+
+    # Sin modelo, el score final es el quality score calculado
+    if model is None or len(df) == 0:
+        return {
+            'quality_score': quality_score,
+            'predicted_quality': np.full(len(df), np.nan),
+            'final_score': quality_score.copy()
+        }
+
+    # Un solo forward pass en float32 con el scaler plegado en la primera capa
+    predicted_quality = predict_quality(model, scaler, df[FEATURES])
+
+    # Combinar predicción con score calculado
+    return {
+        'quality_score': quality_score,
+        'predicted_quality': predicted_quality,
+        'final_score': predicted_quality * 0.6 + quality_score * 0.4
+    }
+
+
+def model_digest(model, scaler):
+    """Hash del modelo: sus pesos si es un MLP (entrenado o cargado del .npz)"""
+    if hasattr(model, 'coefs_') and hasattr(scaler, 'mean_'):
+        return weights_digest(model, scaler)
+
+    import joblib
+    return joblib.hash((model, scaler))
+
+
+def score_store_key(df, fingerprint, model, scaler):
+    """Clave del almacén de scores: dataset + orden de roadmaps + modelo"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps(fingerprint, sort_keys=True).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df['roadmap_id'], index=False).values.tobytes())
+    digest.update(model_digest(model, scaler).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def load_or_compute_scores(df, fingerprint, model, scaler, path='ml_example/models/', keep_last=3):
+    """
+    Cargar los scores precalculados del catálogo, o calcularlos y guardarlos
+
+    El almacén es un directorio scores_<clave>/ con una .npy por columna, que se
+    abre con memory-map. Como la clave incluye el modelo, dos recomendadores con
+    el mismo dataset y el mismo modelo comparten el almacén.
+    """
+    if model is None:
+        return score_catalogue(df, model, scaler)
+
+    store_path = os.path.join(path, f'scores_{score_store_key(df, fingerprint, model, scaler)}')
+
+    if os.path.isdir(store_path):
+        try:
+            scores = {
+                col: np.load(os.path.join(store_path, f'{col}.npy'), mmap_mode='r')
+                for col in SCORE_COLUMNS
+            }
+            if all(len(values) == len(df) for values in scores.values()):
+                return scores
+        except (OSError, ValueError):
+            pass
+
+    scores = score_catalogue(df, model, scaler)
+
+    def write(tmp_path):
+        for col in SCORE_COLUMNS:
+            np.save(os.path.join(tmp_path, f'{col}.npy'), np.asarray(scores[col], dtype=np.float64))
+
+    try:
+        os.makedirs(path, exist_ok=True)
+        save_directory(store_path, write)
+    except OSError:
+        # El almacén es solo una caché: si no se puede escribir, seguir igual
+        return scores
+
+    remove_old_artifacts(path, 'scores_*', keep_last)
+    return scores
+
+
+def read_delta(delta):
+    """Leer un delta de roadmaps: DataFrame, JSON lines (.jsonl), JSON o CSV"""
+    if isinstance(delta, pd.DataFrame):
+        return delta
+
+    if delta.endswith('.jsonl'):
+        return pd.read_json(delta, lines=True, dtype=False)
+    if delta.endswith('.json'):
+        return pd.read_json(delta, dtype=False)
+    return pd.read_csv(delta)
+
+
+def roadmap_positions(df, roadmap_ids):
+    """
+    Posición de fila de cada roadmap_id (-1 si no está en el catálogo)
+
+    Raises:
+        SchemaChangedError: Si el catálogo tiene roadmap_id repetidos: no se
+            sabe qué fila actualizar, hace falta recarga completa
+    """
+    index = pd.Index(df['roadmap_id'])
+    if not index.is_unique:
+        raise SchemaChangedError('El catálogo tiene roadmap_id repetidos: hace falta recarga completa')
+    return index.get_indexer(roadmap_ids)
+
+
+def apply_catalogue_delta(df, delta, tag_index, model, scaler):
+    """
+    Aplicar filas nuevas o modificadas al catálogo residente
+
+    Solo se procesan las filas tocadas: se re-indexan sus tags, se recalcula
+    su quality score y se vuelve a predecir su calidad con el modelo. Si el
+    delta cambia los máximos que normalizan el quality score, este se
+    recalcula (vectorizado) para todo el catálogo, pero sin inferencia.
+
+    Args:
+        df: Catálogo residente (con quality_score y, si hay modelo, los scores)
+        delta: Filas con todas las columnas del dataset (ver read_delta)
+        tag_index: TagIndex del catálogo
+
+    Returns:
+        tuple: (nuevo DataFrame, nuevo TagIndex, dict con estadísticas)
+
+    Ni `df` ni `tag_index` se modifican: quien los esté leyendo en paralelo
+    sigue viendo el catálogo anterior completo.
+
+    Raises:
+        SchemaChangedError: Si el delta no tiene las mismas columnas y tipos, o
+            el catálogo tiene roadmap_id repetidos
+    """
+    if 'tags' not in df.columns:
+        # Catálogo compacto (ver compact_catalogue.py): el texto de los tags está en el TagIndex
+        raise SchemaChangedError('El catálogo compacto no admite deltas: hace falta recarga completa')
+
+    delta = read_delta(delta)
+    # Antes de copiar nada: un catálogo con ids repetidos no admite deltas
+    roadmap_positions(df, [])
+    raw_columns = [col for col in df.columns if col not in SCORE_COLUMNS]
+
+    missing = [col for col in raw_columns if col not in delta.columns]
+    extra = [col for col in delta.columns if col not in raw_columns]
+    if missing or extra:
+        raise SchemaChangedError(f'Columnas distintas en el delta (faltan: {missing}, nuevas: {extra})')
+
+    for col in raw_columns:
+        if _dtype_kind(df[col].dtype) in 'biuf' and _dtype_kind(delta[col].dtype) not in 'biuf':
+            raise SchemaChangedError(f'La columna {col} dejó de ser numérica')
+
+    delta = delta[raw_columns].drop_duplicates('roadmap_id', keep='last').reset_index(drop=True)
+
+    df = df.copy(deep=False)
+    tag_index = copy.copy(tag_index)
+
+    # Mismos tipos que el catálogo (p. ej. ids numéricos leídos desde JSON como texto)
+    for col in raw_columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            new_values = pd.Index(delta[col].dropna().astype(str).unique())
+            new_values = new_values.difference(df[col].cat.categories)
+            if len(new_values):
+                df[col] = df[col].cat.add_categories(new_values)
+            delta[col] = delta[col].astype(str).astype(df[col].dtype)
+        elif _dtype_kind(df[col].dtype) in 'biuf':
+            delta[col] = delta[col].astype(df[col].dtype)
+        else:
+            delta[col] = delta[col].astype(str)
+
+    positions = roadmap_positions(df, delta['roadmap_id'])
+    existing = positions >= 0
+    n_before = len(df)
+    old_maxima = quality_score_maxima(df)
+
+    # Filas modificadas: copiar cada columna una vez y sobreescribir sus posiciones
+    if existing.any():
+        for col in raw_columns:
+            values = df[col].array.copy()
+            values[positions[existing]] = delta.loc[existing, col].array
+            df[col] = values
+
+    # Filas nuevas: se agregan al final (sus scores se calculan abajo)
+    if (~existing).any():
+        df = pd.concat([df, delta.loc[~existing]], ignore_index=True)
+        positions[~existing] = np.arange(n_before, len(df))
+
+    touched = np.sort(positions)
+    tag_index.update(touched, df['tags'].iloc[touched], len(df))
+    rescore_all = rescore_rows(df, touched, old_maxima, model, scaler)
+
+    return df, tag_index, {
+        'updated': int(existing.sum()),
+        'added': int((~existing).sum()),
+        'rescored_all': bool(rescore_all),
+        'total_rows': len(df)
+    }
+
+
+def rescore_rows(df, touched, old_maxima, model, scaler):
+    """
+    Recalcular en `df` (ya copiado) quality_score y scores de las filas tocadas
+
+    Returns:
+        bool: True si cambiaron los máximos y se recalculó el quality score de todo el catálogo
+    """
+    # Quality score: solo filas tocadas, salvo que cambien los máximos
+    maxima = quality_score_maxima(df)
+    rescore_all = maxima != old_maxima
+    quality_score = df['quality_score'].to_numpy(dtype=np.float64, na_value=np.nan).copy()
+    if rescore_all:
+        quality_score = compute_quality_score(df, maxima).to_numpy(dtype=np.float64)
+    else:
+        quality_score[touched] = compute_quality_score(df.iloc[touched], maxima).to_numpy(dtype=np.float64)
+    df['quality_score'] = quality_score
+
+    # Predicción del modelo: solo filas tocadas
+    if 'final_score' in df.columns:
+        predicted_quality = df['predicted_quality'].to_numpy(dtype=np.float64, na_value=np.nan).copy()
+        if model is not None:
+            predicted_quality[touched] = predict_quality(model, scaler, df.iloc[touched][FEATURES])
+            final_score = predicted_quality * 0.6 + quality_score * 0.4
+        else:
+            final_score = quality_score.copy()
+        df['predicted_quality'] = predicted_quality
+        df['final_score'] = final_score
+
+    return rescore_all
+
+
+def apply_metric_updates(df, updates, model, scaler):
+    """
+    Reemplazar métricas numéricas de roadmaps existentes y re-puntuarlos
+
+    A diferencia de apply_catalogue_delta no toca tags ni agrega filas (sirve
+    también para catálogos compactos). Los ids que no están en el catálogo se
+    ignoran.
+
+    Args:
+        df: Catálogo residente (no se modifica)
+        updates: DataFrame con 'roadmap_id' y las columnas numéricas a reemplazar
+
+    Returns:
+        tuple: (nuevo DataFrame, dict con estadísticas)
+
+    Raises:
+        SchemaChangedError: Si el catálogo tiene roadmap_id repetidos
+    """
+    columns = [col for col in updates.columns if col != 'roadmap_id']
+    unknown = [col for col in columns if col not in df.columns or _dtype_kind(df[col].dtype) not in 'biuf']
+    if unknown:
+        raise ValueError(f'Columnas no numéricas o desconocidas en la actualización: {unknown}')
+
+    positions = roadmap_positions(df, updates['roadmap_id'])
+    known = positions >= 0
+    touched = positions[known]
+
+    df = df.copy(deep=False)
+    old_maxima = quality_score_maxima(df)
+    for col in columns:
+        values = df[col].to_numpy(copy=True)
+        new_values = updates.loc[known, col].to_numpy()
+        if values.dtype.kind in 'iu' and len(new_values) and (
+            new_values.min() < np.iinfo(values.dtype).min or new_values.max() > np.iinfo(values.dtype).max
+        ):
+            # Catálogo compacto: el contador ya no cabe en su entero pequeño
+            values = values.astype(np.int64)
+        values[touched] = new_values
+        df[col] = values
+
+    touched = np.sort(touched)
+    rescore_all = rescore_rows(df, touched, old_maxima, model, scaler)
+
+    return df, {
+        'updated': int(known.sum()),
+        'unknown': int((~known).sum()),
+        'rescored_all': bool(rescore_all),
+        'total_rows': len(df)
+    }
@@ -0,0 +1,712 @@
+"""
+Servidor persistente para los recomendadores de roadmaps
+Mantiene en memoria el dataset, el scaler y la red neuronal para no pagar en
+cada petición el arranque de Python, la importación de pandas/sklearn, la
+lectura del CSV y la carga (o entrenamiento) del modelo.
+
+Los scripts roadmap_recommender.py y personalized_recommender.py siguen
+funcionando igual desde PHP: si el servidor está corriendo le delegan el
+cálculo, y si no, lo hacen en su propio proceso.
+
+Las conexiones se atienden con asyncio: peticiones idénticas simultáneas (p. ej.
+toda una clase pidiendo el mismo tag) esperan un único cálculo, y el scoring
+corre en un pool acotado de hilos para que el event loop siga respondiendo.
+
+Con `--processes N` (pre-fork) hay N procesos worker sobre el mismo socket, que
+comparten una sola copia del catálogo (dataset, índice de tags y scores
+mapeados desde disco, ver shared_catalogue.py).
+
+Con `user_id` en user_data el perfil del usuario queda guardado y
+`record_completion` le agrega roadmaps o nodos completados (ver user_profiles.py).
+
+`apply_events` aplica eventos de los roadmaps (completados, abandonos, likes,
+ratings) a las métricas y entrena la red en línea (ver online_learning.py).
+
+Con `--compact` los catálogos se guardan en modo compacto (ver
+compact_catalogue.py); `GET /memory` informa la memoria de cada catálogo.
+
+Uso:
+    python ml_example/recommender_server.py [--host 127.0.0.1] [--port 8765] [--workers N]
+                                            [--processes N] [--preload <dataset>] [--compact]
+
+Ejecutarlo desde el mismo directorio de trabajo que PHP, para que la ruta
+relativa de los modelos (ml_example/models/) sea la misma.
+"""
+
+import argparse
+import asyncio
+import gc
+import hashlib
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from roadmap_recommender import build_recommender, recommend_best_roadmap
+from personalized_recommender import PersonalizedRecommender
+from profiling import profile_request
+from compact_catalogue import CATALOGUE_ENV, compact_enabled
+from online_learning import ONLINE_BATCH_SIZE, SnapshotSchedule
+from recommender_common import SchemaChangedError, json_default
+from shared_catalogue import CATALOGUE_KINDS, ensure_catalogue, open_shared_recommender
+
+
+class DatasetEntry:
+    """
+    Recomendadores cargados para un dataset (se construyen al primer uso)
+
+    Con `shared=True` se abren sobre el catálogo compartido en disco (ver
+    shared_catalogue.py) en lugar de cargar una copia propia del dataset.
+    """
+
+    def __init__(self, dataset_path, shared=False):
+        self.dataset_path = dataset_path
+        self.shared = shared
+        self._roadmap = None
+        self._personalized = None
+        self._lock = threading.Lock()
+        self._snapshots = SnapshotSchedule()
+
+    def roadmap(self):
+        """RoadmapRecommender con el modelo ya cargado o entrenado"""
+        with self._lock:
+            if self._roadmap is None:
+                if self.shared:
+                    self._roadmap = open_shared_recommender('roadmap', self.dataset_path)
+                else:
+                    self._roadmap = build_recommender(self.dataset_path)
+            return self._roadmap
+
+    def personalized(self):
+        """PersonalizedRecommender base (sin usuario) con el modelo cargado o entrenado"""
+        with self._lock:
+            if self._personalized is None:
+                if self.shared:
+                    self._personalized = open_shared_recommender('personalized', self.dataset_path)
+                else:
+                    recommender = PersonalizedRecommender(self.dataset_path, {})
+                    recommender.ensure_model()
+                    self._personalized = recommender
+            return self._personalized
+
+    def apply_delta(self, delta_path):
+        """
+        Aplicar un delta a los recomendadores ya cargados
+
+        Cada recomendador se actualiza sobre una copia y luego se reemplaza, así
+        las peticiones en curso terminan con el catálogo anterior.
+        """
+        stats = {}
+        with self._lock:
+            if self._roadmap is not None:
+                updated = self._roadmap.copy_for_update()
+                stats['roadmap'] = updated.apply_delta(delta_path)
+                self._roadmap = updated
+            if self._personalized is not None:
+                updated = self._personalized.copy_for_update()
+                stats['personalized'] = updated.apply_delta(delta_path)
+                self._personalized = updated
+        return stats
+
+    def apply_events(self, events, batch_size=ONLINE_BATCH_SIZE):
+        """
+        Aplicar eventos de los roadmaps a los recomendadores ya cargados
+
+        Igual que apply_delta, sobre copias que luego se reemplazan. Cuando toca
+        (ver SnapshotSchedule) se guarda el modelo y se re-puntúa el catálogo.
+        """
+        stats = {}
+        with self._lock:
+            updated = {}
+            if self._roadmap is not None:
+                updated['roadmap'] = self._roadmap.copy_for_update()
+            if self._personalized is not None:
+                updated['personalized'] = self._personalized.copy_for_update()
+
+            for kind, recommender in updated.items():
+                stats[kind] = recommender.apply_events(events, batch_size)
+
+            n_events = max((kind_stats['events'] for kind_stats in stats.values()), default=0)
+            stats['snapshot'] = bool(updated) and self._snapshots.record(n_events)
+            if stats['snapshot']:
+                for recommender in updated.values():
+                    recommender.snapshot_model()
+                self._snapshots.mark()
+
+            self._roadmap = updated.get('roadmap', self._roadmap)
+            self._personalized = updated.get('personalized', self._personalized)
+        return stats
+
+    def cache_stats(self):
+        """Aciertos/fallos de la caché de resultados de cada recomendador cargado"""
+        stats = {}
+        if self._roadmap is not None:
+            stats['roadmap'] = self._roadmap.result_cache.stats()
+        if self._personalized is not None:
+            stats['personalized'] = self._personalized.result_cache.stats()
+            stats['user_profiles'] = self._personalized.profiles.stats()
+        return stats
+
+    def memory_report(self):
+        """Memoria del catálogo de cada recomendador cargado"""
+        report = {}
+        if self._roadmap is not None:
+            report['roadmap'] = self._roadmap.memory_report()
+        if self._personalized is not None:
+            report['personalized'] = self._personalized.memory_report()
+        return report
+
+
+class RecommenderRegistry:
+    """Datasets residentes en memoria, con expulsión del menos usado"""
+
+    # Huellas de archivos ya leídos, por ruta, fecha de modificación y tamaño
+    MAX_FILE_DIGESTS = 64
+
+    def __init__(self, max_datasets=2, shared=False):
+        self.max_datasets = max_datasets
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._file_digests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _dataset_key(self, dataset_path):
+        """
+        Huella del contenido del dataset
+
+        PHP exporta un CSV nuevo (con fecha en el nombre) en cada petición: con
+        la ruta como clave cada exportación cargaría el dataset otra vez. Cada
+        archivo se lee una sola vez; dos exportaciones iguales comparten entrada
+        y un dataset regenerado en la misma ruta cuenta como dataset nuevo.
+        """
+        stat = os.stat(dataset_path)
+        file_key = (os.path.realpath(dataset_path), stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            digest = self._file_digests.get(file_key)
+            if digest is not None:
+                self._file_digests.move_to_end(file_key)
+                return digest
+
+        content = hashlib.sha1()
+        with open(dataset_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                content.update(chunk)
+        digest = content.hexdigest()
+
+        with self._lock:
+            self._file_digests[file_key] = digest
+            while len(self._file_digests) > self.MAX_FILE_DIGESTS:
+                self._file_digests.popitem(last=False)
+        return digest
+
+    def get(self, dataset_path):
+        """Obtener (o registrar) la entrada de un dataset"""
+        key = self._dataset_key(dataset_path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = DatasetEntry(dataset_path, self.shared)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_datasets:
+                    self._entries.popitem(last=False)
+            else:
+                # La exportación anterior puede borrarse: cargar desde la última
+                entry.dataset_path = dataset_path
+                self._entries.move_to_end(key)
+            return entry
+
+    def discard(self, dataset_path):
+        """Olvidar un dataset (se recargará completo en la próxima petición)"""
+        key = self._dataset_key(dataset_path)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def dispatch(self, method, dataset_path, params):
+        """
+        Ejecutar un método del recomendador y devolver la respuesta JSON
+
+        Con `"profile": true` en los params, la respuesta incluye 'timings'.
+        """
+        with profile_request(bool(params.get('profile'))) as profile:
+            result = self._dispatch(method, dataset_path, params)
+
+        if profile is not None:
+            result = {**result, 'timings': profile.report()}
+        return result
+
+    def _dispatch(self, method, dataset_path, params):
+        """Ejecutar el método pedido (ver dispatch)"""
+        if not os.path.exists(dataset_path):
+            raise FileNotFoundError(f'Dataset no encontrado: {dataset_path}')
+
+        entry = self.get(dataset_path)
+
+        if method == 'get_best_roadmap_by_tag':
+            return recommend_best_roadmap(
+                entry.roadmap(),
+                params['tag'],
+                params.get('exclude_roadmaps')
+            )
+
+        if method == 'get_top_roadmaps_by_tag':
+            return {
+                'results': entry.roadmap().get_top_roadmaps_by_tag(
+                    params['tag'],
+                    params.get('top_n', 5),
+                    params.get('exclude_roadmaps')
+                )
+            }
+
+        if method == 'get_best_roadmap_by_query':
+            result = entry.roadmap().get_best_roadmap_by_query(
+                params['query'],
+                params.get('exclude_roadmaps')
+            )
+            return result if result is not None else {
+                'error': f"No se encontraron roadmaps para la consulta: {params['query']}"
+            }
+
+        if method == 'get_top_roadmaps_by_query':
+            return {
+                'results': entry.roadmap().get_top_roadmaps_by_query(
+                    params['query'],
+                    params.get('top_n', 5),
+                    params.get('exclude_roadmaps')
+                )
+            }
+
+        if method == 'get_roadmap_efficiency':
+            results = entry.roadmap().get_roadmap_efficiency(params['roadmap_ids'])
+            return {'results': results} if results is not None else {
+                'error': 'No hay modelos de eficiencia para este dataset: ejecutar train_roadmap_classifier.py'
+            }
+
+        if method == 'get_recommendations':
+            recommender = entry.personalized().for_user(params.get('user_data', {}))
+            return recommender.get_recommendations(
+                tag=params.get('tag'),
+                top_n=params.get('top_n', 5),
+                query=params.get('query')
+            )
+
+        if method == 'record_completion':
+            if entry.shared:
+                # Cada worker guarda sus propios perfiles: el cambio solo llegaría a uno
+                return {
+                    'recorded': False,
+                    'reason': 'record_completion no está disponible en modo pre-fork: enviar '
+                              'completed_roadmaps y completed_nodes en cada petición'
+                }
+            # Perfil guardado del usuario (ver user_profiles.py); no recalcula recomendaciones
+            return {'recorded': True, **entry.personalized().record_completion(
+                params['user_id'],
+                params.get('completed_roadmaps', []),
+                params.get('completed_nodes', [])
+            )}
+
+        if method == 'apply_delta':
+            if entry.shared:
+                # Cada worker tiene su vista del catálogo: un delta solo llegaría a uno
+                return {
+                    'applied': False,
+                    'reason': 'apply_delta no está disponible en modo pre-fork: regenerar el '
+                              'dataset (los workers lo recargan al cambiar el archivo)'
+                }
+            try:
+                return {'applied': True, **entry.apply_delta(params['delta_path'])}
+            except SchemaChangedError as e:
+                # Cambió el esquema: recargar el dataset completo en la próxima petición
+                self.discard(dataset_path)
+                return {'applied': False, 'full_reload': True, 'reason': str(e)}
+
+        if method == 'apply_events':
+            if entry.shared:
+                # Igual que apply_delta: cada worker tiene su propia copia del modelo
+                return {
+                    'applied': False,
+                    'reason': 'apply_events no está disponible en modo pre-fork: ejecutar '
+                              'online_learning.py sin servidor y reiniciar los workers'
+                }
+            events = params['events_path'] if 'events_path' in params else params['events']
+            try:
+                return {'applied': True, **entry.apply_events(events, params.get('batch_size', ONLINE_BATCH_SIZE))}
+            except SchemaChangedError as e:
+                # P. ej. roadmap_id repetidos: el catálogo cargado sigue sirviendo igual
+                return {'applied': False, 'reason': str(e)}
+
+        raise ValueError(f'Método no soportado: {method}')
+
+    def stats(self):
+        """Estado del servidor para /health"""
+        with self._lock:
+            return {
+                'status': 'ok',
+                'pid': os.getpid(),
+                'shared_catalogue': self.shared,
+                'compact_catalogue': compact_enabled(),
+                'datasets_loaded': len(self._entries),
+                'max_datasets': self.max_datasets,
+                'datasets': [
+                    {'dataset_path': entry.dataset_path, 'result_cache': entry.cache_stats()}
+                    for entry in self._entries.values()
+                ]
+            }
+
+    def memory_report(self):
+        """Memoria de los catálogos residentes para /memory"""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            'pid': os.getpid(),
+            'compact_catalogue': compact_enabled(),
+            'datasets': [
+                {'dataset_path': entry.dataset_path, 'memory': entry.memory_report()}
+                for entry in entries
+            ]
+        }
+
+
+# Métodos de solo lectura: peticiones idénticas simultáneas comparten el cálculo
+COALESCED_METHODS = {
+    'get_best_roadmap_by_tag', 'get_top_roadmaps_by_tag', 'get_recommendations',
+    'get_best_roadmap_by_query', 'get_top_roadmaps_by_query'
+}
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+class SingleFlight:
+    """
+    Coalescencia de peticiones idénticas (single-flight) en el event loop
+
+    La primera petición con una clave lanza el cálculo; las que llegan mientras
+    sigue en curso esperan ese mismo resultado (o error) en lugar de repetirlo.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def run(self, key, compute):
+        """
+        Resultado de `compute()` (corrutina) compartido entre las peticiones con `key`
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(compute())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        # shield: si un cliente se desconecta, el cálculo sigue para los demás
+        return await asyncio.shield(future)
+
+    def stats(self):
+        return {'inflight': len(self._inflight), 'executed': self.executed, 'coalesced': self.coalesced}
+
+
+class RecommenderService:
+    """
+    Atiende las peticiones en asyncio y calcula en un pool acotado de hilos
+
+    El event loop solo lee peticiones, agrupa las idénticas y escribe
+    respuestas; el scoring (CPU) corre en a lo sumo `workers` hilos, así que
+    una ráfaga de peticiones espera en cola sin bloquear el loop ni crear un
+    hilo por conexión.
+    """
+
+    def __init__(self, registry, workers=None):
+        self.registry = registry
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='recommender')
+        self.flights = SingleFlight()
+
+    def request_key(self, method, dataset_path, params):
+        """Clave de coalescencia, o None si la petición no se puede compartir"""
+        # Con profile, los timings son de cada petición
+        if method not in COALESCED_METHODS or params.get('profile'):
+            return None
+        return (method, dataset_path, json.dumps(params, sort_keys=True, default=str))
+
+    async def dispatch(self, method, dataset_path, params):
+        """Ejecutar la petición en el pool (compartida con las idénticas en curso)"""
+        loop = asyncio.get_running_loop()
+
+        def compute():
+            return loop.run_in_executor(self.executor, self.registry.dispatch, method, dataset_path, params)
+
+        key = self.request_key(method, dataset_path, params)
+        if key is None:
+            return await compute()
+        return await self.flights.run(key, compute)
+
+    def stats(self):
+        """Estado del servidor para /health"""
+        return {
+            **self.registry.stats(),
+            'workers': self.workers,
+            'coalescing': self.flights.stats()
+        }
+
+    async def handle_request(self, verb, path, body):
+        """
+        Atender una petición HTTP ya leída
+
+        Returns:
+            tuple: (status, payload JSON)
+        """
+        if verb == 'GET' and path == '/health':
+            return 200, self.stats()
+        if verb == 'GET' and path == '/memory':
+            # Recorre las columnas de texto: en el pool, sin bloquear el event loop
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(self.executor, self.registry.memory_report)
+        if verb != 'POST' or path != '/recommend':
+            return 404, {'error': f'Ruta no encontrada: {path}'}
+
+        try:
+            request = json.loads(body.decode('utf-8'))
+        except ValueError as e:
+            return 400, {'error': f'JSON inválido: {e}'}
+
+        try:
+            result = await self.dispatch(
+                request.get('method'),
+                request.get('dataset_path', ''),
+                request.get('params') or {}
+            )
+            return 200, result
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def handle_connection(self, reader, writer):
+        """Conexión HTTP/1.1 mínima: una petición por conexión (Connection: close)"""
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                status, payload = 400, {'error': 'Petición HTTP inválida'}
+            else:
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = 0
+                body = await reader.readexactly(length) if length > 0 else b''
+                status, payload = await self.handle_request(request_line[0], request_line[1], body)
+
+            # Serializar respuestas grandes también fuera del loop
+            body = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                lambda: json.dumps(payload, ensure_ascii=False, default=json_default).encode('utf-8')
+            )
+            writer.write(
+                f'HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n'
+                'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_server(host='127.0.0.1', port=8765, max_datasets=2, workers=None, registry=None, sock=None):
+    """
+    Arrancar el servidor en el event loop actual
+
+    Args:
+        registry: Registro ya creado (p. ej. heredado del proceso padre en modo pre-fork)
+        sock: Socket ya enlazado (compartido por los workers en modo pre-fork)
+
+    Returns:
+        tuple: (asyncio.Server, RecommenderService)
+    """
+    if registry is None:
+        registry = RecommenderRegistry(max_datasets=max_datasets)
+    service = RecommenderService(registry, workers)
+
+    if sock is not None:
+        server = await asyncio.start_server(service.handle_connection, sock=sock)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+    return server, service
+
+
+async def serve(server, service):
+    """Atender peticiones hasta que se interrumpa el proceso"""
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def serve_single(host, port, max_datasets, workers, preload=()):
+    """Modo de un solo proceso"""
+    registry = RecommenderRegistry(max_datasets=max_datasets)
+    for dataset_path in preload:
+        entry = registry.get(dataset_path)
+        entry.roadmap()
+        entry.personalized()
+
+    server, service = await start_server(host, port, workers=workers, registry=registry)
+    print(f'🚀 Servidor de recomendaciones escuchando en http://{host}:{port} '
+          f'({service.workers} hilos de cálculo)', file=sys.stderr)
+    await serve(server, service)
+
+
+async def serve_worker(registry, workers, sock):
+    """Worker del modo pre-fork: mismo servidor asyncio sobre el socket heredado"""
+    server, service = await start_server(workers=workers, registry=registry, sock=sock)
+    await serve(server, service)
+
+
+def run_in_child(func, *args):
+    """
+    Ejecutar `func` en un proceso hijo y esperar a que termine
+
+    Así la memoria de cargar un dataset completo no queda en el proceso padre
+    (ni se hereda en los workers).
+    """
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            func(*args)
+        except BaseException as e:
+            print(f'❌ {e}', file=sys.stderr)
+            status = 1
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f'No se pudo preparar el catálogo compartido ({func.__name__})')
+
+
+def serve_prefork(host, port, max_datasets, workers, processes, preload=()):
+    """
+    Modo pre-fork: `processes` workers atienden el mismo socket
+
+    1. Los catálogos de `preload` se preparan en un proceso hijo y el padre los
+       abre (memory-map), así los workers los heredan ya cargados.
+    2. gc.freeze() evita que el recolector de basura de cada worker toque (y
+       copie) los objetos heredados.
+    3. Se crean los workers; si uno muere, se reemplaza.
+
+    Cada worker tiene su event loop, su pool de `workers` hilos y su propia
+    coalescencia; dataset, índice de tags y scores son una sola copia física.
+    """
+    registry = RecommenderRegistry(max_datasets=max_datasets, shared=True)
+
+    for dataset_path in preload:
+        for kind in CATALOGUE_KINDS:
+            run_in_child(ensure_catalogue, kind, dataset_path)
+        entry = registry.get(dataset_path)
+        entry.roadmap()
+        entry.personalized()
+
+    sock = socket.create_server((host, port), backlog=512)
+    gc.collect()
+    gc.freeze()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                asyncio.run(serve_worker(registry, workers, sock))
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        return pid
+
+    children = {spawn() for _ in range(processes)}
+    print(f'🚀 Servidor de recomendaciones escuchando en http://{host}:{port} '
+          f'({processes} procesos, catálogo compartido)', file=sys.stderr)
+
+    # SIGTERM (p. ej. systemd) termina igual que Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            pid, status = os.wait()
+            if pid in children:
+                children.discard(pid)
+                print(f'⚠️  Worker {pid} terminó (código {os.waitstatus_to_exitcode(status)}); '
+                      'creando otro', file=sys.stderr)
+                time.sleep(1)
+                children.add(spawn())
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sock.close()
+
+
+def main():
+    """Arrancar el servidor persistente"""
+    parser = argparse.ArgumentParser(description='Servidor persistente de recomendaciones de roadmaps')
+    parser.add_argument('--host', default='127.0.0.1', help='Interfaz de escucha (solo local por defecto)')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto HTTP')
+    parser.add_argument('--max-datasets', type=int, default=2, help='Datasets residentes en memoria')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Hilos de cálculo por proceso (por defecto, uno por núcleo)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Procesos worker (pre-fork, catálogo compartido) si es mayor que 1')
+    parser.add_argument('--preload', action='append', default=[],
+                        help='Dataset a cargar antes de crear los workers (repetible)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Catálogos en modo compacto (tipos reducidos y tags codificados)')
+    args = parser.parse_args()
+
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers debe ser positivo')
+    if args.processes < 1:
+        parser.error('--processes debe ser positivo')
+    if args.processes > 1 and not hasattr(os, 'fork'):
+        parser.error('--processes requiere fork (Linux/macOS)')
+    if args.compact:
+        # Lo leen los recomendadores y la clave del catálogo compartido
+        os.environ[CATALOGUE_ENV] = 'compact'
+
+    if args.processes > 1:
+        serve_prefork(args.host, args.port, args.max_datasets, args.workers, args.processes, args.preload)
+        return
+
+    try:
+        asyncio.run(serve_single(args.host, args.port, args.max_datasets, args.workers, args.preload))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
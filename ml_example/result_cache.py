@@ -0,0 +1,95 @@
+"""
+Caché LRU de resultados de los recomendadores
+Muchos estudiantes piden al tutor los mismos tags populares; con esta caché una
+consulta repetida devuelve la respuesta ya calculada en lugar de volver a
+filtrar, puntuar y ordenar el catálogo.
+
+Cada entrada pertenece a una versión (huella del dataset + versión del modelo +
+versión de los scores). Cuando la versión cambia, la caché se vacía sola.
+"""
+
+import copy
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+# Entradas por recomendador (0 desactiva la caché)
+RESULT_CACHE_SIZE = int(os.environ.get('ROADMAP_RESULT_CACHE_SIZE', 256))
+
+# Versión de los scores precalculados: cambia al re-entrenar, cargar otro modelo
+# o aplicar un delta, aunque la huella del dataset sea la misma
+_scores_versions = itertools.count(1)
+
+
+def next_scores_version():
+    """Nuevo identificador (único en el proceso) para los scores precalculados"""
+    return next(_scores_versions)
+
+
+class ResultCache:
+    """Caché LRU acotada y segura entre hilos, con contadores de aciertos/fallos"""
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        """Vaciar la caché si los resultados guardados son de otra versión"""
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, version, key):
+        """Resultado guardado para `key` (una copia), o None si no está"""
+        with self._lock:
+            self._check_version(version)
+
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = self._entries[key]
+
+        # Copia para que quien llama pueda modificar el resultado sin afectar a la caché
+        return copy.deepcopy(value)
+
+    def put(self, version, key, value):
+        """Guardar un resultado, expulsando el menos usado si se llena"""
+        if self.maxsize <= 0:
+            return
+
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vaciar la caché (mantiene los contadores)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Contadores de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
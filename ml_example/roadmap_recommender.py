@@ -3,121 +3,334 @@ Roadmap Recommender usando Redes Neuronales (Neural Networks)
 Analiza el dataset y recomienda el mejor roadmap por categoría
 """
 
+import sys
+
+if __name__ == '__main__':
+    # Como script, delegar en el servidor antes de importar pandas/NumPy/SciPy
+    # (ver recommender_cli.py); este módulo se importa solo si hay que calcular aquí
+    from recommender_cli import roadmap_main
+    roadmap_main()
+    sys.exit()
+
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.neural_network import MLPRegressor
-from sklearn.ensemble import RandomForestRegressor
-import joblib
-import json
-import sys
+import copy
 import os
 import warnings
+from compact_catalogue import compact_catalogue, compact_enabled, is_compact, memory_report
+from dataset_store import load_dataset
+from mlp_inference import export_model_npz, load_model_npz
+from online_learning import ONLINE_BATCH_SIZE, apply_metric_events
+from profiling import count_rows, stage
+from recommender_common import (
+    FEATURES, MODEL_VERSION, SCORE_COLUMNS, apply_catalogue_delta,
+    compute_quality_score, create_quality_model, dataset_fingerprint,
+    load_or_compute_scores, load_training_run, predict_efficiency, take_columns,
+    top_k_indices, with_columns
+)
+from result_cache import ResultCache, next_scores_version
+from tag_index import TagIndex
+from tag_leaderboards import load_or_build_leaderboards
+from tag_query import format_tag_query, is_tag_query, parse_tag_query, query_rows
 warnings.filterwarnings('ignore')
 
+# Columnas que se devuelven en las respuestas
+BEST_COLUMNS = [
+    'roadmap_id', 'name', 'tags', 'final_score', 'completion_rate',
+    'usefulness_score', 'efficiency_rate', 'dropout_rate', 'engagement_score',
+    'completion_count', 'bookmark_count', 'avg_hours_spent', 'avg_nodes_completed'
+]
+TOP_COLUMNS = [
+    'roadmap_id', 'name', 'tags', 'final_score', 'completion_rate',
+    'usefulness_score', 'efficiency_rate'
+]
+
 class RoadmapRecommender:
-    def __init__(self, dataset_path):
-        """Inicializar el recomendador con el dataset"""
-        self.df = pd.read_csv(dataset_path)
-        self.scaler = StandardScaler()
+    def __init__(self, dataset_path, catalogue=None, compact=None):
+        """
+        Inicializar el recomendador con el dataset
+        
+        Args:
+            catalogue: (df preparado, huella, TagIndex) ya cargados, p. ej. de un
+                catálogo compartido (ver shared_catalogue.py); sin él se lee
+                `dataset_path`
+            compact: Catálogo compacto (ver compact_catalogue.py); por defecto
+                según ROADMAP_CATALOGUE
+        """
+        if catalogue is not None:
+            self.df, self.fingerprint, self.tag_index = catalogue
+        else:
+            with stage('load_dataset'):
+                self.df = load_dataset(dataset_path)
+            with stage('fingerprint'):
+                self.fingerprint = dataset_fingerprint(self.df)
+        count_rows('dataset', len(self.df))
+        # scikit-learn solo se importa si hay que entrenar (ver train_model)
+        self.scaler = None
         self.model = None
-        self.prepare_data()
+        self.result_cache = ResultCache()
+        # Rankings por tag: se cargan o construyen en la primera consulta
+        self._leaderboards = None
+        self._id_index = None
+        # Modelos de train_roadmap_classifier.py: se cargan en el primer uso
+        self._efficiency_run = None
+        if catalogue is None:
+            self.prepare_data()
+            with stage('tag_index'):
+                self.tag_index = TagIndex(self.df['tags'])
+            if compact_enabled(compact):
+                with stage('compact'):
+                    self.df, self.tag_index = compact_catalogue(self.df, self.tag_index)
+        self.compact = is_compact(self.df)
+        self.precompute_scores()
         
     def prepare_data(self):
         """Preparar datos para el modelo"""
         # Crear score de calidad combinando múltiples métricas
-        self.df['quality_score'] = (
-            self.df['completion_rate'] * 0.35 +
-            self.df['usefulness_score'] / 5 * 0.30 +
-            (1 - self.df['dropout_rate']) * 0.20 +
-            self.df['efficiency_rate'] / self.df['efficiency_rate'].max() * 0.15
-        )
-        
-        # Normalizar engagement_score
-        max_engagement = self.df['engagement_score'].max()
-        if max_engagement > 0:
-            self.df['quality_score'] += (self.df['engagement_score'] / max_engagement) * 0.10
-        
-        # Asegurar que esté entre 0 y 1
-        self.df['quality_score'] = self.df['quality_score'].clip(0, 1)
+        with stage('prepare_data'):
+            self.df['quality_score'] = compute_quality_score(self.df)
         
     def train_model(self):
         """Entrenar RED NEURONAL (Neural Network) para predecir calidad"""
-        features = [
-            'completion_count', 'dropout_count', 'avg_hours_spent',
-            'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
-            'completion_rate', 'efficiency_rate', 'engagement_score'
-        ]
+        from sklearn.preprocessing import StandardScaler
         
-        X = self.df[features]
+        X = self.df[FEATURES]
         y = self.df['quality_score']
         
         # Escalar features
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
         # Entrenar RED NEURONAL (Multi-Layer Perceptron)
         # Arquitectura: 9 inputs -> 64 neurons -> 32 neurons -> 16 neurons -> 1 output
-        self.model = MLPRegressor(
-            hidden_layer_sizes=(64, 32, 16),  # 3 capas ocultas
-            activation='relu',                 # Función de activación ReLU
-            solver='adam',                     # Optimizador Adam
-            alpha=0.001,                       # Regularización L2
-            batch_size=32,                     # Tamaño de batch
-            learning_rate='adaptive',          # Learning rate adaptativo
-            learning_rate_init=0.001,          # Learning rate inicial
-            max_iter=1000,                     # Máximo de iteraciones
-            random_state=42,
-            early_stopping=True,               # Early stopping
-            validation_fraction=0.1,           # 10% para validación
-            n_iter_no_change=50,               # Paciencia para early stopping
-            verbose=False
-        )
+        self.model = create_quality_model()
         
         # Entrenar sin imprimir (para no interferir con JSON output)
-        self.model.fit(X_scaled, y)
-        score = self.model.score(X_scaled, y)
+        with stage('train_model'):
+            self.model.fit(X_scaled, y)
+            score = self.model.score(X_scaled, y)
+        
+        self.precompute_scores()
         
         return score
     
-    def get_best_roadmap_by_tag(self, tag):
-        """Obtener el mejor roadmap para un tag específico usando ML"""
-        tag = tag.lower().strip()
+    def precompute_scores(self, path='ml_example/models/'):
+        """
+        Precalcular predicted_quality y final_score de todo el catálogo
         
-        # Filtrar roadmaps que contengan el tag
-        filtered = self.df[
-            self.df['tags'].str.lower().str.contains(tag, na=False, regex=False)
-        ].copy()
+        Se cargan del almacén de scores si ya existen para este dataset y modelo,
+        así las consultas solo filtran y ordenan (sin inferencia del modelo).
+        """
+        with stage('precompute_scores'):
+            scores = load_or_compute_scores(self.df, self.fingerprint, self.model, self.scaler, path)
+            self.df = with_columns(self.df, scores)
+        self._scores_version = next_scores_version()
+        self._leaderboards = None
+    
+    def copy_for_update(self):
+        """
+        Copia para aplicar un delta o eventos y luego reemplazar a esta
         
-        if filtered.empty:
-            return None
+        Comparte dataset y modelo hasta que se actualicen, pero no las cachés
+        (resultados, rankings por tag, índice de ids): lo que la copia invalide
+        o guarde no afecta a las peticiones que siguen usando esta instancia.
+        """
+        updated = copy.copy(self)
+        updated.result_cache = ResultCache(self.result_cache.maxsize)
+        updated._leaderboards = None
+        updated._id_index = None
+        return updated
+    
+    def apply_delta(self, delta):
+        """
+        Aplicar roadmaps nuevos o modificados sin recargar el dataset
         
-        # Si el modelo está entrenado, usar predicciones
-        if self.model is not None:
-            features = [
-                'completion_count', 'dropout_count', 'avg_hours_spent',
-                'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
-                'completion_rate', 'efficiency_rate', 'engagement_score'
-            ]
-            
-            X = filtered[features]
-            X_scaled = self.scaler.transform(X)
-            
-            # Predecir calidad con el modelo
-            filtered['predicted_quality'] = self.model.predict(X_scaled)
+        Args:
+            delta: Ruta a un JSON lines / CSV con filas completas, o DataFrame
             
-            # Combinar predicción con score calculado
-            filtered['final_score'] = (
-                filtered['predicted_quality'] * 0.6 +
-                filtered['quality_score'] * 0.4
-            )
+        Raises:
+            SchemaChangedError: Si cambia el esquema (hace falta recarga completa)
+        """
+        self.df, self.tag_index, stats = apply_catalogue_delta(
+            self.df, delta, self.tag_index, self.model, self.scaler
+        )
+        self.fingerprint = dataset_fingerprint(self.df.drop(columns=SCORE_COLUMNS, errors='ignore'))
+        self._scores_version = next_scores_version()
+        self._leaderboards = None
+        self._id_index = None
+        return stats
+    
+    def apply_events(self, events, batch_size=ONLINE_BATCH_SIZE):
+        """
+        Actualizar métricas y modelo con eventos de los roadmaps (ver online_learning.py)
+        
+        Solo se re-puntúan los roadmaps con eventos; el resto del catálogo toma
+        el modelo actualizado en la próxima instantánea (snapshot_model).
+        """
+        self.df, self.model, stats = apply_metric_events(self.df, events, self.model, self.scaler, batch_size)
+        self.fingerprint = dataset_fingerprint(self.df.drop(columns=SCORE_COLUMNS, errors='ignore'))
+        self._scores_version = next_scores_version()
+        self._leaderboards = None
+        return stats
+    
+    def snapshot_model(self, path='ml_example/models/'):
+        """Guardar el modelo actualizado y re-puntuar todo el catálogo con él"""
+        self.save_model(path)
+        self.precompute_scores(path)
+    
+    def _cache_version(self):
+        """Versión de los resultados: dataset + modelo + scores precalculados"""
+        return (self.fingerprint['schema'], self.fingerprint['content'], MODEL_VERSION, self._scores_version)
+    
+    def _cached(self, key, compute):
+        """Resultado de la caché LRU, o calcularlo y guardarlo"""
+        version = self._cache_version()
+        result = self.result_cache.get(version, key)
+        if result is None:
+            result = compute()
+            if result is not None:
+                self.result_cache.put(version, key, result)
+        return result
+    
+    def _candidate_rows(self, tag, exclude_roadmaps=None):
+        """Posiciones de los roadmaps con el tag (sin copiar ni modificar self.df)"""
+        # Búsqueda en el índice invertido
+        rows = self.tag_index.match(tag)
+        
+        # Excluir roadmaps completados por el usuario (solo entre los candidatos)
+        if exclude_roadmaps and len(rows):
+            excluded = self.df['roadmap_id'].iloc[rows].isin(exclude_roadmaps).to_numpy()
+            rows = rows[~excluded]
+        
+        return rows
+    
+    def _roadmap_rows(self, roadmap_ids):
+        """Posiciones (ordenadas) de los roadmaps con esos ids; ignora ids desconocidos"""
+        if self._id_index is None:
+            self._id_index = pd.Index(self.df['roadmap_id'])
+        if not roadmap_ids:
+            return np.empty(0, dtype=np.int64)
+        
+        if not self._id_index.is_unique:
+            return np.flatnonzero(self.df['roadmap_id'].isin(roadmap_ids))
+        
+        positions = self._id_index.get_indexer(pd.Index(list(roadmap_ids)))
+        return np.unique(positions[positions >= 0])
+    
+    def _query_rows(self, query, exclude_roadmaps=None):
+        """Posiciones de los roadmaps que cumplen una consulta de tags (con bitmaps)"""
+        exclude_rows = self._roadmap_rows(exclude_roadmaps) if exclude_roadmaps else None
+        return query_rows(self.tag_index, query, exclude_rows)
+    
+    def leaderboards(self, path='ml_example/models/'):
+        """Top K precalculado de cada tag (ver tag_leaderboards.py)"""
+        if self._leaderboards is None:
+            with stage('leaderboards'):
+                self._leaderboards = load_or_build_leaderboards(
+                    self.tag_index, self.df['final_score'].to_numpy(dtype=np.float64), path
+                )
+        return self._leaderboards
+    
+    def _leaderboard_rows(self, tag, top_n, exclude_roadmaps=None):
+        """
+        Top N de un tag exacto desde su leaderboard, saltando los excluidos
+        
+        Returns:
+            tuple | None: (posiciones, total de candidatos), o None si hay que
+                calcular el ranking completo (búsqueda por prefijo, ids repetidos
+                o una lista que no alcanza)
+        """
+        tag_id = self.tag_index.tag_id(tag)
+        if tag_id is None:
+            return None
+        
+        tag_rows = self.tag_index.exact(tag)
+        excluded = np.empty(0, dtype=np.int64)
+        if exclude_roadmaps:
+            excluded = self._roadmap_rows(exclude_roadmaps)
+            if not self._id_index.is_unique:
+                return None
+            # Solo cuentan los excluidos que tienen el tag (filas del tag ordenadas)
+            lookup = np.minimum(np.searchsorted(tag_rows, excluded), max(len(tag_rows) - 1, 0))
+            excluded = excluded[tag_rows[lookup] == excluded] if len(tag_rows) else excluded[:0]
+        
+        rows = self.leaderboards().top_rows(tag_id, top_n, excluded)
+        if rows is None:
+            return None
+        return rows, len(tag_rows) - len(excluded)
+    
+    def get_best_roadmap_by_tag(self, tag, exclude_roadmaps=None):
+        """
+        Obtener el mejor roadmap para un tag específico usando ML
+        
+        Un texto con el prefijo 'q:' ('q:python AND data, NOT beginner') se
+        resuelve como consulta de tags (ver get_best_roadmap_by_query)
+        """
+        if is_tag_query(tag):
+            return self.get_best_roadmap_by_query(tag, exclude_roadmaps)
+        tag = tag.lower().strip()
+        key = ('best', tag, frozenset(exclude_roadmaps or ()))
+        return self._cached(key, lambda: self._best_roadmap_by_tag(tag, exclude_roadmaps))
+    
+    def _best_roadmap_by_tag(self, tag, exclude_roadmaps):
+        """Calcular el mejor roadmap (sin caché)"""
+        # Tag exacto: leaderboard precalculado
+        with stage('leaderboard'):
+            hit = self._leaderboard_rows(tag, 1, exclude_roadmaps)
+        
+        if hit is not None:
+            best_row, total_candidates = hit
         else:
-            filtered['final_score'] = filtered['quality_score']
+            # Filtrar roadmaps que contengan el tag
+            with stage('tag_filter'):
+                rows = self._candidate_rows(tag, exclude_roadmaps)
+            total_candidates = len(rows)
+            
+            # final_score ya combina la predicción del modelo (60%) y el score calculado (40%)
+            with stage('ranking'):
+                final_score = self.df['final_score'].to_numpy()[rows]
+                best_row = rows[top_k_indices(final_score, 1)]
+        count_rows('candidates', total_candidates)
+        
+        if total_candidates == 0:
+            return None
+        return self._format_best(best_row, total_candidates)
+    
+    def get_best_roadmap_by_query(self, query, exclude_roadmaps=None):
+        """
+        Obtener el mejor roadmap que cumple una consulta booleana de tags
+        
+        Args:
+            query: Consulta como 'python AND data, NOT beginner' (ver tag_query.py)
+            exclude_roadmaps: Ids de roadmap a descartar
+        
+        Raises:
+            ValueError: Si la consulta está mal formada
+        """
+        node = parse_tag_query(query)
+        key = ('best_query', format_tag_query(node), frozenset(exclude_roadmaps or ()))
+        return self._cached(key, lambda: self._best_roadmap_by_query(node, exclude_roadmaps))
+    
+    def _best_roadmap_by_query(self, node, exclude_roadmaps):
+        """Calcular el mejor roadmap de una consulta (sin caché)"""
+        with stage('tag_filter'):
+            rows = self._query_rows(node, exclude_roadmaps)
+        count_rows('candidates', len(rows))
+        
+        if len(rows) == 0:
+            return None
         
-        # Obtener el mejor roadmap
-        best = filtered.nlargest(1, 'final_score').iloc[0]
+        with stage('ranking'):
+            best_row = rows[top_k_indices(self.df['final_score'].to_numpy()[rows], 1)]
+        return self._format_best(best_row, len(rows))
+    
+    def _format_best(self, best_row, total_candidates):
+        """Respuesta del mejor roadmap a partir de su posición"""
+        with stage('formatting'):
+            best = {col: values[0] for col, values in take_columns(self.df, best_row, BEST_COLUMNS, self.tag_index).items()}
         
         # Calcular confianza basada en cantidad de datos
-        confidence = min(100, (len(filtered) / 10) * 100)
+        confidence = min(100, (total_candidates / 10) * 100)
         
         return {
             'roadmap_id': best['roadmap_id'],
@@ -134,7 +347,7 @@ class RoadmapRecommender:
             'avg_hours_spent': round(float(best['avg_hours_spent']), 2),
             'avg_nodes_completed': round(float(best['avg_nodes_completed']), 2),
             'confidence': round(confidence, 2),
-            'total_candidates': len(filtered),
+            'total_candidates': total_candidates,
             'ml_model_used': self.model is not None,
             'model_type': 'Neural Network (MLP)',
             'architecture': '9-64-32-16-1',
@@ -142,118 +355,191 @@ class RoadmapRecommender:
             'optimizer': 'Adam'
         }
     
-    def get_top_roadmaps_by_tag(self, tag, top_n=5):
-        """Obtener los top N roadmaps para un tag"""
+    def get_top_roadmaps_by_tag(self, tag, top_n=5, exclude_roadmaps=None):
+        """Obtener los top N roadmaps para un tag (o una consulta 'q:...')"""
+        if is_tag_query(tag):
+            return self.get_top_roadmaps_by_query(tag, top_n, exclude_roadmaps)
         tag = tag.lower().strip()
+        key = ('top', tag, top_n, frozenset(exclude_roadmaps or ()))
+        return self._cached(key, lambda: self._top_roadmaps_by_tag(tag, top_n, exclude_roadmaps))
+    
+    def _top_roadmaps_by_tag(self, tag, top_n, exclude_roadmaps):
+        """Calcular los top N roadmaps (sin caché)"""
+        with stage('leaderboard'):
+            hit = self._leaderboard_rows(tag, top_n, exclude_roadmaps)
         
-        filtered = self.df[
-            self.df['tags'].str.lower().str.contains(tag, na=False, regex=False)
-        ].copy()
+        if hit is not None:
+            top_rows, total_candidates = hit
+        else:
+            with stage('tag_filter'):
+                rows = self._candidate_rows(tag, exclude_roadmaps)
+            total_candidates = len(rows)
+            
+            with stage('ranking'):
+                top_rows = rows[top_k_indices(self.df['final_score'].to_numpy()[rows], top_n)]
+        count_rows('candidates', total_candidates)
         
-        if filtered.empty:
+        if total_candidates == 0:
             return []
+        return self._format_top(top_rows)
+    
+    def get_top_roadmaps_by_query(self, query, top_n=5, exclude_roadmaps=None):
+        """
+        Obtener los top N roadmaps que cumplen una consulta booleana de tags
         
-        if self.model is not None:
-            features = [
-                'completion_count', 'dropout_count', 'avg_hours_spent',
-                'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
-                'completion_rate', 'efficiency_rate', 'engagement_score'
-            ]
-            
-            X = filtered[features]
-            X_scaled = self.scaler.transform(X)
-            filtered['predicted_quality'] = self.model.predict(X_scaled)
-            filtered['final_score'] = (
-                filtered['predicted_quality'] * 0.6 +
-                filtered['quality_score'] * 0.4
-            )
-        else:
-            filtered['final_score'] = filtered['quality_score']
+        Raises:
+            ValueError: Si la consulta está mal formada
+        """
+        node = parse_tag_query(query)
+        key = ('top_query', format_tag_query(node), top_n, frozenset(exclude_roadmaps or ()))
+        return self._cached(key, lambda: self._top_roadmaps_by_query(node, top_n, exclude_roadmaps))
+    
+    def _top_roadmaps_by_query(self, node, top_n, exclude_roadmaps):
+        """Calcular los top N roadmaps de una consulta (sin caché)"""
+        with stage('tag_filter'):
+            rows = self._query_rows(node, exclude_roadmaps)
+        count_rows('candidates', len(rows))
         
-        top_roadmaps = filtered.nlargest(top_n, 'final_score')
+        with stage('ranking'):
+            top_rows = rows[top_k_indices(self.df['final_score'].to_numpy()[rows], top_n)]
+        return self._format_top(top_rows)
+    
+    def _format_top(self, top_rows):
+        """Respuesta de los top N a partir de sus posiciones"""
+        with stage('formatting'):
+            values = take_columns(self.df, top_rows, TOP_COLUMNS, self.tag_index)
         
         results = []
-        for idx, row in top_roadmaps.iterrows():
+        for i in range(len(top_rows)):
             results.append({
-                'roadmap_id': row['roadmap_id'],
-                'name': row['name'],
-                'tags': row['tags'],
-                'quality_score': round(float(row['final_score']), 4),
-                'completion_rate': round(float(row['completion_rate']), 4),
-                'usefulness_score': round(float(row['usefulness_score']), 2),
-                'efficiency_rate': round(float(row['efficiency_rate']), 4),
+                'roadmap_id': values['roadmap_id'][i],
+                'name': values['name'][i],
+                'tags': values['tags'][i],
+                'quality_score': round(float(values['final_score'][i]), 4),
+                'completion_rate': round(float(values['completion_rate'][i]), 4),
+                'usefulness_score': round(float(values['usefulness_score'][i]), 2),
+                'efficiency_rate': round(float(values['efficiency_rate'][i]), 4),
             })
         
         return results
     
+    def efficiency_run(self, path='ml_example/models/'):
+        """
+        Entrenamiento de train_roadmap_classifier.py para este dataset, o None
+        
+        Se busca por la huella del dataset (ver load_training_run); tras un
+        delta o eventos ya no corresponde y no se usa.
+        """
+        if self._efficiency_run is None or self._efficiency_run[0] != self.fingerprint:
+            with stage('load_efficiency'):
+                run = load_training_run(path, self.fingerprint)
+            if run is None:
+                # Sin guardar: se vuelve a buscar si luego se entrena
+                return None
+            self._efficiency_run = (self.fingerprint, run)
+        return self._efficiency_run[1]
+    
+    def get_roadmap_efficiency(self, roadmap_ids):
+        """
+        Eficiencia predicha (Low/Medium/High) y usefulness predicho de unos roadmaps
+        
+        Returns:
+            list: Un dict por roadmap encontrado, o None si no hay modelos de
+                eficiencia entrenados para este dataset
+        """
+        run = self.efficiency_run()
+        if run is None:
+            return None
+        
+        rows = self._roadmap_rows(roadmap_ids)
+        values = take_columns(self.df, rows, ['roadmap_id', 'tags'], self.tag_index)
+        predictions = predict_efficiency(run, self.df.iloc[rows], values['tags'])
+        
+        return [
+            {
+                'roadmap_id': values['roadmap_id'][i],
+                'efficiency_label': str(predictions['efficiency_label'][i]),
+                'predicted_usefulness': round(float(predictions['predicted_usefulness'][i]), 2)
+            }
+            for i in range(len(rows))
+        ]
+    
+    def memory_report(self):
+        """Memoria del catálogo residente (ver compact_catalogue.memory_report)"""
+        return memory_report(self.df, self.tag_index)
+    
     def get_available_tags(self):
         """Obtener todos los tags disponibles"""
-        all_tags = set()
-        for tags_str in self.df['tags'].dropna():
-            tags = [t.strip().lower() for t in str(tags_str).split(',')]
-            all_tags.update(tags)
-        
-        return sorted(list(all_tags))
+        return list(self.tag_index.vocabulary)
     
     def save_model(self, path='ml_example/models/'):
-        """Guardar modelo entrenado"""
-        os.makedirs(path, exist_ok=True)
-        joblib.dump(self.model, f'{path}roadmap_model.pkl')
-        joblib.dump(self.scaler, f'{path}scaler.pkl')
+        """Guardar modelo entrenado (y sus pesos en .npz para la inferencia)"""
+        save_roadmap_model(self.model, self.scaler, path)
         
     def load_model(self, path='ml_example/models/'):
-        """Cargar modelo entrenado"""
+        """
+        Cargar modelo entrenado
+        
+        Si los pesos .npz están al día se usan esos: la inferencia se hace con
+        NumPy y el arranque en frío no importa scikit-learn. Sin el .pkl no hay
+        modelo aunque quede un .npz (borrar el .pkl fuerza reentrenar).
+        """
+        weights_file = f'{path}roadmap_model.npz'
+        model_file = f'{path}roadmap_model.pkl'
+        
+        if not os.path.exists(model_file):
+            return False
+        
         try:
-            self.model = joblib.load(f'{path}roadmap_model.pkl')
-            self.scaler = joblib.load(f'{path}scaler.pkl')
-            return True
+            with stage('load_model'):
+                if os.path.exists(weights_file) and os.path.getmtime(weights_file) >= os.path.getmtime(model_file):
+                    self.model, self.scaler = load_model_npz(weights_file)
+                else:
+                    import joblib
+                    self.model = joblib.load(model_file)
+                    self.scaler = joblib.load(f'{path}scaler.pkl')
+                    # Exportar los pesos para que el próximo arranque no importe scikit-learn
+                    if hasattr(self.model, 'coefs_'):
+                        export_model_npz(self.model, self.scaler, weights_file)
         except:
             return False
+        
+        self.precompute_scores(path)
+        return True
 
 
-def main():
-    """Función principal para usar desde línea de comandos"""
-    if len(sys.argv) < 3:
-        print(json.dumps({
-            'error': 'Uso: python roadmap_recommender.py <dataset_path> <tag> [exclude_roadmaps]'
-        }))
-        sys.exit(1)
-    
-    dataset_path = sys.argv[1]
-    tag = sys.argv[2]
-    exclude_roadmaps = sys.argv[3].split(',') if len(sys.argv) > 3 and sys.argv[3] else []
-    
-    try:
-        # Inicializar recomendador
-        recommender = RoadmapRecommender(dataset_path)
-        
-        # Filtrar roadmaps excluidos (completados por el usuario)
-        if exclude_roadmaps:
-            recommender.df = recommender.df[~recommender.df['roadmap_id'].isin(exclude_roadmaps)]
-        
-        # Intentar cargar modelo pre-entrenado
-        if not recommender.load_model():
-            # Si no existe, entrenar nuevo modelo
-            score = recommender.train_model()
-            recommender.save_model()
-        
-        # Obtener recomendación
-        result = recommender.get_best_roadmap_by_tag(tag)
-        
-        if result is None:
-            print(json.dumps({
-                'error': f'No se encontraron roadmaps para el tag: {tag}',
-                'available_tags': recommender.get_available_tags()[:20]
-            }, ensure_ascii=False))
-        else:
-            print(json.dumps(result, indent=2, ensure_ascii=False))
+def save_roadmap_model(model, scaler, path='ml_example/models/'):
+    """Guardar modelo y scaler donde los busca RoadmapRecommender.load_model"""
+    import joblib
     
-    except Exception as e:
-        print(json.dumps({
-            'error': str(e)
-        }, ensure_ascii=False))
-        sys.exit(1)
+    os.makedirs(path, exist_ok=True)
+    joblib.dump(model, f'{path}roadmap_model.pkl')
+    joblib.dump(scaler, f'{path}scaler.pkl')
+    if hasattr(model, 'coefs_'):
+        export_model_npz(model, scaler, f'{path}roadmap_model.npz')
 
 
-if __name__ == '__main__':
-    main()
+def build_recommender(dataset_path, catalogue=None, compact=None):
+    """Crear el recomendador con el modelo pre-entrenado (o entrenarlo si no existe)"""
+    recommender = RoadmapRecommender(dataset_path, catalogue, compact)
+    
+    # Intentar cargar modelo pre-entrenado
+    if not recommender.load_model():
+        # Si no existe, entrenar nuevo modelo
+        recommender.train_model()
+        recommender.save_model()
+    
+    return recommender
+
+
+def recommend_best_roadmap(recommender, tag, exclude_roadmaps=None):
+    """Respuesta JSON del mejor roadmap (la misma que imprime el CLI)"""
+    result = recommender.get_best_roadmap_by_tag(tag, exclude_roadmaps)
+    
+    if result is None:
+        return {
+            'error': f'No se encontraron roadmaps para el tag: {tag}',
+            'available_tags': recommender.get_available_tags()[:20]
+        }
+    
+    return result
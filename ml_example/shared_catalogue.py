@@ -0,0 +1,135 @@
+"""
+Catálogo compartido entre procesos (modo pre-fork del servidor)
+Con varios procesos worker, cada uno tendría su propia copia del DataFrame, del
+índice de tags y de los scores. Este módulo guarda el catálogo ya preparado en
+ml_example/models/catalogue_<clave>/:
+
+- dataset/: columnas en formato .npyds (numéricas tal cual, texto codificado
+  con diccionario), ver dataset_store.py
+- tag_index/: arrays del TagIndex (listas por tag e incidencia CSR)
+- catalogue.json: tipo de recomendador, dataset de origen y huella
+
+Los workers lo abren con memory-map (y los scores salen del almacén de scores,
+también mapeado), así que N procesos comparten una sola copia física en la
+caché de páginas del sistema operativo. La clave depende de la ruta, fecha y
+tamaño del dataset (y del modo compacto, ver compact_catalogue.py): si el
+archivo se regenera, se crea un catálogo nuevo.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from compact_catalogue import compact_enabled
+from dataset_store import load_npy_dataset, save_npy_dataset
+from recommender_common import remove_old_artifacts, save_directory
+from tag_index import TagIndex
+
+# Subir cuando cambie el formato del catálogo o las columnas que prepara cada recomendador
+CATALOGUE_VERSION = 1
+
+CATALOGUE_KINDS = ('roadmap', 'personalized')
+
+
+def catalogue_key(kind, dataset_path):
+    """Clave del catálogo: tipo de recomendador + ruta, fecha y tamaño del dataset + modo"""
+    stat = os.stat(dataset_path)
+    mode = ':compact' if compact_enabled() else ''
+    digest = hashlib.sha1(
+        f'{CATALOGUE_VERSION}:{kind}:{os.path.realpath(dataset_path)}:{stat.st_mtime_ns}:{stat.st_size}{mode}'.encode('utf-8')
+    )
+    return digest.hexdigest()[:20]
+
+
+def catalogue_path(kind, dataset_path, path='ml_example/models/'):
+    """Directorio del catálogo compartido de un dataset"""
+    return os.path.join(path, f'catalogue_{catalogue_key(kind, dataset_path)}')
+
+
+def save_catalogue(recommender, kind, dataset_path, path):
+    """Guardar df preparado, huella y TagIndex de un recomendador (ver save_directory)"""
+    def write(tmp_path):
+        save_npy_dataset(recommender.df, os.path.join(tmp_path, 'dataset'))
+        recommender.tag_index.save(os.path.join(tmp_path, 'tag_index'))
+        with open(os.path.join(tmp_path, 'catalogue.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': CATALOGUE_VERSION,
+                'kind': kind,
+                'dataset_path': os.path.abspath(dataset_path),
+                'fingerprint': recommender.fingerprint
+            }, f, ensure_ascii=False)
+
+    return save_directory(path, write)
+
+
+def load_catalogue(path):
+    """
+    Abrir un catálogo guardado con save_catalogue()
+
+    Returns:
+        tuple: (df con columnas mapeadas, huella, TagIndex mapeado)
+    """
+    with open(os.path.join(path, 'catalogue.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != CATALOGUE_VERSION:
+        raise ValueError(f"Versión de catálogo no soportada: {meta.get('version')}")
+
+    df = load_npy_dataset(os.path.join(path, 'dataset'))
+    tag_index = TagIndex.load(os.path.join(path, 'tag_index'))
+    return df, meta['fingerprint'], tag_index
+
+
+def _build_recommender(kind, dataset_path, catalogue=None):
+    """Recomendador del tipo pedido con el modelo cargado (o entrenado)"""
+    if kind == 'roadmap':
+        from roadmap_recommender import build_recommender
+        return build_recommender(dataset_path, catalogue)
+
+    from personalized_recommender import PersonalizedRecommender
+    recommender = PersonalizedRecommender(dataset_path, {}, catalogue)
+    recommender.ensure_model()
+    return recommender
+
+
+def ensure_catalogue(kind, dataset_path, path='ml_example/models/', keep_last=6):
+    """
+    Ruta del catálogo compartido del dataset, creándolo si no existe
+
+    La primera vez se carga el dataset de la forma habitual (con la memoria que
+    eso implica); conviene hacerlo en un proceso aparte antes de crear los
+    workers (ver recommender_server.py --preload).
+    """
+    if kind not in CATALOGUE_KINDS:
+        raise ValueError(f'Tipo de catálogo no soportado: {kind}')
+
+    shared_path = catalogue_path(kind, dataset_path, path)
+    if os.path.isdir(shared_path):
+        return shared_path
+
+    recommender = _build_recommender(kind, dataset_path)
+    os.makedirs(path, exist_ok=True)
+    save_catalogue(recommender, kind, dataset_path, shared_path)
+
+    # Dos catálogos por dataset: roadmap y personalizado
+    remove_old_artifacts(path, 'catalogue_*', keep_last)
+
+    return shared_path
+
+
+def open_shared_recommender(kind, dataset_path, path='ml_example/models/'):
+    """
+    Recomendador ('roadmap' o 'personalized') sobre el catálogo compartido
+
+    Dataset, índice de tags y scores quedan mapeados desde disco; en memoria
+    propia solo quedan el modelo (pesos NumPy) y los diccionarios de texto.
+    """
+    shared_path = ensure_catalogue(kind, dataset_path, path)
+    try:
+        catalogue = load_catalogue(shared_path)
+    except (OSError, ValueError, KeyError):
+        # Catálogo incompleto o de otra versión: rehacerlo
+        shutil.rmtree(shared_path, ignore_errors=True)
+        catalogue = load_catalogue(ensure_catalogue(kind, dataset_path, path))
+
+    return _build_recommender(kind, dataset_path, catalogue)
@@ -0,0 +1,228 @@
+"""
+Entrenamiento por bloques (out-of-core) de la red neuronal de calidad
+train_model() carga el dataset completo y entrena de una vez. Con exportaciones
+más grandes que la memoria, este script recorre el dataset en bloques:
+
+1. Una pasada de estadísticas: StandardScaler.partial_fit, máximos que
+   normalizan el quality score y huella del dataset (DatasetFingerprint).
+2. `--epochs` pasadas de entrenamiento: MLPRegressor.partial_fit sobre cada
+   bloque escalado.
+
+Después de cada bloque (`--checkpoint-every`) se guarda un checkpoint con el
+scaler, la red y la posición; si el proceso se interrumpe, volver a ejecutar el
+mismo comando reanuda desde el último bloque guardado. Al terminar se guardan
+los modelos donde los cargan RoadmapRecommender y PersonalizedRecommender.
+
+Uso:
+    python ml_example/streaming_training.py <dataset> [--chunksize 100000] [--epochs 5]
+                                            [--checkpoint <ruta>] [--no-resume]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from dataset_store import iter_dataset_chunks, npy_dataset_path
+from recommender_common import (
+    FEATURES, MODEL_VERSION, DatasetFingerprint, compute_quality_score,
+    create_quality_model, load_tuned_params, quality_score_maxima, save_model_artifact
+)
+from roadmap_recommender import save_roadmap_model
+
+CHECKPOINT_VERSION = 1
+
+MODELS_DIR = 'ml_example/models/'
+DEFAULT_CHECKPOINT = os.path.join(MODELS_DIR, 'streaming_checkpoint.joblib')
+
+
+def dataset_signature(path):
+    """Ruta, tamaño y fecha del dataset: un checkpoint solo se reanuda sobre el mismo archivo"""
+    stat_path = path
+    if os.path.isdir(path):
+        stat_path = os.path.join(path, 'dataset.json')
+    elif os.path.isdir(npy_dataset_path(path)):
+        stat_path = os.path.join(npy_dataset_path(path), 'dataset.json')
+
+    stat = os.stat(stat_path) if os.path.exists(stat_path) else os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def create_streaming_model():
+    """Red de create_quality_model() apta para partial_fit (sin early stopping)"""
+    return create_quality_model({**load_tuned_params('quality_model'), 'early_stopping': False})
+
+
+def stats_pass(path, chunksize):
+    """
+    Primera pasada: scaler, máximos del quality score y huella del dataset
+
+    Returns:
+        dict: {'scaler', 'maxima', 'fingerprint', 'rows', 'chunks'}
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    fingerprint = DatasetFingerprint()
+    max_efficiency = max_engagement = -np.inf
+    rows = chunks = 0
+
+    for _, chunk in iter_dataset_chunks(path, chunksize):
+        scaler.partial_fit(chunk[FEATURES])
+        fingerprint.update(chunk)
+        chunk_efficiency, chunk_engagement = quality_score_maxima(chunk)
+        max_efficiency = max(max_efficiency, chunk_efficiency)
+        max_engagement = max(max_engagement, chunk_engagement)
+        rows += len(chunk)
+        chunks += 1
+
+    return {
+        'scaler': scaler,
+        'maxima': (float(max_efficiency), float(max_engagement)),
+        'fingerprint': fingerprint.result(),
+        'rows': rows,
+        'chunks': chunks
+    }
+
+
+def save_checkpoint(state, path):
+    """Guardar el checkpoint (atómico: archivo temporal + rename)"""
+    import joblib
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, signature, chunksize):
+    """Checkpoint de una ejecución interrumpida sobre el mismo dataset, o None"""
+    import joblib
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        state = joblib.load(path)
+    except Exception:
+        return None
+
+    if (state.get('version') != CHECKPOINT_VERSION or state.get('model_version') != MODEL_VERSION
+            or state.get('dataset') != signature or state.get('chunksize') != chunksize):
+        return None
+    return state
+
+
+def train_streaming(path, chunksize=100000, epochs=5, checkpoint_path=DEFAULT_CHECKPOINT,
+                    resume=True, checkpoint_every=1, log=print):
+    """
+    Entrenar scaler y red por bloques, con checkpoints para reanudar
+
+    Returns:
+        dict: Estado final ('scaler', 'model', 'fingerprint', 'rows', ...)
+    """
+    signature = dataset_signature(path)
+    state = load_checkpoint(checkpoint_path, signature, chunksize) if resume else None
+
+    if state is not None:
+        log(f"↻ Reanudando: época {state['epoch'] + 1}, bloque {state['chunk']}")
+    else:
+        start = time.perf_counter()
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'model_version': MODEL_VERSION,
+            'dataset': signature,
+            'chunksize': chunksize,
+            **stats_pass(path, chunksize),
+            'model': create_streaming_model(),
+            'epoch': 0,
+            'chunk': 0,
+            'rows_trained': 0
+        }
+        log(f"✓ Estadísticas: {state['rows']} filas en {state['chunks']} bloques "
+            f"({time.perf_counter() - start:.2f}s)")
+        save_checkpoint(state, checkpoint_path)
+
+    while state['epoch'] < epochs:
+        start = time.perf_counter()
+        for index, chunk in iter_dataset_chunks(path, chunksize, state['chunk']):
+            X = state['scaler'].transform(chunk[FEATURES])
+            y = compute_quality_score(chunk, state['maxima'])
+
+            with warnings.catch_warnings():
+                # Una pasada por bloque nunca "converge": es esperado
+                warnings.simplefilter('ignore')
+                state['model'].partial_fit(X, y)
+
+            state['chunk'] = index + 1
+            state['rows_trained'] += len(chunk)
+            if state['chunk'] % checkpoint_every == 0:
+                save_checkpoint(state, checkpoint_path)
+
+        state['epoch'] += 1
+        state['chunk'] = 0
+        save_checkpoint(state, checkpoint_path)
+        log(f"✓ Época {state['epoch']}/{epochs}: loss {state['model'].loss_:.6f} "
+            f"({time.perf_counter() - start:.2f}s)")
+
+    return state
+
+
+def save_models(state, path=MODELS_DIR):
+    """Guardar la red entrenada para ambos recomendadores"""
+    save_roadmap_model(state['model'], state['scaler'], path)
+    return save_model_artifact(path, 'personalized_model', state['fingerprint'], state['model'], state['scaler'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entrenamiento por bloques de la red neuronal de calidad')
+    parser.add_argument('dataset_path', help='Dataset (CSV, Parquet o directorio .npyds)')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Filas por bloque')
+    parser.add_argument('--epochs', type=int, default=5, help='Pasadas de entrenamiento sobre el dataset')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='Archivo de checkpoint')
+    parser.add_argument('--checkpoint-every', type=int, default=1, help='Bloques entre checkpoints')
+    parser.add_argument('--no-resume', action='store_true', help='Ignorar el checkpoint y empezar de cero')
+    parser.add_argument('--models-dir', default=MODELS_DIR, help='Directorio de modelos de los recomendadores')
+    args = parser.parse_args()
+
+    if args.chunksize < 1 or args.checkpoint_every < 1:
+        parser.error('--chunksize y --checkpoint-every deben ser positivos')
+
+    # Mensajes de progreso a stderr: stdout queda para el resumen JSON
+    def log(message):
+        print(message, file=sys.stderr)
+
+    state = train_streaming(
+        args.dataset_path,
+        chunksize=args.chunksize,
+        epochs=args.epochs,
+        checkpoint_path=args.checkpoint,
+        resume=not args.no_resume,
+        checkpoint_every=args.checkpoint_every,
+        log=log
+    )
+    artifact_path = save_models(state, args.models_dir)
+
+    # El entrenamiento terminó: la próxima ejecución empieza de cero
+    try:
+        os.remove(args.checkpoint)
+    except OSError:
+        pass
+
+    print(json.dumps({
+        'rows': state['rows'],
+        'chunks': state['chunks'],
+        'epochs': state['epoch'],
+        'rows_trained': state['rows_trained'],
+        'loss': float(state['model'].loss_),
+        'fingerprint': state['fingerprint'],
+        'artifact': artifact_path
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
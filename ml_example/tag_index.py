@@ -0,0 +1,418 @@
+"""
+Índice invertido de tags (tag -> posiciones de fila)
+Se construye una sola vez al cargar el dataset, para que filtrar por tag sea
+una búsqueda en un diccionario en lugar de recorrer y pasar a minúsculas la
+columna 'tags' completa en cada petición.
+
+También guarda la matriz de incidencia roadmap x tag (CSR) para calcular la
+similitud con los tags de un usuario como un único producto matriz-vector, y
+da el conjunto de filas de cada tag como bitmap (bits empaquetados de NumPy)
+para evaluar consultas con AND/OR/NOT (ver tag_query.py).
+
+En el modo compacto (ver compact_catalogue.py) guarda además el texto original
+de la columna 'tags' codificado con diccionario, y el DataFrame ya no necesita
+la columna de strings.
+"""
+
+import json
+import os
+import sys
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Los tags con al menos n_rows / BITMAP_CACHE_RATIO filas guardan su bitmap en
+# caché (cuesta n_rows / 8 bytes; los tags poco frecuentes se rehacen al vuelo)
+BITMAP_CACHE_RATIO = 32
+
+
+def split_tags(tags_str):
+    """
+    Separar un string de tags 'a, B,c' en tags normalizados ['a', 'b', 'c']
+
+    Mismo criterio que el TagIndex: los fragmentos vacíos ('a,,b', 'a,') y un
+    valor nulo (NaN) no son tags. Antes del índice contaban como '' y 'nan' en
+    el total de tags del roadmap y bajaban su similitud.
+    """
+    if tags_str is None or (isinstance(tags_str, float) and np.isnan(tags_str)):
+        return []
+    tags = [t.strip().lower() for t in str(tags_str).split(',')]
+    return [t for t in tags if t]
+
+
+class TagIndex:
+    """
+    Índice invertido tag -> filas
+
+    Las filas de cada tag se guardan contiguas y ordenadas en un único array
+    (formato CSR), de modo que la búsqueda exacta devuelve una vista sin copias.
+    """
+
+    def __init__(self, tags):
+        """
+        Args:
+            tags: Serie con los tags de cada roadmap separados por comas
+        """
+        self.n_rows = len(tags)
+
+        rows, row_tags = self._explode(tags, np.arange(self.n_rows))
+        codes, vocabulary = pd.factorize(row_tags, sort=True)
+
+        self.vocabulary = list(vocabulary)
+        self._build(rows, codes)
+        self.text_tokens = None
+
+    @staticmethod
+    def _explode(tags, positions):
+        """Una entrada por par (fila, tag normalizado), sin duplicados"""
+        exploded = (
+            pd.Series(np.asarray(tags, dtype=object), index=positions)
+            .fillna('')
+            .astype(str)
+            .str.lower()
+            .str.split(',')
+            .explode()
+            .str.strip()
+        )
+        exploded = exploded[exploded.notna() & (exploded != '')]
+        pairs = pd.DataFrame({
+            'row': exploded.index.values.astype(np.int64),
+            'tag': exploded.values
+        }).drop_duplicates()
+
+        return pairs['row'].values, pairs['tag'].values
+
+    def _build(self, rows, tag_ids):
+        """Construir listas por tag, offsets e incidencia a partir de los pares"""
+        # Agrupar por tag y, dentro de cada tag, por fila
+        order = np.lexsort((rows, tag_ids))
+        self.row_tag_ids = tag_ids[order]
+        self._rows = rows[order]
+
+        self._tag_ids = {tag: i for i, tag in enumerate(self.vocabulary)}
+        self._offsets = np.searchsorted(self.row_tag_ids, np.arange(len(self.vocabulary) + 1))
+
+        # Matriz de incidencia roadmap x tag (1 si el roadmap tiene el tag)
+        self.incidence = sparse.csr_matrix(
+            (np.ones(len(self._rows)), (self._rows, self.row_tag_ids)),
+            shape=(self.n_rows, len(self.vocabulary))
+        )
+        self.row_tag_counts = np.diff(self.incidence.indptr)
+        self._bitmaps = {}
+
+    def save(self, path):
+        """Guardar el índice en un directorio (una .npy por array + vocabulario)"""
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            'rows': self._rows,
+            'row_tag_ids': self.row_tag_ids,
+            'offsets': self._offsets,
+            'indptr': self.incidence.indptr,
+            'indices': self.incidence.indices,
+            'data': self.incidence.data
+        }
+        if self.text_tokens is not None:
+            arrays.update({'text_codes': self._text_codes, 'text_indptr': self._text_indptr})
+        for name, values in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), values)
+        with open(os.path.join(path, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'n_rows': self.n_rows,
+                'vocabulary': self.vocabulary,
+                'text_tokens': self.text_tokens
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Cargar un índice guardado con save()
+
+        Los arrays se abren con memory-map: varios procesos que cargan el mismo
+        directorio comparten una sola copia física.
+        """
+        with open(os.path.join(path, 'vocabulary.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in ['rows', 'row_tag_ids', 'offsets', 'indptr', 'indices', 'data']
+        }
+
+        index = cls.__new__(cls)
+        index.n_rows = meta['n_rows']
+        index.vocabulary = meta['vocabulary']
+        index._tag_ids = {tag: i for i, tag in enumerate(index.vocabulary)}
+        index._rows = arrays['rows']
+        index.row_tag_ids = arrays['row_tag_ids']
+        index._offsets = arrays['offsets']
+        index.incidence = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=(index.n_rows, len(index.vocabulary)),
+            copy=False
+        )
+        index.row_tag_counts = np.diff(index.incidence.indptr)
+        index._bitmaps = {}
+
+        index.text_tokens = meta.get('text_tokens')
+        if index.text_tokens is not None:
+            index._text_codes = np.load(os.path.join(path, 'text_codes.npy'), mmap_mode='r')
+            index._text_indptr = np.load(os.path.join(path, 'text_indptr.npy'), mmap_mode='r')
+        return index
+
+    def update(self, rows, tags, n_rows):
+        """
+        Re-indexar solo las filas modificadas o nuevas
+
+        Args:
+            rows: Posiciones de las filas tocadas
+            tags: Nuevos tags de esas filas (mismo orden que `rows`)
+            n_rows: Total de filas del catálogo tras la actualización
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        keep = ~np.isin(self._rows, rows)
+        new_rows, new_tags = self._explode(tags, rows)
+
+        # Vocabulario ordenado con los tags que siguen en uso
+        kept_tags = np.asarray(self.vocabulary, dtype=object)[self.row_tag_ids[keep]]
+        all_tags = np.concatenate([kept_tags, np.asarray(new_tags, dtype=object)])
+        tag_ids, vocabulary = pd.factorize(all_tags, sort=True)
+
+        self.n_rows = n_rows
+        self.vocabulary = list(vocabulary)
+        self._build(np.concatenate([self._rows[keep], new_rows]), tag_ids)
+
+    def store_text(self, tags):
+        """
+        Guardar el texto original de los tags codificado con diccionario
+
+        Cada fila queda como sus fragmentos entre comas (sin normalizar, en su
+        orden) en formato CSR: códigos int16/int32 en un diccionario de fragmentos.
+        row_text() reconstruye exactamente el string original.
+        """
+        fragments = pd.Series(np.asarray(tags, dtype=object)).str.split(',')
+        # Un valor nulo queda como un único fragmento nulo (código -1)
+        lengths = fragments.str.len().fillna(1).to_numpy(dtype=np.int64)
+        codes, tokens = pd.factorize(fragments.explode().to_numpy())
+
+        self.text_tokens = [str(token) for token in tokens]
+        self._text_codes = codes.astype(np.int16 if len(tokens) < np.iinfo(np.int16).max else np.int32)
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        self._text_indptr = indptr.astype(np.int32) if indptr[-1] < np.iinfo(np.int32).max else indptr
+
+    def row_text(self, rows):
+        """Texto original de la columna 'tags' para las filas indicadas (ver store_text)"""
+        texts = []
+        for row in np.asarray(rows, dtype=np.int64).ravel():
+            codes = self._text_codes[self._text_indptr[row]:self._text_indptr[row + 1]]
+            if len(codes) == 1 and codes[0] < 0:
+                texts.append(np.nan)
+            else:
+                texts.append(','.join(self.text_tokens[code] for code in codes))
+        return texts
+
+    def text_arrays(self):
+        """Arrays del texto guardado (para hashes y reportes), o () si no hay"""
+        if self.text_tokens is None:
+            return ()
+        return self._text_codes, self._text_indptr
+
+    def compact(self):
+        """
+        Reducir los arrays del índice a los tipos más pequeños que alcanzan
+
+        Filas e ids de tag a int32 y la incidencia (todo unos) a float32; las
+        similitudes se siguen calculando en float64.
+        """
+        if self.n_rows < np.iinfo(np.int32).max and len(self.vocabulary) < np.iinfo(np.int32).max:
+            self._rows = self._rows.astype(np.int32)
+            self.row_tag_ids = self.row_tag_ids.astype(np.int32)
+        self.incidence.data = self.incidence.data.astype(np.float32)
+        self.row_tag_counts = self.row_tag_counts.astype(np.int32)
+        return self
+
+    def memory_usage(self):
+        """Bytes por componente del índice (arrays y vocabulario)"""
+        usage = {
+            'rows': self._rows.nbytes + self.row_tag_ids.nbytes + self._offsets.nbytes,
+            'incidence': (
+                self.incidence.data.nbytes + self.incidence.indices.nbytes
+                + self.incidence.indptr.nbytes + self.row_tag_counts.nbytes
+            ),
+            'vocabulary': sum(sys.getsizeof(tag) for tag in self.vocabulary),
+            'bitmaps': sum(bits.nbytes for bits in self._bitmaps.values())
+        }
+        if self.text_tokens is not None:
+            usage['text'] = (
+                self._text_codes.nbytes + self._text_indptr.nbytes
+                + sum(sys.getsizeof(token) for token in self.text_tokens)
+            )
+        return usage
+
+    def pairs(self):
+        """
+        Tabla explotada (tag, fila)
+
+        Returns:
+            tuple: (ids de tag agrupados, filas ordenadas dentro de cada tag)
+        """
+        return self.row_tag_ids, self._rows
+
+    def tag_id(self, tag):
+        """Id del tag normalizado, o None si no existe"""
+        return self._tag_ids.get(tag.strip().lower())
+
+    def exact(self, tag):
+        """Filas cuyo conjunto de tags contiene exactamente `tag`"""
+        tag_id = self.tag_id(tag)
+        if tag_id is None:
+            return np.empty(0, dtype=np.int64)
+
+        return self._rows[self._offsets[tag_id]:self._offsets[tag_id + 1]]
+
+    def prefix(self, prefix):
+        """Filas con algún tag que empiece por `prefix`"""
+        prefix = prefix.strip().lower()
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + '\uffff')
+
+        if end - start == 1:
+            return self._rows[self._offsets[start]:self._offsets[end]]
+
+        return np.unique(self._rows[self._offsets[start]:self._offsets[end]])
+
+    def match(self, tag):
+        """
+        Búsqueda por tag: coincidencia exacta, o por prefijo si el tag no existe
+
+        Así 'java' no devuelve roadmaps de 'javascript', pero una búsqueda
+        incompleta como 'prog' sigue encontrando 'programming'.
+        """
+        if self.tag_id(tag) is not None:
+            return self.exact(tag)
+
+        return self.prefix(tag)
+
+    def row_tags(self, rows):
+        """Conjunto de tags de las filas indicadas"""
+        return {self.vocabulary[tag_id] for tag_id in self.rows_tag_ids(rows)}
+
+    def rows_tag_ids(self, rows):
+        """Ids (ordenados, sin repetir) de los tags de las filas indicadas"""
+        return np.unique(self.incidence[np.asarray(rows, dtype=np.int64)].indices)
+
+    def known_tag_ids(self, tags):
+        """
+        Separar tags ya normalizados en conocidos y desconocidos
+
+        Returns:
+            tuple: (ids de los que están en el vocabulario, lista de los que no)
+        """
+        known, unknown = [], []
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                unknown.append(tag)
+            else:
+                known.append(tag_id)
+        return np.asarray(known, dtype=np.int64), unknown
+
+    def tag_matrix(self, tag_sets):
+        """Matriz dispersa (conjuntos x vocabulario) con un 1 por tag conocido"""
+        indptr = [0]
+        indices = []
+        for tags in tag_sets:
+            indices.extend(self._tag_ids[tag] for tag in tags if tag in self._tag_ids)
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (np.ones(len(indices)), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(tag_sets), len(self.vocabulary))
+        )
+
+    def tag_vector(self, tags):
+        """Vector binario (una posición por tag del vocabulario) de un conjunto de tags"""
+        vector = np.zeros(len(self.vocabulary))
+        tag_ids = [self._tag_ids[tag] for tag in tags if tag in self._tag_ids]
+        vector[tag_ids] = 1.0
+        return vector
+
+    def similarity(self, user_tags):
+        """
+        Similitud de todos los roadmaps con los tags del usuario
+
+        Returns:
+            np.ndarray: Por fila, tags en común / total de tags del roadmap (0 a 1)
+        """
+        if not user_tags:
+            return np.zeros(self.n_rows)
+
+        overlap = self.incidence @ self.tag_vector(user_tags)
+
+        return np.divide(
+            overlap,
+            self.row_tag_counts,
+            out=np.zeros(self.n_rows),
+            where=self.row_tag_counts > 0
+        )
+
+    def similarity_rows(self, rows, user_tags):
+        """
+        Similitud exacta (como similarity) solo para las filas indicadas
+
+        Returns:
+            np.ndarray: Similitud de cada fila de `rows` (mismo orden)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not user_tags or len(rows) == 0:
+            return np.zeros(len(rows))
+
+        overlap = self.incidence[rows] @ self.tag_vector(user_tags)
+        counts = self.row_tag_counts[rows]
+
+        return np.divide(overlap, counts, out=np.zeros(len(rows)), where=counts > 0)
+
+    def rows_bitmap(self, rows):
+        """
+        Bitmap de un conjunto de filas: n_rows bits empaquetados (np.packbits)
+
+        Args:
+            rows: Posiciones de fila sin repetir
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n_bytes = (self.n_rows + 7) // 8
+        if len(rows) == 0:
+            return np.zeros(n_bytes, dtype=np.uint8)
+
+        # Cada fila suma su bit (128 >> fila % 8) a su byte; sin repetidos no hay acarreo
+        return np.bincount(rows >> 3, weights=128 >> (rows & 7), minlength=n_bytes).astype(np.uint8)
+
+    def all_bitmap(self):
+        """Bitmap con todas las filas (los bits de relleno del último byte a 0)"""
+        bits = self._bitmaps.get(None)
+        if bits is None:
+            bits = np.packbits(np.ones(self.n_rows, dtype=bool))
+            self._bitmaps[None] = bits
+        return bits
+
+    def bitmap(self, tag):
+        """
+        Bitmap de las filas de un tag, con la misma búsqueda que match()
+
+        Los bitmaps de los tags frecuentes quedan en caché; no se deben modificar.
+        """
+        tag_id = self.tag_id(tag)
+        if tag_id is None:
+            return self.rows_bitmap(self.prefix(tag))
+
+        bits = self._bitmaps.get(tag_id)
+        if bits is None:
+            rows = self.exact(tag)
+            bits = self.rows_bitmap(rows)
+            if len(rows) * BITMAP_CACHE_RATIO >= self.n_rows:
+                self._bitmaps[tag_id] = bits
+        return bits
+
+    def bitmap_rows(self, bits):
+        """Posiciones (ordenadas) de los bits activos de un bitmap"""
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
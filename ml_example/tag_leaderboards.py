@@ -0,0 +1,152 @@
+"""
+Rankings precalculados por tag (leaderboards)
+El ranking de un tag solo cambia cuando cambian el dataset o los scores, así
+que en lugar de filtrar y ordenar los candidatos en cada consulta se guarda,
+para cada tag, la lista de sus K mejores roadmaps por final_score.
+
+- Construcción: una sola pasada vectorizada sobre la tabla explotada
+  (tag, fila) del TagIndex: orden por (tag, -score, fila) y rango dentro de
+  cada tag a partir de sus offsets; se conservan los de rango < K.
+- Consulta: se recorre la lista del tag saltando las filas excluidas. Si la
+  lista se agota antes de juntar los resultados y el tag tenía más de K
+  roadmaps, la consulta devuelve None y el recomendador calcula el ranking
+  completo como antes.
+
+El artefacto (listas en formato CSR, int32) se guarda en
+ml_example/models/leaderboards_<clave>/ y se abre con memory-map; la clave
+depende de los tags de cada fila y de final_score.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from recommender_common import remove_old_artifacts, save_directory
+
+# Subir cuando cambie el formato o el orden de las listas
+LEADERBOARD_VERSION = 1
+
+# Roadmaps guardados por tag
+LEADERBOARD_SIZE = 100
+
+LEADERBOARD_ARRAYS = ['rows', 'offsets', 'counts']
+
+
+class TagLeaderboards:
+    """Top K de cada tag (posiciones de fila), en el orden de top_k_indices"""
+
+    def __init__(self, rows, offsets, counts, k):
+        self.rows = rows
+        self.offsets = offsets
+        self.counts = counts
+        self.k = k
+
+    @classmethod
+    def build(cls, tag_index, scores, k=LEADERBOARD_SIZE):
+        """
+        Construir las listas de todos los tags en una pasada
+
+        Args:
+            tag_index: TagIndex del catálogo
+            scores: final_score por fila
+        """
+        tag_ids, rows = tag_index.pairs()
+        tag_ids = np.asarray(tag_ids)
+        rows = np.asarray(rows)
+        n_tags = len(tag_index.vocabulary)
+
+        # Dentro de cada tag: mayor score primero, empates por posición (como nlargest)
+        order = np.lexsort((rows, -np.asarray(scores, dtype=np.float64)[rows], tag_ids))
+        tag_ids = tag_ids[order]
+        rows = rows[order]
+
+        starts = np.searchsorted(tag_ids, np.arange(n_tags + 1))
+        rank = np.arange(len(rows)) - starts[tag_ids]
+        keep = rank < k
+
+        return cls(
+            rows[keep].astype(np.int32),
+            np.searchsorted(tag_ids[keep], np.arange(n_tags + 1)),
+            np.diff(starts),
+            k
+        )
+
+    def top_rows(self, tag_id, n, excluded_rows=None):
+        """
+        Las n mejores filas de un tag saltando las excluidas
+
+        Args:
+            excluded_rows: Posiciones que no se pueden devolver
+
+        Returns:
+            np.ndarray | None: Posiciones en orden de ranking, o None si la
+                lista guardada no alcanza (hay que calcular el ranking completo)
+        """
+        board = np.asarray(self.rows[self.offsets[tag_id]:self.offsets[tag_id + 1]], dtype=np.int64)
+        if excluded_rows is not None and len(excluded_rows):
+            board = board[~np.isin(board, excluded_rows)]
+
+        if len(board) < n and self.counts[tag_id] > self.k:
+            return None
+        return board[:n]
+
+    def save(self, path):
+        """Guardar en un directorio (ver save_directory)"""
+        def write(tmp_path):
+            for name in LEADERBOARD_ARRAYS:
+                np.save(os.path.join(tmp_path, f'{name}.npy'), getattr(self, name))
+            with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'version': LEADERBOARD_VERSION, 'k': self.k}, f)
+
+        return save_directory(path, write)
+
+    @classmethod
+    def load(cls, path):
+        """Cargar listas guardadas con save() (arrays con memory-map)"""
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != LEADERBOARD_VERSION:
+            raise ValueError(f"Versión de leaderboards no soportada: {meta.get('version')}")
+
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in LEADERBOARD_ARRAYS}
+        return cls(k=meta['k'], **arrays)
+
+
+def leaderboard_key(tag_index, scores, k=LEADERBOARD_SIZE):
+    """Clave de las listas: tags de cada fila (arrays del TagIndex) + scores"""
+    tag_ids, rows = tag_index.pairs()
+    digest = hashlib.sha1(f'{LEADERBOARD_VERSION}:{k}:{tag_index.n_rows}'.encode('utf-8'))
+    digest.update(json.dumps(tag_index.vocabulary, ensure_ascii=False).encode('utf-8'))
+    # Mismos bytes con los arrays compactos (int32) del modo compacto
+    for values, dtype in ((tag_ids, np.int64), (rows, np.int64), (scores, np.float64)):
+        digest.update(np.ascontiguousarray(values, dtype=dtype).tobytes())
+    return digest.hexdigest()[:20]
+
+
+def load_or_build_leaderboards(tag_index, scores, path='ml_example/models/', k=LEADERBOARD_SIZE, keep_last=3):
+    """
+    Cargar las listas de este catálogo y scores, o construirlas y guardarlas
+
+    Si no se puede escribir el directorio, las listas se usan solo en memoria.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    board_path = os.path.join(path, f'leaderboards_{leaderboard_key(tag_index, scores, k)}')
+
+    if os.path.isdir(board_path):
+        try:
+            return TagLeaderboards.load(board_path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    leaderboards = TagLeaderboards.build(tag_index, scores, k)
+
+    try:
+        os.makedirs(path, exist_ok=True)
+        leaderboards.save(board_path)
+    except OSError:
+        return leaderboards
+
+    remove_old_artifacts(path, 'leaderboards_*', keep_last)
+    return leaderboards
@@ -0,0 +1,222 @@
+"""
+Consultas booleanas de tags ("python AND data, NOT beginner")
+Permiten combinar varios tags en una sola llamada en lugar de hacer una
+búsqueda por tag y cruzar los resultados.
+
+Sintaxis:
+- AND, & o && (la coma también es AND): roadmaps con ambos tags
+- OR, | o ||: roadmaps con alguno de los tags
+- NOT o !: roadmaps sin el tag (NOT o un paréntesis tras un tag es un AND implícito)
+- Paréntesis para agrupar; NOT > AND > OR en precedencia
+- Cada término se busca como match() del TagIndex (exacto, o por prefijo si
+  no existe) y puede tener varias palabras ('machine learning')
+
+Los operadores en palabras van en mayúsculas: 'rock and roll' es un único tag.
+
+Donde se acepta un tag, una consulta va con el prefijo 'q:' ("q:python AND
+data"); sin él el texto siempre es un tag, aunque tenga comas o paréntesis
+("c++ (avanzado)"). Los métodos *_by_query y el parámetro `query` no necesitan
+el prefijo.
+
+Cada término se evalúa como bitmap del TagIndex (un bit por fila, bits
+empaquetados con NumPy) y AND/OR/NOT son operaciones bit a bit sobre n_rows / 8
+bytes, antes de calcular ningún score. Los roadmaps excluidos se aplican igual
+(AND NOT con su bitmap).
+"""
+
+import re
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r'\(|\)|&&?|\|\|?|!|,|[^()&|!,]+')
+
+_KEYWORDS = {'AND': 'and', 'OR': 'or', 'NOT': 'not'}
+
+_SYMBOLS = {'&': 'and', '&&': 'and', ',': 'and', '|': 'or', '||': 'or', '!': 'not', '(': '(', ')': ')'}
+
+QUERY_PREFIX = 'q:'
+
+
+def is_tag_query(text):
+    """True si el texto es una consulta con prefijo 'q:' (si no, es un tag simple)"""
+    return bool(text) and text.lstrip()[:len(QUERY_PREFIX)].lower() == QUERY_PREFIX
+
+
+def as_tag_query(text):
+    """El texto como consulta (con el prefijo 'q:', si no lo tenía)"""
+    return text if is_tag_query(text) else QUERY_PREFIX + text
+
+
+def _tokenize(text):
+    """Lista de (tipo, valor): operadores y términos ya normalizados"""
+    tokens = []
+    for chunk in _TOKEN_PATTERN.findall(text):
+        if chunk in _SYMBOLS:
+            tokens.append((_SYMBOLS[chunk], chunk))
+            continue
+
+        # Palabras sueltas: las consecutivas que no son operador forman un término
+        words = []
+        for word in chunk.split():
+            if word in _KEYWORDS:
+                if words:
+                    tokens.append(('tag', ' '.join(words).lower()))
+                    words = []
+                tokens.append((_KEYWORDS[word], word))
+            else:
+                words.append(word)
+        if words:
+            tokens.append(('tag', ' '.join(words).lower()))
+
+    return tokens
+
+
+class _Parser:
+    """Descenso recursivo: or := and (OR and)*, and := unary (AND? unary)*"""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def error(self, message):
+        return ValueError(f'Consulta de tags no válida ({message}): {self.text!r}')
+
+    def parse(self):
+        if not self.tokens:
+            raise self.error('vacía')
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise self.error(f"'{self.tokens[self.position][1]}' inesperado")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == 'or':
+            self.take()
+            children.append(self.parse_and())
+        return _combine('or', children)
+
+    def parse_and(self):
+        children = [self.parse_unary()]
+        while self.peek() in ('and', 'not', '('):
+            if self.peek() == 'and':
+                self.take()
+            children.append(self.parse_unary())
+        return _combine('and', children)
+
+    def parse_unary(self):
+        kind = self.peek()
+        if kind == 'not':
+            self.take()
+            return ('not', self.parse_unary())
+        if kind == '(':
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise self.error("falta ')'")
+            self.take()
+            return node
+        if kind == 'tag':
+            return self.take()
+        raise self.error('falta un tag' if kind is None else f"'{self.tokens[self.position][1]}' inesperado")
+
+
+def _combine(operator, children):
+    """Nodo AND/OR aplanando hijos del mismo operador"""
+    if len(children) == 1:
+        return children[0]
+
+    flat = []
+    for child in children:
+        flat.extend(child[1] if child[0] == operator else [child])
+    return (operator, flat)
+
+
+def parse_tag_query(text):
+    """
+    Analizar una consulta de tags (con o sin el prefijo 'q:')
+
+    Returns:
+        tuple: Árbol de nodos ('tag', término), ('not', nodo), ('and', [nodos])
+            u ('or', [nodos])
+
+    Raises:
+        ValueError: Si la consulta está vacía o mal formada
+    """
+    text = str(text)
+    if is_tag_query(text):
+        text = text.lstrip()[len(QUERY_PREFIX):]
+    return _Parser(text).parse()
+
+
+def format_tag_query(node):
+    """Forma canónica de una consulta (sirve como clave de caché)"""
+    kind = node[0]
+    if kind == 'tag':
+        return node[1]
+    if kind == 'not':
+        return f'NOT {format_tag_query(node[1])}'
+    return '(' + f' {kind.upper()} '.join(format_tag_query(child) for child in node[1]) + ')'
+
+
+def query_bitmap(tag_index, node):
+    """
+    Evaluar una consulta ya analizada sobre los bitmaps del TagIndex
+
+    Returns:
+        np.ndarray: Bitmap (uint8 empaquetado) de las filas que cumplen la consulta;
+            puede ser un bitmap en caché del índice, no se debe modificar
+    """
+    kind = node[0]
+    if kind == 'tag':
+        return tag_index.bitmap(node[1])
+    if kind == 'not':
+        return np.bitwise_and(np.invert(query_bitmap(tag_index, node[1])), tag_index.all_bitmap())
+
+    children = node[1]
+    if kind == 'or':
+        bits = query_bitmap(tag_index, children[0]).copy()
+        for child in children[1:]:
+            np.bitwise_or(bits, query_bitmap(tag_index, child), out=bits)
+        return bits
+
+    # AND: primero los términos positivos, después se quitan los negados (a & ~b)
+    positives = [child for child in children if child[0] != 'not']
+    negatives = [child[1] for child in children if child[0] == 'not']
+
+    bits = (query_bitmap(tag_index, positives[0]) if positives else tag_index.all_bitmap()).copy()
+    for child in positives[1:]:
+        np.bitwise_and(bits, query_bitmap(tag_index, child), out=bits)
+    for child in negatives:
+        np.bitwise_and(bits, np.invert(query_bitmap(tag_index, child)), out=bits)
+    return bits
+
+
+def query_rows(tag_index, query, exclude_rows=None):
+    """
+    Filas que cumplen una consulta, menos las excluidas
+
+    Args:
+        tag_index: TagIndex del catálogo
+        query: Texto de la consulta o árbol de parse_tag_query()
+        exclude_rows: Posiciones de fila a descartar (sin repetir)
+
+    Returns:
+        np.ndarray: Posiciones ordenadas de menor a mayor
+    """
+    node = parse_tag_query(query) if isinstance(query, str) else query
+    bits = query_bitmap(tag_index, node)
+
+    if exclude_rows is not None and len(exclude_rows):
+        bits = np.bitwise_and(bits, np.invert(tag_index.rows_bitmap(exclude_rows)))
+
+    return tag_index.bitmap_rows(bits)
@@ -0,0 +1,75 @@
+"""
+Fixtures de las pruebas de paridad
+Los módulos de ml_example se importan entre sí por nombre (como los scripts),
+así que se agrega su directorio al path.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VOCABULARY = [
+    'python', 'javascript', 'java', 'data', 'web', 'ml', 'sql', 'react',
+    'devops', 'ética', 'valores', 'programming', 'development'
+]
+
+
+def synthetic_catalogue(n_rows=240, seed=0):
+    """Catálogo con las columnas del dataset exportado por Laravel"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n_rows):
+        tags = ','.join(rng.choice(VOCABULARY, rng.integers(1, 5), replace=False))
+        completions, dropouts = int(rng.integers(0, 300)), int(rng.integers(0, 100))
+        hours, nodes = float(rng.uniform(1, 60)), float(rng.uniform(1, 40))
+        bookmarks, usefulness = int(rng.integers(0, 200)), float(rng.uniform(1, 5))
+        rows.append({
+            'roadmap_id': f'rm{i:05d}',
+            'name': f'Roadmap {i}',
+            'tags': tags,
+            'completion_count': completions,
+            'dropout_count': dropouts,
+            'avg_hours_spent': hours,
+            'avg_nodes_completed': nodes,
+            'bookmark_count': bookmarks,
+            'usefulness_score': usefulness,
+            'completion_rate': round(completions / max(1, completions + dropouts), 4),
+            'dropout_rate': round(dropouts / max(1, completions + dropouts), 4),
+            'efficiency_rate': round(nodes / hours, 4),
+            'engagement_score': round(bookmarks * usefulness, 2),
+            'created_at': '2025-11-17 10:00:00'
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope='session')
+def catalogue_path(tmp_path_factory):
+    """
+    CSV del catálogo sintético, con el directorio de trabajo en una carpeta temporal
+
+    Los recomendadores guardan modelos y cachés en ml_example/models/ (ruta
+    relativa): así no tocan los del proyecto.
+    """
+    workdir = tmp_path_factory.mktemp('catalogue')
+    path = workdir / 'roadmaps.csv'
+    synthetic_catalogue().to_csv(path, index=False)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    yield str(path)
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope='session')
+def personalized(catalogue_path):
+    """PersonalizedRecommender base (sin usuario) con el modelo entrenado"""
+    from personalized_recommender import PersonalizedRecommender
+
+    recommender = PersonalizedRecommender(catalogue_path, {})
+    recommender.ensure_model()
+    return recommender
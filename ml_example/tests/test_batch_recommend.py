@@ -0,0 +1,35 @@
+"""
+Pruebas de las recomendaciones por lotes (iter_batch_recommendations)
+Cada resultado del lote debe ser igual al de get_recommendations para ese
+usuario solo.
+"""
+
+import json
+
+import numpy as np
+
+
+def _batch_users(ids, n_users=60, seed=1):
+    rng = np.random.default_rng(seed)
+    tags = [None, 'data', 'prog', 'zzz', 'ética', 'q:python AND NOT sql']
+    return [
+        {
+            'user_id': user_id,
+            'completed_roadmaps': list(rng.choice(ids, rng.integers(0, 8), replace=False)) + ['desconocido'],
+            'completed_nodes': list(rng.choice(['react', 'sql', 'Kotlin'], rng.integers(0, 3), replace=False)),
+            'tag': tags[user_id % len(tags)]
+        }
+        for user_id in range(n_users)
+    ]
+
+
+def test_batch_recommendations_match_single_user(personalized):
+    users = _batch_users(list(personalized.df['roadmap_id']))
+
+    results = list(personalized.iter_batch_recommendations(users, top_n=5, batch_size=7))
+    assert len(results) == len(users)
+
+    for user, result in zip(users, results):
+        single = personalized.for_user({**user, 'user_id': None}).get_recommendations(tag=user['tag'], top_n=5)
+        result = {key: value for key, value in result.items() if key != 'user_id'}
+        assert json.dumps(result, sort_keys=True, default=str) == json.dumps(single, sort_keys=True, default=str)
@@ -0,0 +1,77 @@
+"""
+Pruebas de los deltas del catálogo (apply_catalogue_delta / apply_metric_updates)
+Aplicar un delta sobre el catálogo residente debe dar lo mismo que preparar y
+puntuar desde cero el dataset ya con esos cambios.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import synthetic_catalogue
+from mlp_inference import KERNEL_TOLERANCE
+from online_learning import apply_metric_events
+from recommender_common import (
+    SchemaChangedError, apply_catalogue_delta, apply_metric_updates, compute_quality_score,
+    score_catalogue
+)
+from tag_index import TagIndex
+
+
+@pytest.mark.parametrize('engagement_score', [12.5, 10.0 ** 6])
+def test_delta_matches_rebuilt_catalogue(personalized, engagement_score):
+    base = synthetic_catalogue()
+    delta = base.iloc[[5, 7]].copy()
+    delta['completion_count'] += 10
+    delta['engagement_score'] = engagement_score
+    delta['tags'] = ['python,aaa', 'nuevo']
+    added = base.iloc[[0]].assign(roadmap_id='rm99999', tags='sql,zeta')
+    delta = pd.concat([delta, added], ignore_index=True)
+    live_df, live_index = personalized.df, personalized.tag_index
+    live_scores = live_df['final_score'].to_numpy().copy()
+
+    df, tag_index, stats = apply_catalogue_delta(
+        live_df, delta, live_index, personalized.model, personalized.scaler
+    )
+
+    expected = base.copy()
+    expected.iloc[[5, 7]] = delta.iloc[:2].to_numpy()
+    expected = pd.concat([expected, added], ignore_index=True)
+    expected['quality_score'] = compute_quality_score(expected)
+    scores = score_catalogue(expected, personalized.model, personalized.scaler)
+
+    assert stats['updated'] == 2 and stats['added'] == 1
+    # Un nuevo máximo de engagement_score cambia el quality score de todo el catálogo
+    assert stats['rescored_all'] == (engagement_score > base['engagement_score'].max())
+    assert list(df['roadmap_id']) == list(expected['roadmap_id'])
+    np.testing.assert_allclose(df['quality_score'].to_numpy(dtype=np.float64), scores['quality_score'], rtol=0, atol=1e-12)
+    # Las filas tocadas se predicen aparte: en float32 pueden variar en el último bit
+    np.testing.assert_allclose(df['final_score'].to_numpy(dtype=np.float64), scores['final_score'], rtol=0, atol=KERNEL_TOLERANCE)
+
+    rebuilt = TagIndex(expected['tags'])
+    assert tag_index.vocabulary == rebuilt.vocabulary
+    for tag in rebuilt.vocabulary:
+        assert tag_index.exact(tag).tolist() == rebuilt.exact(tag).tolist()
+
+    # El catálogo residente no se modifica
+    assert personalized.tag_index is live_index and 'aaa' not in live_index.vocabulary
+    np.testing.assert_array_equal(live_df['final_score'].to_numpy(), live_scores)
+
+
+@pytest.fixture
+def duplicated(personalized):
+    """Catálogo con un roadmap_id repetido"""
+    df = pd.concat([personalized.df, personalized.df.iloc[[0]]], ignore_index=True)
+    return df, TagIndex(df['tags'])
+
+
+def test_delta_on_duplicated_ids_requires_full_reload(personalized, duplicated):
+    df, tag_index = duplicated
+    delta = synthetic_catalogue().iloc[[0]]
+
+    with pytest.raises(SchemaChangedError):
+        apply_catalogue_delta(df, delta, tag_index, personalized.model, personalized.scaler)
+    with pytest.raises(SchemaChangedError):
+        apply_metric_updates(df, delta[['roadmap_id', 'completion_count']], personalized.model, personalized.scaler)
+    with pytest.raises(SchemaChangedError):
+        apply_metric_events(df, [{'roadmap_id': 'rm00000', 'event': 'like'}], personalized.model, personalized.scaler)
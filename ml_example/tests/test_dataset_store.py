@@ -0,0 +1,77 @@
+"""
+Pruebas del formato .npyds (dataset_store.py): el directorio NumPy debe
+devolver los mismos valores que el CSV, con el texto como Categorical
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import synthetic_catalogue
+from dataset_store import NPY_DATASET_META, convert_dataset, load_dataset, load_npy_dataset, save_npy_dataset
+from recommender_common import dataset_fingerprint
+
+TEXT_COLUMNS = ['roadmap_id', 'name', 'tags', 'created_at']
+
+
+def _as_object(df):
+    """Columnas Categorical como texto (y fuera del memory-map), para comparar con el original"""
+    return df.copy().astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+
+
+def _dictionary(path, col):
+    with open(os.path.join(path, NPY_DATASET_META), encoding='utf-8') as f:
+        return next(column['dictionary'] for column in json.load(f)['columns'] if column['name'] == col)
+
+
+def test_round_trip_keeps_values_and_dtypes(tmp_path):
+    df = synthetic_catalogue(n_rows=40)
+    df.loc[[3, 7], 'tags'] = np.nan
+
+    loaded = load_npy_dataset(save_npy_dataset(df, str(tmp_path / 'roadmaps.npyds')))
+
+    for col in df.columns:
+        if col in TEXT_COLUMNS:
+            assert isinstance(loaded[col].dtype, pd.CategoricalDtype)
+        else:
+            assert loaded[col].dtype == df[col].dtype
+    assert loaded['tags'].isna().tolist() == df['tags'].isna().tolist()
+    pd.testing.assert_frame_equal(_as_object(loaded), df.astype({col: object for col in TEXT_COLUMNS}))
+
+
+def test_categorical_columns_round_trip_through_their_dictionary(tmp_path):
+    df = pd.DataFrame({
+        'roadmap_id': pd.Categorical(['rm2', 'rm1', None, 'rm2'], categories=['rm9', 'rm2', 'rm1']),
+        'usefulness_score': [1.0, 2.0, 3.0, 4.0]
+    })
+
+    first = save_npy_dataset(df, str(tmp_path / 'first.npyds'))
+    loaded = load_npy_dataset(first)
+    # Solo los valores usados, en orden de aparición; NaN no entra en el diccionario
+    assert _dictionary(first, 'roadmap_id') == ['rm2', 'rm1']
+    assert loaded['roadmap_id'].tolist() == df['roadmap_id'].tolist()
+
+    # Guardar de nuevo un dataset ya cargado (como hace shared_catalogue.py)
+    second = save_npy_dataset(loaded, str(tmp_path / 'second.npyds'))
+    reloaded = load_npy_dataset(second)
+    assert _dictionary(second, 'roadmap_id') == ['rm2', 'rm1']
+    pd.testing.assert_frame_equal(reloaded, loaded)
+
+
+def test_converted_dataset_keeps_the_csv_fingerprint(tmp_path):
+    csv_path = str(tmp_path / 'roadmaps.csv')
+    synthetic_catalogue(n_rows=40).to_csv(csv_path, index=False)
+    npy_path, rows = convert_dataset(csv_path)
+    assert rows == 40
+
+    # El CSV con su .npyds al día se lee del .npyds: la misma huella reutiliza modelos y cachés
+    loaded = load_dataset(csv_path)
+    assert isinstance(loaded['tags'].dtype, pd.CategoricalDtype)
+    assert dataset_fingerprint(loaded) == dataset_fingerprint(pd.read_csv(csv_path))
+
+    # Un CSV más reciente que su .npyds se lee del CSV
+    stat = os.stat(npy_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not isinstance(load_dataset(csv_path)['tags'].dtype, pd.CategoricalDtype)
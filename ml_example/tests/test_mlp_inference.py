@@ -0,0 +1,45 @@
+"""
+Pruebas del kernel de inferencia (mlp_inference.py)
+El kernel plegado debe dar lo mismo que scikit-learn sobre el catálogo sintético.
+"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from conftest import synthetic_catalogue
+from mlp_inference import KERNEL_TOLERANCE, FoldedMLP, predict_quality
+from recommender_common import FEATURES, compute_quality_score, create_quality_model
+
+
+@pytest.fixture(scope='module')
+def quality_model():
+    """MLP de scikit-learn entrenado sobre el catálogo sintético"""
+    from sklearn.preprocessing import StandardScaler
+
+    df = synthetic_catalogue()
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    scaler = StandardScaler().fit(X)
+    model = create_quality_model()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model.fit(scaler.transform(X), compute_quality_score(df))
+    return model, scaler, X
+
+
+def test_folded_kernel_float64_matches_sklearn(quality_model):
+    model, scaler, X = quality_model
+    reference = model.predict(scaler.transform(X))
+
+    folded = FoldedMLP.from_model(model, scaler, np.float64)
+    np.testing.assert_allclose(folded.predict(X), reference, rtol=0, atol=1e-9)
+    # El resultado no depende del tamaño de los bloques
+    np.testing.assert_allclose(folded.predict(X, batch_rows=7), reference, rtol=0, atol=1e-9)
+
+
+def test_predict_quality_within_kernel_tolerance(quality_model):
+    model, scaler, X = quality_model
+    reference = model.predict(scaler.transform(X))
+
+    assert np.max(np.abs(predict_quality(model, scaler, X) - reference)) <= KERNEL_TOLERANCE
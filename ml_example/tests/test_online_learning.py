@@ -0,0 +1,89 @@
+"""
+Pruebas del aprendizaje en línea (online_learning.py): métricas que dejan los
+eventos y partial_fit sobre una copia del modelo, sin tocar el catálogo ni el
+modelo que siguen atendiendo peticiones
+"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from online_learning import apply_metric_events, read_events, trainable_model
+from recommender_common import FEATURES, create_quality_model
+from roadmap_recommender import build_recommender
+
+EVENTS = [
+    {'roadmap_id': 'rm00001', 'event': 'completion', 'hours': 10.0, 'nodes': 8.0, 'count': 2},
+    {'roadmap_id': 'rm00001', 'event': 'dropout'},
+    {'roadmap_id': 'rm00002', 'event': 'like', 'count': 3},
+    {'roadmap_id': 'rm00002', 'event': 'rating', 'value': 1.5},
+    {'roadmap_id': 'rm00002', 'event': 'rating', 'value': 4.5},
+    {'roadmap_id': 'missing', 'event': 'completion'}
+]
+
+
+@pytest.fixture(scope='module')
+def roadmap(catalogue_path):
+    return build_recommender(catalogue_path)
+
+
+def _row(df, roadmap_id):
+    return df[df['roadmap_id'] == roadmap_id].iloc[0]
+
+
+def _weights(model):
+    return [np.array(coef) for coef in model.coefs_]
+
+
+def test_events_update_metrics_on_copies(roadmap):
+    df_before = roadmap.df.copy(deep=True)
+    weights_before = _weights(roadmap.model)
+
+    df, model, stats = apply_metric_events(roadmap.df, EVENTS, roadmap.model, roadmap.scaler)
+
+    old, new = _row(df_before, 'rm00001'), _row(df, 'rm00001')
+    assert new['completion_count'] == old['completion_count'] + 2
+    assert new['dropout_count'] == old['dropout_count'] + 1
+    expected_hours = (old['avg_hours_spent'] * old['completion_count'] + 20.0) / (old['completion_count'] + 2)
+    assert new['avg_hours_spent'] == pytest.approx(expected_hours)
+    attempts = new['completion_count'] + new['dropout_count']
+    assert new['completion_rate'] == round(new['completion_count'] / attempts, 4)
+
+    old, new = _row(df_before, 'rm00002'), _row(df, 'rm00002')
+    assert new['bookmark_count'] == old['bookmark_count'] + 3
+    # El último rating reemplaza usefulness_score
+    assert new['usefulness_score'] == 4.5
+    assert new['engagement_score'] == round(new['bookmark_count'] * 4.5, 2)
+
+    unchanged = ~df['roadmap_id'].isin(['rm00001', 'rm00002'])
+    assert df.loc[unchanged, FEATURES].equals(df_before.loc[unchanged, FEATURES])
+    assert stats['events'] == len(EVENTS) and stats['roadmaps'] == 2 and stats['ignored_roadmaps'] == 1
+    assert stats['trained_rows'] > 0
+
+    # El catálogo y el modelo vivos no cambian
+    assert roadmap.df.equals(df_before)
+    assert model is not roadmap.model
+    assert all(np.array_equal(a, b) for a, b in zip(_weights(roadmap.model), weights_before))
+    assert not all(np.array_equal(a, b) for a, b in zip(_weights(model), weights_before))
+
+
+def test_unknown_event_types_are_rejected():
+    with pytest.raises(ValueError, match='no soportados'):
+        read_events([{'roadmap_id': 'rm00001', 'event': 'share'}])
+
+
+def test_events_train_a_model_fitted_with_early_stopping(roadmap):
+    model = create_quality_model({'max_iter': 20, 'n_iter_no_change': 2})
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model.fit(roadmap.scaler.transform(roadmap.df[FEATURES]),
+                  roadmap.df['quality_score'].to_numpy(dtype=np.float64))
+    assert model.early_stopping and model.best_loss_ is None
+
+    trainable = trainable_model(model)
+    assert not trainable.early_stopping and model.early_stopping
+
+    df, updated, stats = apply_metric_events(roadmap.df, EVENTS, model, roadmap.scaler)
+    assert stats['trained_rows'] > 0 and np.isfinite(stats['loss'])
+    assert np.isfinite(df['final_score'].to_numpy(dtype=np.float64)).all()
@@ -0,0 +1,23 @@
+"""
+Pruebas del cliente del servidor persistente (recommender_client.py): sin
+servidor disponible, los scripts deben calcular en su propio proceso
+"""
+
+import socket
+
+from recommender_client import request_server
+
+
+def test_empty_url_disables_server_mode(monkeypatch):
+    monkeypatch.setenv('ROADMAP_RECOMMENDER_URL', '')
+    assert request_server('get_best_roadmap_by_tag', 'roadmaps.csv', {'tag': 'python'}) is None
+
+
+def test_unreachable_server_falls_back(monkeypatch):
+    # Puerto libre: nada escucha en él
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    monkeypatch.setenv('ROADMAP_RECOMMENDER_URL', f'http://127.0.0.1:{port}/')
+    assert request_server('get_best_roadmap_by_tag', 'roadmaps.csv', {'tag': 'python'}, timeout=1) is None
@@ -0,0 +1,40 @@
+"""
+Pruebas de las utilidades compartidas (recommender_common.py)
+"""
+
+import os
+
+from recommender_common import remove_old_artifacts, save_directory
+
+
+def _touch(path, mtime):
+    with open(path, 'w', encoding='utf-8'):
+        pass
+    os.utime(path, (mtime, mtime))
+
+
+def test_remove_old_artifacts_keeps_newest_with_companions(tmp_path):
+    for i in range(4):
+        _touch(tmp_path / f'model_v{i}.joblib', i)
+        _touch(tmp_path / f'model_v{i}.npz', i)
+    _touch(tmp_path / 'model_v9.joblib.123.tmp', 0)
+
+    remove_old_artifacts(str(tmp_path), 'model_v*.joblib', 2, companions=('.npz',))
+
+    assert sorted(os.listdir(tmp_path)) == [
+        'model_v2.joblib', 'model_v2.npz', 'model_v3.joblib', 'model_v3.npz', 'model_v9.joblib.123.tmp'
+    ]
+
+
+def test_save_directory_is_atomic_and_cleans_up(tmp_path):
+    target = tmp_path / 'store'
+
+    def write(tmp):
+        _touch(os.path.join(tmp, 'a.npy'), 0)
+
+    assert save_directory(str(target), write) == str(target)
+    # Otro proceso ya lo guardó: se descarta el temporal y queda el existente
+    save_directory(str(target), write)
+
+    assert os.listdir(tmp_path) == ['store']
+    assert os.listdir(target) == ['a.npy']
@@ -0,0 +1,131 @@
+"""
+Pruebas del servidor persistente (recommender_server.py) sin abrir sockets:
+entradas por dataset, registro, coalescencia de peticiones y actualización de
+los recomendadores residentes
+"""
+
+import asyncio
+
+import pytest
+
+from conftest import synthetic_catalogue
+from recommender_server import DatasetEntry, RecommenderRegistry, RecommenderService, SingleFlight
+
+
+def test_delta_updates_a_copy_with_its_own_caches(catalogue_path):
+    entry = DatasetEntry(catalogue_path)
+    live_roadmap, live_personalized = entry.roadmap(), entry.personalized()
+    expected = live_roadmap.get_top_roadmaps_by_tag('python', 5)
+    live_personalized.get_recommendations('python')
+    roadmap_cache, personalized_cache = live_roadmap.result_cache, live_personalized.result_cache
+    roadmap_entries, personalized_entries = len(roadmap_cache._entries), len(personalized_cache._entries)
+
+    delta = synthetic_catalogue().iloc[[3]].assign(tags='python', engagement_score=10.0 ** 6)
+    entry.apply_delta(delta)
+    entry.roadmap().get_top_roadmaps_by_tag('python', 5)
+    entry.personalized().get_recommendations('python')
+
+    # La instancia que seguía atendiendo peticiones conserva sus cachés intactas
+    assert entry.roadmap() is not live_roadmap and entry.personalized() is not live_personalized
+    assert entry.roadmap().result_cache is not roadmap_cache
+    assert entry.personalized().result_cache is not personalized_cache
+    assert len(roadmap_cache._entries) == roadmap_entries and roadmap_cache.invalidations == 0
+    assert len(personalized_cache._entries) == personalized_entries and personalized_cache.invalidations == 0
+    assert live_roadmap.get_top_roadmaps_by_tag('python', 5) == expected
+    assert roadmap_cache.hits == 1
+
+
+def test_identical_concurrent_requests_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'roadmap_id': 'rm00001'}
+
+    async def burst():
+        same = [flights.run(('get_best_roadmap_by_tag', 'python'), compute) for _ in range(5)]
+        other = flights.run(('get_best_roadmap_by_tag', 'java'), compute)
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(burst())
+
+    assert len(calls) == 2
+    assert all(result == {'roadmap_id': 'rm00001'} for result in results)
+    assert flights.stats() == {'inflight': 0, 'executed': 2, 'coalesced': 4}
+
+
+def test_coalesced_requests_share_the_error():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError('Método no soportado: x')
+
+    async def burst():
+        return await asyncio.gather(*[flights.run('x', compute) for _ in range(3)], return_exceptions=True)
+
+    errors = asyncio.run(burst())
+
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flights.stats() == {'inflight': 0, 'executed': 1, 'coalesced': 2}
+
+
+def test_profiled_and_write_requests_are_not_coalesced():
+    service = RecommenderService(RecommenderRegistry(), workers=1)
+    try:
+        params = {'tag': 'python', 'exclude_roadmaps': ['rm00001']}
+        key = service.request_key('get_best_roadmap_by_tag', '/tmp/a.csv', params)
+        # El orden de las claves del JSON no cambia la clave
+        assert key == service.request_key('get_best_roadmap_by_tag', '/tmp/a.csv', dict(reversed(params.items())))
+        assert service.request_key('get_best_roadmap_by_tag', '/tmp/a.csv', {**params, 'profile': True}) is None
+        assert service.request_key('apply_delta', '/tmp/a.csv', {'delta_path': 'd.csv'}) is None
+    finally:
+        service.executor.shutdown()
+
+
+def test_registry_keys_datasets_by_content(tmp_path):
+    registry = RecommenderRegistry(max_datasets=2)
+    first, second = tmp_path / 'roadmaps_1.csv', tmp_path / 'roadmaps_2.csv'
+    synthetic_catalogue(n_rows=20).to_csv(first, index=False)
+    synthetic_catalogue(n_rows=20).to_csv(second, index=False)
+
+    # Dos exportaciones iguales comparten entrada, que carga desde la última
+    entry = registry.get(str(first))
+    assert registry.get(str(second)) is entry
+    assert entry.dataset_path == str(second)
+
+    # Regenerado en la misma ruta: dataset nuevo
+    synthetic_catalogue(n_rows=20, seed=1).to_csv(second, index=False)
+    changed = registry.get(str(second))
+    assert changed is not entry
+    assert registry.get(str(first)) is entry
+
+    registry.discard(str(second))
+    assert registry.get(str(second)) is not changed
+    assert registry.stats()['datasets_loaded'] == 2
+
+
+def test_registry_evicts_least_recently_used(tmp_path):
+    registry = RecommenderRegistry(max_datasets=2)
+    paths = []
+    for seed in range(3):
+        path = tmp_path / f'roadmaps_{seed}.csv'
+        synthetic_catalogue(n_rows=20, seed=seed).to_csv(path, index=False)
+        paths.append(str(path))
+
+    entries = [registry.get(path) for path in paths[:2]]
+    registry.get(paths[0])
+    registry.get(paths[2])
+
+    assert registry.get(paths[0]) is entries[0]
+    assert registry.get(paths[1]) is not entries[1]
+
+
+def test_dispatch_rejects_missing_dataset_and_unknown_method(tmp_path, catalogue_path):
+    registry = RecommenderRegistry()
+    with pytest.raises(FileNotFoundError):
+        registry.dispatch('get_best_roadmap_by_tag', str(tmp_path / 'missing.csv'), {'tag': 'python'})
+    with pytest.raises(ValueError):
+        registry.dispatch('train', catalogue_path, {})
@@ -0,0 +1,42 @@
+"""
+Pruebas del índice invertido de tags (tag_index.py)
+La similitud del índice debe ser la del cálculo original por roadmap (tags en
+común / tags del roadmap), salvo en los tags mal formados, donde fragmentos
+vacíos y NaN ya no cuentan como tags.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import synthetic_catalogue
+from tag_index import TagIndex, split_tags
+
+
+def _baseline_similarity(roadmap_tags, user_tags):
+    """Cálculo original (calculate_similarity) sobre el texto de los tags"""
+    roadmap_tag_set = {t.strip().lower() for t in str(roadmap_tags).split(',')}
+    return len(roadmap_tag_set & user_tags) / len(roadmap_tag_set)
+
+
+@pytest.mark.parametrize('user_tags', [set(), {'python'}, {'python', 'sql', 'ética'}, {'zzz'}])
+def test_similarity_matches_baseline_on_well_formed_tags(user_tags):
+    tags = synthetic_catalogue()['tags']
+    tag_index = TagIndex(tags)
+
+    expected = [_baseline_similarity(text, user_tags) if user_tags else 0.0 for text in tags]
+    np.testing.assert_allclose(tag_index.similarity(user_tags), expected, rtol=0, atol=1e-12)
+    rows = np.array([5, 0, 17])
+    np.testing.assert_allclose(tag_index.similarity_rows(rows, user_tags), np.take(expected, rows), rtol=0, atol=1e-12)
+
+
+def test_malformed_tags_ignore_empty_fragments_and_nan():
+    tags = pd.Series(['Python, sql,', 'python,,sql', np.nan, ',', ' python , PYTHON '])
+    tag_index = TagIndex(tags)
+
+    assert [split_tags(text) for text in tags] == [['python', 'sql'], ['python', 'sql'], [], [], ['python', 'python']]
+    assert [tag_index.row_tags([row]) for row in range(len(tags))] == [
+        {'python', 'sql'}, {'python', 'sql'}, set(), set(), {'python'}
+    ]
+    # El cálculo original daba 1/3 a las dos primeras ('' contaba como tag) y 0 a NaN ('nan')
+    np.testing.assert_allclose(tag_index.similarity({'python'}), [0.5, 0.5, 0.0, 0.0, 1.0])
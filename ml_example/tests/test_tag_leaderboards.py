@@ -0,0 +1,63 @@
+"""
+Pruebas de los leaderboards por tag (tag_leaderboards.py): las listas
+recortadas a K deben dar el mismo ranking que ordenar todos los candidatos, y
+cuando las exclusiones las agotan el recomendador debe calcularlo completo
+"""
+
+import numpy as np
+import pytest
+
+from conftest import synthetic_catalogue
+from roadmap_recommender import build_recommender
+from tag_index import TagIndex
+from tag_leaderboards import TagLeaderboards
+
+
+def _naive_top(tag_index, scores, tag, n, excluded=()):
+    """Ranking de referencia: todas las filas del tag, mayor score primero y empates por posición"""
+    rows = np.setdiff1d(tag_index.exact(tag), np.asarray(excluded, dtype=np.int64))
+    return rows[np.lexsort((rows, -scores[rows]))][:n]
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_top_rows_match_full_ranking_or_fall_back(seed):
+    rng = np.random.default_rng(seed)
+    tag_index = TagIndex(synthetic_catalogue(n_rows=120, seed=seed)['tags'])
+    # Scores redondeados: también hay empates
+    scores = np.round(rng.uniform(0, 1, tag_index.n_rows), 2)
+    leaderboards = TagLeaderboards.build(tag_index, scores, k=4)
+
+    fallbacks = 0
+    for tag_id, tag in enumerate(tag_index.vocabulary):
+        tag_rows = tag_index.exact(tag)
+        for n_excluded in (0, 2, 4, 6):
+            excluded = _naive_top(tag_index, scores, tag, n_excluded)
+            rows = leaderboards.top_rows(tag_id, 3, excluded)
+            if rows is None:
+                # Solo si la lista no alcanza y el tag tenía más de K roadmaps
+                assert len(tag_rows) > 4 and 4 - n_excluded < 3
+                fallbacks += 1
+            else:
+                assert rows.tolist() == _naive_top(tag_index, scores, tag, 3, excluded).tolist()
+    assert fallbacks > 0
+
+
+def test_recommender_falls_back_when_exclusions_exhaust_the_leaderboard(catalogue_path):
+    recommender = build_recommender(catalogue_path)
+    scores = recommender.df['final_score'].to_numpy(dtype=np.float64)
+    recommender._leaderboards = TagLeaderboards.build(recommender.tag_index, scores, k=3)
+
+    tag_id = recommender.tag_index.tag_id('python')
+    assert recommender.tag_index.exact('python').size > 3
+    ids = recommender.df['roadmap_id'].to_numpy()
+    excluded = ids[_naive_top(recommender.tag_index, scores, 'python', 2)].tolist()
+    # Quedan 1 de los 3 guardados: la lista no alcanza para un top 5
+    assert recommender.leaderboards().top_rows(tag_id, 5, recommender._roadmap_rows(excluded)) is None
+
+    expected_rows = _naive_top(recommender.tag_index, scores, 'python', 5, recommender._roadmap_rows(excluded))
+    top = recommender.get_top_roadmaps_by_tag('python', 5, excluded)
+    assert [item['roadmap_id'] for item in top] == ids[expected_rows].tolist()
+
+    best = recommender.get_best_roadmap_by_tag('python', excluded)
+    assert best['roadmap_id'] == ids[expected_rows[0]]
+    assert best['total_candidates'] == recommender.tag_index.exact('python').size - 2
@@ -0,0 +1,74 @@
+"""
+Pruebas de las consultas de varios tags (tag_query.py)
+Evaluar una consulta con los bitmaps del TagIndex debe dar las mismas filas que
+evaluarla fila por fila sobre los tags de cada roadmap.
+"""
+
+import numpy as np
+import pytest
+
+from conftest import synthetic_catalogue
+from tag_index import TagIndex, split_tags
+from tag_query import as_tag_query, format_tag_query, is_tag_query, parse_tag_query, query_rows
+
+
+@pytest.fixture(scope='module')
+def tag_catalogue():
+    df = synthetic_catalogue()
+    return TagIndex(df['tags']), [set(split_tags(tags)) for tags in df['tags']]
+
+
+def _matches(term, tags, vocabulary):
+    """Criterio de TagIndex.match: exacto si el tag existe, si no por prefijo"""
+    if term in vocabulary:
+        return term in tags
+    return any(tag.startswith(term) for tag in tags)
+
+
+def _naive_query(node, tags, vocabulary):
+    kind = node[0]
+    if kind == 'tag':
+        return _matches(node[1], tags, vocabulary)
+    if kind == 'not':
+        return not _naive_query(node[1], tags, vocabulary)
+    results = [_naive_query(child, tags, vocabulary) for child in node[1]]
+    return all(results) if kind == 'and' else any(results)
+
+
+@pytest.mark.parametrize('query', [
+    'python AND data',
+    'python, NOT sql',
+    '(sql OR data) AND NOT web',
+    '!python & !java',
+    'ja | prog',
+    'NOT (python OR sql OR data OR web)',
+    'python NOT sql',
+    'zzz OR ética',
+])
+def test_query_rows_match_row_by_row_evaluation(tag_catalogue, query):
+    tag_index, row_tags = tag_catalogue
+    vocabulary = set(tag_index.vocabulary)
+    node = parse_tag_query(query)
+
+    expected = [row for row, tags in enumerate(row_tags) if _naive_query(node, tags, vocabulary)]
+    assert query_rows(tag_index, node).tolist() == expected
+
+    exclude = np.arange(0, tag_index.n_rows, 3)
+    kept = [row for row in expected if row % 3 != 0]
+    assert query_rows(tag_index, node, exclude).tolist() == kept
+
+
+def test_query_prefix_is_explicit():
+    assert is_tag_query('q:python AND data')
+    assert is_tag_query(' Q:python')
+    assert not is_tag_query('python AND data')
+    assert not is_tag_query('c++ (avanzado)')
+    assert not is_tag_query('ci/cd, devops')
+    assert as_tag_query('python, sql') == 'q:python, sql'
+    assert format_tag_query(parse_tag_query('q:python, sql')) == format_tag_query(parse_tag_query('python, sql'))
+
+
+@pytest.mark.parametrize('query', ['', 'q:', 'a AND', '(a OR b', 'AND b', 'a )'])
+def test_invalid_queries_raise(query):
+    with pytest.raises(ValueError):
+        parse_tag_query(query)
@@ -0,0 +1,77 @@
+"""
+Pruebas de los perfiles de usuario en caché (user_profiles.py)
+Un perfil extendido con lo nuevo debe ser igual al reconstruido desde cero, y
+las recomendaciones con el perfil guardado iguales a las de una petición sin
+user_id.
+"""
+
+import numpy as np
+
+from conftest import synthetic_catalogue
+from user_profiles import UserProfileStore, normalize_nodes
+
+
+def _same_profile(profile, rebuilt):
+    return (
+        profile.roadmap_ids == rebuilt.roadmap_ids
+        and profile.node_tags == rebuilt.node_tags
+        and np.array_equal(profile.rows, rebuilt.rows)
+        and np.array_equal(profile.tag_ids, rebuilt.tag_ids)
+        and profile.extra_tags == rebuilt.extra_tags
+    )
+
+
+def test_incremental_profiles_match_full_rebuild(personalized):
+    ids = list(personalized.df['roadmap_id'])
+    version = personalized._profile_version()
+    build = personalized._build_profile
+    store = UserProfileStore()
+
+    def rebuilt(roadmap_ids, node_ids):
+        return build(version, frozenset(roadmap_ids), normalize_nodes(node_ids))
+
+    roadmaps, nodes = ids[:3] + ['desconocido'], ['React']
+    profile = store.resolve('u1', version, build, roadmaps, nodes)
+    assert _same_profile(profile, rebuilt(roadmaps, nodes))
+
+    profile = store.record_completion('u1', version, build, ids[10:14], ['Kotlin'])
+    roadmaps, nodes = roadmaps + ids[10:14], nodes + ['Kotlin']
+    assert _same_profile(profile, rebuilt(roadmaps, nodes))
+
+    roadmaps, nodes = roadmaps + ids[50:52], nodes + ['sql']
+    profile = store.resolve('u1', version, build, roadmaps, nodes)
+    assert _same_profile(profile, rebuilt(roadmaps, nodes))
+
+    assert store.stats()['incremental_updates'] == 2
+
+
+def test_recommendations_with_stored_profile_match_stateless(personalized):
+    ids = list(personalized.df['roadmap_id'])
+    completed, nodes = ids[:2], ['react']
+    personalized.for_user({'user_id': 'parity', 'completed_roadmaps': completed, 'completed_nodes': nodes}).user_profile()
+    personalized.record_completion('parity', ids[20:23], ['ética'])
+
+    stored = personalized.for_user({'user_id': 'parity'})
+    stateless = personalized.for_user({
+        'completed_roadmaps': completed + ids[20:23], 'completed_nodes': nodes + ['ética']
+    })
+    for tag in (None, 'data', 'q:python OR sql'):
+        assert stored.get_recommendations(tag) == stateless.get_recommendations(tag)
+
+
+def test_delta_changing_tag_vocabulary_rebuilds_profile(personalized):
+    catalogue = synthetic_catalogue()
+    recommender = personalized.copy_for_update()
+    recommender.profiles = UserProfileStore()
+    user = {'user_id': 'u1', 'completed_roadmaps': ['rm00001'], 'completed_nodes': []}
+    before = recommender.for_user(user).get_user_completed_nodes()
+
+    # 'aaa' queda primero en el vocabulario: cambian los ids de todos los tags
+    delta = catalogue.iloc[[2]].copy()
+    delta['tags'] = delta['tags'] + ',aaa'
+    recommender.apply_delta(delta)
+
+    stored = recommender.for_user({'user_id': 'u1'}).get_user_completed_nodes()
+    stateless = recommender.for_user({'completed_roadmaps': ['rm00001']}).get_user_completed_nodes()
+    assert stored == stateless == before
+    assert recommender.profiles.stats()['rebuilds'] == 1
@@ -2,36 +2,112 @@
 Script de ejemplo para entrenar un modelo de Machine Learning
 que clasifica y rankea roadmaps por eficiencia.
 
+El clasificador y el regresor se entrenan en paralelo (joblib) y se guardan con
+joblib en un directorio versionado por la huella del dataset
+(models/efficiency_v<versión>_<schema>_<contenido>/). RoadmapRecommender lo
+carga con recommender_common.load_training_run() para
+get_roadmap_efficiency (también en el servidor).
+
 Requisitos:
     pip install pandas scikit-learn numpy matplotlib seaborn
 
 Uso:
-    python train_roadmap_classifier.py
+    python train_roadmap_classifier.py [dataset] [--n-jobs N] [--backend loky|threading|multiprocessing]
+                                       [--plots] [--seed 42] [--output-dir models/]
+
+Los parámetros de los bosques salen de models/tuned_config.json si se ejecutó
+tune_models.py (--n-estimators / --max-depth los reemplazan).
 """
 
+import argparse
+import os
+import sys
+import time
+
 import pandas as pd
 import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import classification_report, mean_squared_error, r2_score
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+from dataset_store import iter_dataset_chunks, load_dataset
+from recommender_common import DatasetFingerprint, dataset_fingerprint, load_tuned_params, save_training_run
 
 # Configuración
 CSV_FILE = '../storage/app/roadmaps_ml_dataset.csv'  # Ajustar ruta según sea necesario
 
-def load_data():
-    """Cargar dataset desde CSV"""
+# Mismo directorio que usan los recomendadores (ml_example/models/)
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+CLASSIFIER_FEATURES = [
+    'completion_count', 'dropout_count', 'avg_hours_spent',
+    'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
+    'topic_encoded'
+]
+
+REGRESSOR_FEATURES = [
+    'completion_count', 'dropout_count', 'avg_hours_spent',
+    'avg_nodes_completed', 'bookmark_count', 'completion_rate',
+    'efficiency_rate', 'topic_encoded'
+]
+
+# Parámetros de los bosques si tune_models.py no escribió otros
+DEFAULT_FOREST_PARAMS = {'n_estimators': 100, 'max_depth': 10}
+
+def sample_dataset(path, max_rows, chunksize=100000, seed=42):
+    """
+    Muestra uniforme de `max_rows` filas leyendo el dataset por bloques
+
+    Los bosques no tienen partial_fit: con datasets más grandes que la memoria
+    se entrenan con una muestra. Cada fila recibe una clave aleatoria y se
+    conservan las `max_rows` claves menores, así que nunca hay más de
+    max_rows + chunksize filas en memoria.
+
+    Returns:
+        tuple: (muestra en el orden original, huella del dataset completo)
+    """
+    rng = np.random.default_rng(seed)
+    fingerprint = DatasetFingerprint()
+    sample, keys = None, None
+
+    for _, chunk in iter_dataset_chunks(path, chunksize):
+        fingerprint.update(chunk)
+        chunk_keys = rng.random(len(chunk))
+        sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+        keys = chunk_keys if keys is None else np.concatenate([keys, chunk_keys])
+
+        if len(sample) > max_rows:
+            keep = np.sort(np.argpartition(keys, max_rows)[:max_rows])
+            sample = sample.iloc[keep].reset_index(drop=True)
+            keys = keys[keep]
+
+    return sample, fingerprint.result()
+
+def load_data(path=CSV_FILE, max_rows=None, chunksize=100000, seed=42):
+    """
+    Cargar dataset (CSV, Parquet o directorio .npyds)
+
+    Con `max_rows` se lee por bloques y se conserva una muestra uniforme.
+
+    Returns:
+        tuple: (DataFrame, huella del dataset completo)
+    """
     print("📂 Cargando dataset...")
-    df = pd.read_csv(CSV_FILE)
-    print(f"✓ Dataset cargado: {len(df)} registros")
-    return df
+    if max_rows is None:
+        df = load_dataset(path)
+        fingerprint = dataset_fingerprint(df)
+        print(f"✓ Dataset cargado: {len(df)} registros")
+    else:
+        df, fingerprint = sample_dataset(path, max_rows, chunksize, seed)
+        print(f"✓ Dataset muestreado por bloques: {len(df)} registros")
+    return df, fingerprint
 
 def preprocess_data(df):
     """Preprocesar datos para ML"""
     print("\n🔧 Preprocesando datos...")
-    
+
     # Crear etiquetas de eficiencia (clasificación)
     # Basado en completion_rate y usefulness_score
     df['efficiency_label'] = pd.cut(
@@ -39,200 +115,374 @@ def preprocess_data(df):
         bins=[0, 1.5, 3.0, 5.0],
         labels=['Low', 'Medium', 'High']
     )
-    
+
     # Extraer tema principal de los tags
-    df['main_topic'] = df['tags'].str.split(',').str[0]
-    
+    df['main_topic'] = df['tags'].astype(str).str.split(',').str[0]
+
     # Codificar variables categóricas
     le_topic = LabelEncoder()
     df['topic_encoded'] = le_topic.fit_transform(df['main_topic'])
-    
+
     print(f"✓ Temas encontrados: {df['main_topic'].unique()}")
     print(f"✓ Distribución de eficiencia:")
     print(df['efficiency_label'].value_counts())
-    
+
     return df, le_topic
 
-def train_classifier(df):
-    """Entrenar clasificador de eficiencia"""
-    print("\n🤖 Entrenando clasificador de eficiencia...")
-    
-    # Features
-    features = [
-        'completion_count', 'dropout_count', 'avg_hours_spent',
-        'avg_nodes_completed', 'bookmark_count', 'usefulness_score',
-        'topic_encoded'
-    ]
-    
-    X = df[features]
+def split_jobs(n_jobs, n_tasks):
+    """
+    Repartir los núcleos entre tareas en paralelo y árboles de cada bosque
+
+    Returns:
+        tuple: (tareas simultáneas, n_jobs de cada RandomForest)
+    """
+    total = effective_n_jobs(n_jobs)
+    outer = max(1, min(n_tasks, total))
+    return outer, max(1, total // outer)
+
+def forest_params(name, **overrides):
+    """
+    Parámetros de un bosque ('classifier' o 'regressor')
+
+    Por defecto, los ganadores de tune_models.py; encima, las opciones del CLI
+    que no sean None.
+    """
+    params = {**DEFAULT_FOREST_PARAMS, **load_tuned_params(name)}
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    return params
+
+def train_classifier(df, params=None, seed=42, n_jobs=1):
+    """
+    Entrenar clasificador de eficiencia
+
+    No imprime nada (puede correr en otro proceso): devuelve el modelo, el
+    scaler y las métricas para que main() las muestre.
+    """
+    X = df[CLASSIFIER_FEATURES]
     y = df['efficiency_label']
-    
+
     # Eliminar filas con NaN
     mask = ~y.isna()
     X = X[mask]
     y = y[mask]
-    
+
     # Split
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+        X, y, test_size=0.2, random_state=seed, stratify=y
     )
-    
+
     # Escalar features
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
-    
-    # Entrenar modelo
-    clf = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
+
+    # Entrenar modelo (random_state fijo: mismo bosque con cualquier n_jobs)
+    start = time.perf_counter()
+    clf = RandomForestClassifier(
+        random_state=seed, n_jobs=n_jobs, **(params or forest_params('classifier'))
+    )
     clf.fit(X_train_scaled, y_train)
-    
+    fit_seconds = time.perf_counter() - start
+
     # Evaluar
     y_pred = clf.predict(X_test_scaled)
-    
-    print("\n📊 Resultados del Clasificador:")
-    print(classification_report(y_test, y_pred))
-    
+
     # Feature importance
     feature_importance = pd.DataFrame({
-        'feature': features,
+        'feature': CLASSIFIER_FEATURES,
         'importance': clf.feature_importances_
     }).sort_values('importance', ascending=False)
-    
-    print("\n🎯 Importancia de Features:")
-    print(feature_importance)
-    
-    return clf, scaler, feature_importance
-
-def train_regressor(df):
-    """Entrenar regresor para predecir usefulness_score"""
-    print("\n🤖 Entrenando regresor de utilidad...")
-    
-    # Features
-    features = [
-        'completion_count', 'dropout_count', 'avg_hours_spent',
-        'avg_nodes_completed', 'bookmark_count', 'completion_rate',
-        'efficiency_rate', 'topic_encoded'
-    ]
-    
-    X = df[features]
+
+    return {
+        'model': clf,
+        'scaler': scaler,
+        'report': classification_report(y_test, y_pred),
+        'metrics': classification_report(y_test, y_pred, output_dict=True),
+        'feature_importance': feature_importance,
+        'fit_seconds': fit_seconds
+    }
+
+def train_regressor(df, params=None, seed=42, n_jobs=1):
+    """Entrenar regresor para predecir usefulness_score (sin imprimir, ver train_classifier)"""
+    X = df[REGRESSOR_FEATURES]
     y = df['usefulness_score']
-    
+
     # Split
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+        X, y, test_size=0.2, random_state=seed
     )
-    
+
     # Escalar
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
-    
+
     # Entrenar
-    reg = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
+    start = time.perf_counter()
+    reg = RandomForestRegressor(
+        random_state=seed, n_jobs=n_jobs, **(params or forest_params('regressor'))
+    )
     reg.fit(X_train_scaled, y_train)
-    
+    fit_seconds = time.perf_counter() - start
+
     # Evaluar
     y_pred = reg.predict(X_test_scaled)
     mse = mean_squared_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    
+
+    return {
+        'model': reg,
+        'scaler': scaler,
+        'metrics': {'mse': mse, 'r2': r2_score(y_test, y_pred), 'rmse': float(np.sqrt(mse))},
+        'fit_seconds': fit_seconds
+    }
+
+def print_classifier_results(result):
+    """Mostrar métricas e importancia de features del clasificador"""
+    print(f"\n🤖 Clasificador de eficiencia entrenado en {result['fit_seconds']:.2f}s")
+    print("\n📊 Resultados del Clasificador:")
+    print(result['report'])
+
+    print("\n🎯 Importancia de Features:")
+    print(result['feature_importance'])
+
+def print_regressor_results(result):
+    """Mostrar métricas del regresor"""
+    metrics = result['metrics']
+    print(f"\n🤖 Regresor de utilidad entrenado en {result['fit_seconds']:.2f}s")
     print(f"\n📊 Resultados del Regresor:")
-    print(f"  MSE: {mse:.4f}")
-    print(f"  R²: {r2:.4f}")
-    print(f"  RMSE: {np.sqrt(mse):.4f}")
-    
-    return reg, scaler
+    print(f"  MSE: {metrics['mse']:.4f}")
+    print(f"  R²: {metrics['r2']:.4f}")
+    print(f"  RMSE: {metrics['rmse']:.4f}")
 
-def visualize_data(df):
+def visualize_data(df, output_path='roadmap_analysis.png', dpi=300):
     """Crear visualizaciones del dataset"""
-    print("\n📈 Generando visualizaciones...")
-    
+    # matplotlib/seaborn solo se importan si se generan gráficos; Agg porque
+    # puede correr en un worker sin pantalla
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-    
+
     # 1. Distribución de completion rate por tema
     df_plot = df.groupby('main_topic')['completion_rate'].mean().sort_values(ascending=False)
     df_plot.plot(kind='bar', ax=axes[0, 0], color='skyblue')
     axes[0, 0].set_title('Completion Rate Promedio por Tema')
     axes[0, 0].set_ylabel('Completion Rate')
     axes[0, 0].tick_params(axis='x', rotation=45)
-    
+
     # 2. Relación entre horas y nodos completados
-    axes[0, 1].scatter(df['avg_hours_spent'], df['avg_nodes_completed'], 
+    axes[0, 1].scatter(df['avg_hours_spent'], df['avg_nodes_completed'],
                        c=df['usefulness_score'], cmap='viridis', alpha=0.6)
     axes[0, 1].set_xlabel('Avg Hours Spent')
     axes[0, 1].set_ylabel('Avg Nodes Completed')
     axes[0, 1].set_title('Eficiencia: Horas vs Nodos Completados')
     plt.colorbar(axes[0, 1].collections[0], ax=axes[0, 1], label='Usefulness Score')
-    
+
     # 3. Distribución de usefulness score
     df['usefulness_score'].hist(bins=20, ax=axes[1, 0], color='coral', edgecolor='black')
     axes[1, 0].set_title('Distribución de Usefulness Score')
     axes[1, 0].set_xlabel('Usefulness Score')
     axes[1, 0].set_ylabel('Frecuencia')
-    
+
     # 4. Heatmap de correlaciones
     corr_features = ['completion_count', 'dropout_count', 'avg_hours_spent',
                      'avg_nodes_completed', 'bookmark_count', 'usefulness_score']
     corr = df[corr_features].corr()
     sns.heatmap(corr, annot=True, fmt='.2f', cmap='coolwarm', ax=axes[1, 1])
     axes[1, 1].set_title('Matriz de Correlación')
-    
+
     plt.tight_layout()
-    plt.savefig('roadmap_analysis.png', dpi=300, bbox_inches='tight')
-    print("✓ Visualizaciones guardadas en: roadmap_analysis.png")
-
-def rank_roadmaps_by_topic(df, topic='javascript'):
-    """Rankear roadmaps de un tema específico"""
-    print(f"\n🏆 Top 10 Roadmaps de {topic.upper()}:")
-    
-    topic_df = df[df['main_topic'] == topic].copy()
-    
+    plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return output_path
+
+def rank_roadmaps_by_topic(df, topics=None, top_n=10):
+    """
+    Rankear los roadmaps de cada tema en una sola pasada
+
+    En lugar de filtrar el DataFrame una vez por tema, el score compuesto se
+    normaliza con el máximo de cada tema (groupby + transform) y se toman los
+    top_n de todos los temas con un único orden + groupby.head.
+
+    Returns:
+        dict: tema -> DataFrame con sus top_n roadmaps
+    """
+    topics = list(df['main_topic'].unique() if topics is None else topics)
+    topic_df = df[df['main_topic'].isin(topics)]
+    topic_max = topic_df.groupby('main_topic')[['efficiency_rate', 'bookmark_count']].transform('max')
+
     # Calcular score compuesto
-    topic_df['composite_score'] = (
+    composite_score = (
         topic_df['completion_rate'] * 0.4 +
         topic_df['usefulness_score'] / 5 * 0.3 +
-        topic_df['efficiency_rate'] / topic_df['efficiency_rate'].max() * 0.2 +
-        topic_df['bookmark_count'] / topic_df['bookmark_count'].max() * 0.1
+        topic_df['efficiency_rate'] / topic_max['efficiency_rate'] * 0.2 +
+        topic_df['bookmark_count'] / topic_max['bookmark_count'] * 0.1
+    )
+
+    # Orden estable: los empates quedan en el orden del dataset (como nlargest)
+    ranked = (
+        topic_df.assign(composite_score=composite_score)
+        .dropna(subset=['composite_score'])
+        .sort_values('composite_score', ascending=False, kind='stable')
+        .groupby('main_topic', sort=False)
+        .head(top_n)
     )
-    
-    top_roadmaps = topic_df.nlargest(10, 'composite_score')[
-        ['name', 'completion_rate', 'usefulness_score', 'composite_score']
+    columns = ['name', 'completion_rate', 'usefulness_score', 'composite_score']
+    groups = {topic: group[columns] for topic, group in ranked.groupby('main_topic', sort=False)}
+
+    rankings = {}
+    for topic in topics:
+        rankings[topic] = groups.get(topic, ranked[columns].iloc[:0])
+        print(f"\n🏆 Top {top_n} Roadmaps de {str(topic).upper()}:")
+        print(rankings[topic].to_string(index=False))
+
+    return rankings
+
+def train_models(df, n_jobs=-1, backend='loky', seed=42, classifier_params=None, regressor_params=None,
+                 plots=False, plot_path='roadmap_analysis.png', dpi=300):
+    """
+    Entrenar clasificador y regresor (y generar los gráficos) en paralelo
+
+    Cada tarea corre en un worker del backend de joblib; los núcleos se
+    reparten entre las tareas y los árboles de cada bosque.
+
+    Returns:
+        tuple: (resultado del clasificador, resultado del regresor, ruta del gráfico o None)
+    """
+    n_tasks = 3 if plots else 2
+    outer_jobs, forest_jobs = split_jobs(n_jobs, n_tasks)
+    tasks = [
+        delayed(train_classifier)(df, classifier_params, seed, forest_jobs),
+        delayed(train_regressor)(df, regressor_params, seed, forest_jobs)
     ]
-    
-    print(top_roadmaps.to_string(index=False))
-    
-    return top_roadmaps
+    if plots:
+        tasks.append(delayed(visualize_data)(df, plot_path, dpi))
+
+    print(f"\n🤖 Entrenando modelos ({outer_jobs} tareas x {forest_jobs} núcleos, backend {backend})...")
+    results = Parallel(n_jobs=outer_jobs, backend=backend)(tasks)
+
+    return results[0], results[1], results[2] if plots else None
+
+def save_models(output_dir, fingerprint, le_topic, clf_result, reg_result, manifest):
+    """Guardar modelos, scalers y codificador de temas en el directorio versionado"""
+    artifacts = {
+        'classifier': {
+            'model': clf_result['model'],
+            'scaler': clf_result['scaler'],
+            'features': CLASSIFIER_FEATURES
+        },
+        'regressor': {
+            'model': reg_result['model'],
+            'scaler': reg_result['scaler'],
+            'features': REGRESSOR_FEATURES
+        },
+        'topic_encoder': le_topic
+    }
+    manifest = {
+        **manifest,
+        'metrics': {
+            'classifier': clf_result['metrics'],
+            'regressor': reg_result['metrics']
+        },
+        'topics': [str(topic) for topic in le_topic.classes_]
+    }
+    return save_training_run(output_dir, fingerprint, artifacts, manifest)
+
+def parse_args(argv=None):
+    """Opciones del pipeline de entrenamiento"""
+    parser = argparse.ArgumentParser(description='Entrenar los modelos de eficiencia de roadmaps')
+    parser.add_argument('dataset_path', nargs='?', default=CSV_FILE,
+                        help='Dataset (CSV, Parquet o directorio .npyds)')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Núcleos para entrenar (-1 = todos)')
+    parser.add_argument('--backend', choices=['loky', 'threading', 'multiprocessing'], default='loky',
+                        help='Backend de joblib para las tareas en paralelo')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla del split y de los bosques')
+    parser.add_argument('--max-rows', type=int,
+                        help='Leer por bloques y entrenar con una muestra de este tamaño (datasets sin cabida en memoria)')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Filas por bloque con --max-rows')
+    parser.add_argument('--n-estimators', type=int, help='Árboles por bosque (por defecto: tune_models.py o 100)')
+    parser.add_argument('--max-depth', type=int, help='Profundidad máxima (por defecto: tune_models.py o 10)')
+    parser.add_argument('--plots', action='store_true', help='Generar roadmap_analysis.png')
+    parser.add_argument('--plot-path', default='roadmap_analysis.png')
+    parser.add_argument('--dpi', type=int, default=300, help='Resolución de los gráficos')
+    parser.add_argument('--output-dir', default=MODELS_DIR, help='Directorio de modelos de los recomendadores')
+    parser.add_argument('--no-save', action='store_true', help='No guardar los modelos')
+    parser.add_argument('--no-rankings', action='store_true', help='No mostrar el top 10 por tema')
+    return parser.parse_args(argv)
 
-def main():
+def main(argv=None):
     """Función principal"""
+    args = parse_args(argv)
+
     print("=" * 60)
     print("🚀 ROADMAP EFFICIENCY ML CLASSIFIER")
     print("=" * 60)
-    
-    # Cargar y preprocesar
-    df = load_data()
+
+    start = time.perf_counter()
+
+    # Cargar y preprocesar (la huella se calcula sobre el dataset tal como lo
+    # cargan los recomendadores)
+    df, fingerprint = load_data(args.dataset_path, args.max_rows, args.chunksize, args.seed)
     df, le_topic = preprocess_data(df)
-    
-    # Entrenar modelos
-    clf, clf_scaler, feature_importance = train_classifier(df)
-    reg, reg_scaler = train_regressor(df)
-    
-    # Visualizar
-    visualize_data(df)
-    
+
+    overrides = {'n_estimators': args.n_estimators, 'max_depth': args.max_depth}
+    classifier_params = forest_params('classifier', **overrides)
+    regressor_params = forest_params('regressor', **overrides)
+
+    # Entrenar modelos (y visualizar) en paralelo
+    clf_result, reg_result, plot_path = train_models(
+        df,
+        n_jobs=args.n_jobs,
+        backend=args.backend,
+        seed=args.seed,
+        classifier_params=classifier_params,
+        regressor_params=regressor_params,
+        plots=args.plots,
+        plot_path=args.plot_path,
+        dpi=args.dpi
+    )
+    print_classifier_results(clf_result)
+    print_regressor_results(reg_result)
+    if plot_path:
+        print(f"\n📈 Visualizaciones guardadas en: {plot_path}")
+
     # Rankear por tema
-    for topic in df['main_topic'].unique()[:3]:
-        rank_roadmaps_by_topic(df, topic)
-    
+    if not args.no_rankings:
+        rank_roadmaps_by_topic(df, df['main_topic'].unique()[:3])
+
+    # Guardar modelos
+    if not args.no_save:
+        import sklearn
+
+        run_path = save_models(args.output_dir, fingerprint, le_topic, clf_result, reg_result, {
+            'dataset_path': args.dataset_path,
+            'rows': len(df),
+            'sampled': args.max_rows is not None,
+            'params': {
+                'seed': args.seed,
+                'classifier': classifier_params,
+                'regressor': regressor_params,
+                'n_jobs': args.n_jobs,
+                'backend': args.backend
+            },
+            'library_versions': {
+                'python': sys.version.split()[0],
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'scikit-learn': sklearn.__version__
+            },
+            'fit_seconds': {
+                'classifier': clf_result['fit_seconds'],
+                'regressor': reg_result['fit_seconds']
+            }
+        })
+        print(f"\n💾 Modelos guardados en: {run_path}")
+
     print("\n" + "=" * 60)
-    print("✅ Entrenamiento completado exitosamente!")
+    print(f"✅ Entrenamiento completado exitosamente en {time.perf_counter() - start:.2f}s!")
     print("=" * 60)
-    
-    # Guardar modelos (opcional)
-    # import joblib
-    # joblib.dump(clf, 'roadmap_classifier.pkl')
-    # joblib.dump(reg, 'roadmap_regressor.pkl')
-    # print("\n💾 Modelos guardados")
 
 if __name__ == "__main__":
     main()
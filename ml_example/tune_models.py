@@ -0,0 +1,336 @@
+"""
+Búsqueda de hiperparámetros con successive halving
+Ajusta la red neuronal de los recomendadores (create_quality_model, la que
+entrena RoadmapRecommender.train_model) y el clasificador/regresor de
+train_roadmap_classifier.py.
+
+- Se muestrean `--candidates` configuraciones del espacio de búsqueda y se
+  evalúan con validación cruzada usando pocas filas de entrenamiento; en cada
+  ronda sobrevive 1/eta de los candidatos y las filas se multiplican por eta,
+  hasta que queda uno o se usan todas las filas.
+- Las matrices escaladas de cada fold se calculan una sola vez y se guardan en
+  .npy (models/tuning_cache/); los workers las abren con memory-map, así que
+  ningún candidato repite el escalado ni copia los datos.
+- Las evaluaciones (candidato x fold) corren en paralelo con joblib.
+
+La configuración ganadora se escribe en models/tuned_config.json, que leen
+create_quality_model() y train_roadmap_classifier.py.
+
+Uso:
+    python ml_example/tune_models.py <dataset> [--targets quality_model,classifier,regressor]
+                                     [--candidates 27] [--eta 3] [--folds 3] [--n-jobs -1] [--retrain]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+from joblib import Parallel, delayed
+
+from dataset_store import load_dataset
+from recommender_common import (
+    FEATURES, MODEL_VERSION, TUNED_CONFIG_PATH, compute_quality_score,
+    create_quality_model, dataset_fingerprint, load_tuned_config, remove_old_artifacts,
+    save_directory
+)
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+CACHE_DIR = os.path.join(MODELS_DIR, 'tuning_cache')
+
+TARGETS = ['quality_model', 'classifier', 'regressor']
+
+# Espacios de búsqueda (se muestrean combinaciones sin repetir)
+SEARCH_SPACES = {
+    'quality_model': {
+        'hidden_layer_sizes': [(64, 32, 16), (128, 64, 32), (64, 32), (32, 16), (128, 64)],
+        'alpha': [1e-4, 1e-3, 1e-2],
+        'batch_size': [32, 64, 128, 256],
+        'learning_rate_init': [1e-3, 3e-3]
+    },
+    'classifier': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [5, 10, 15, 20, None],
+        'min_samples_leaf': [1, 2, 5],
+        'max_features': ['sqrt', 0.5, 1.0]
+    },
+    'regressor': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [5, 10, 15, 20, None],
+        'min_samples_leaf': [1, 2, 5],
+        'max_features': ['sqrt', 0.5, 1.0]
+    }
+}
+
+# Métrica de validación (mayor es mejor)
+METRICS = {'quality_model': 'r2', 'classifier': 'f1_macro', 'regressor': 'r2'}
+
+
+def target_data(df, target):
+    """
+    Matriz de features y target de cada modelo
+
+    Returns:
+        tuple: (X float64, y)
+    """
+    if target == 'quality_model':
+        return df[FEATURES].to_numpy(dtype=np.float64), compute_quality_score(df).to_numpy(dtype=np.float64)
+
+    from train_roadmap_classifier import CLASSIFIER_FEATURES, REGRESSOR_FEATURES, preprocess_data
+
+    if 'efficiency_label' not in df.columns:
+        df, _ = preprocess_data(df)
+
+    if target == 'classifier':
+        mask = df['efficiency_label'].notna().to_numpy()
+        X = df.loc[mask, CLASSIFIER_FEATURES].to_numpy(dtype=np.float64)
+        # dtype <U (no object) para poder abrirlo con memory-map
+        return X, df.loc[mask, 'efficiency_label'].astype(str).to_numpy(dtype=str)
+
+    return df[REGRESSOR_FEATURES].to_numpy(dtype=np.float64), df['usefulness_score'].to_numpy(dtype=np.float64)
+
+
+def build_fold_cache(X, y, target, n_folds=3, seed=42, cache_dir=CACHE_DIR, keep_last=6):
+    """
+    Escalar cada fold una sola vez y guardarlo en .npy
+
+    El directorio se identifica por el hash de los datos, el modelo, el número
+    de folds y la semilla: otra búsqueda sobre el mismo dataset lo reutiliza.
+    Las filas de entrenamiento de cada fold quedan barajadas, así que sus
+    primeras n filas son una muestra aleatoria (lo que usan las primeras rondas).
+
+    Returns:
+        list: Directorios de los folds
+    """
+    from sklearn.model_selection import KFold, StratifiedKFold
+    from sklearn.preprocessing import StandardScaler
+
+    digest = hashlib.sha1()
+    digest.update(f'{target}:{n_folds}:{seed}:{X.shape}'.encode('utf-8'))
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.asarray(y).astype(str).tobytes())
+    cache_path = os.path.join(cache_dir, f'{target}_{digest.hexdigest()[:16]}')
+    fold_paths = [os.path.join(cache_path, f'fold{i}') for i in range(n_folds)]
+
+    if os.path.isdir(cache_path):
+        os.utime(cache_path)
+        return fold_paths
+
+    splitter = (StratifiedKFold if target == 'classifier' else KFold)(n_splits=n_folds, shuffle=True, random_state=seed)
+    rng = np.random.default_rng(seed)
+
+    def write(tmp_path):
+        for i, (train_rows, val_rows) in enumerate(splitter.split(X, y)):
+            train_rows = rng.permutation(train_rows)
+            scaler = StandardScaler()
+            fold_path = os.path.join(tmp_path, f'fold{i}')
+            os.makedirs(fold_path)
+            np.save(os.path.join(fold_path, 'X_train.npy'), scaler.fit_transform(X[train_rows]))
+            np.save(os.path.join(fold_path, 'y_train.npy'), y[train_rows])
+            np.save(os.path.join(fold_path, 'X_val.npy'), scaler.transform(X[val_rows]))
+            np.save(os.path.join(fold_path, 'y_val.npy'), y[val_rows])
+
+    save_directory(cache_path, write)
+    remove_old_artifacts(cache_dir, '*', keep_last)
+
+    return fold_paths
+
+
+def build_model(target, params, seed=42):
+    """Modelo sin entrenar de un candidato"""
+    if target == 'quality_model':
+        return create_quality_model(params)
+
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    forest = RandomForestClassifier if target == 'classifier' else RandomForestRegressor
+    return forest(random_state=seed, n_jobs=1, **params)
+
+
+def evaluate_fold(target, params, fold_path, n_rows, seed=42):
+    """Entrenar un candidato con las primeras n_rows del fold y puntuarlo en validación"""
+    X_train = np.load(os.path.join(fold_path, 'X_train.npy'), mmap_mode='r')[:n_rows]
+    y_train = np.load(os.path.join(fold_path, 'y_train.npy'), mmap_mode='r')[:n_rows]
+    X_val = np.load(os.path.join(fold_path, 'X_val.npy'), mmap_mode='r')
+    y_val = np.load(os.path.join(fold_path, 'y_val.npy'), mmap_mode='r')
+
+    model = build_model(target, params, seed)
+    with warnings.catch_warnings():
+        # Las rondas cortas no llegan a converger: es esperado
+        warnings.simplefilter('ignore')
+        model.fit(X_train, y_train)
+
+    if METRICS[target] == 'f1_macro':
+        from sklearn.metrics import f1_score
+        return float(f1_score(y_val, model.predict(X_val), average='macro'))
+
+    return float(model.score(X_val, y_val))
+
+
+def sample_candidates(space, n_candidates, seed=42):
+    """Combinaciones distintas del espacio de búsqueda (todas si hay menos)"""
+    names = sorted(space)
+    sizes = [len(space[name]) for name in names]
+    total = math.prod(sizes)
+
+    rng = np.random.default_rng(seed)
+    flat = rng.choice(total, size=min(n_candidates, total), replace=False)
+
+    candidates = []
+    for index in flat:
+        params = {}
+        for name, size in zip(names, sizes):
+            index, choice = divmod(int(index), size)
+            params[name] = space[name][choice]
+        candidates.append(params)
+    return candidates
+
+
+def successive_halving(target, candidates, fold_paths, max_rows, min_rows=100, eta=3,
+                       n_jobs=-1, backend='loky', seed=42):
+    """
+    Successive halving sobre las filas de entrenamiento
+
+    Returns:
+        dict: {'params', 'score', 'rounds': [{'rows', 'candidates', 'best_score'}]}
+    """
+    n_rounds = int(math.log(len(candidates), eta)) + 1 if len(candidates) > 1 else 1
+    rows = max(min(min_rows, max_rows), max_rows // eta ** (n_rounds - 1))
+    rounds = []
+
+    with Parallel(n_jobs=n_jobs, backend=backend) as parallel:
+        while True:
+            fold_scores = parallel(
+                delayed(evaluate_fold)(target, params, fold_path, rows, seed)
+                for params in candidates
+                for fold_path in fold_paths
+            )
+            scores = np.asarray(fold_scores).reshape(len(candidates), len(fold_paths)).mean(axis=1)
+            order = np.argsort(-scores, kind='stable')
+            rounds.append({'rows': rows, 'candidates': len(candidates), 'best_score': float(scores[order[0]])})
+            print(f"  {target}: {len(candidates)} candidatos con {rows} filas -> mejor {scores[order[0]]:.4f}")
+
+            if len(candidates) == 1 or rows >= max_rows:
+                break
+
+            # Sobrevive 1/eta de los candidatos, con eta veces más filas
+            candidates = [candidates[i] for i in order[:max(1, len(candidates) // eta)]]
+            rows = min(max_rows, rows * eta)
+
+    return {'params': candidates[order[0]], 'score': float(scores[order[0]]), 'rounds': rounds}
+
+
+def tune_target(df, target, n_candidates=27, eta=3, n_folds=3, min_rows=100, n_jobs=-1,
+                backend='loky', seed=42, cache_dir=CACHE_DIR):
+    """Buscar los mejores hiperparámetros de un modelo"""
+    X, y = target_data(df, target)
+    fold_paths = build_fold_cache(X, y, target, n_folds, seed, cache_dir)
+    max_rows = min(len(np.load(os.path.join(fold_path, 'y_train.npy'), mmap_mode='r')) for fold_path in fold_paths)
+
+    candidates = sample_candidates(SEARCH_SPACES[target], n_candidates, seed)
+    result = successive_halving(target, candidates, fold_paths, max_rows, min_rows, eta, n_jobs, backend, seed)
+    return {**result, 'metric': METRICS[target], 'n_candidates': len(candidates), 'folds': n_folds}
+
+
+def write_tuned_config(results, fingerprint, path=TUNED_CONFIG_PATH):
+    """
+    Guardar los ganadores en tuned_config.json (atómico)
+
+    Se conservan los modelos que no se ajustaron en esta búsqueda.
+    """
+    config = load_tuned_config(path)
+    tuned_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    for target, result in results.items():
+        config[target] = {**result, 'fingerprint': fingerprint, 'tuned_at': tuned_at}
+    config['version'] = MODEL_VERSION
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def retrain_recommenders(dataset_path):
+    """Re-entrenar y guardar la red de ambos recomendadores con la configuración ganadora"""
+    from personalized_recommender import PersonalizedRecommender
+    from roadmap_recommender import RoadmapRecommender
+
+    roadmap = RoadmapRecommender(dataset_path)
+    roadmap.train_model()
+    roadmap.save_model()
+
+    personalized = PersonalizedRecommender(dataset_path, {})
+    personalized.train_model()
+    personalized.save_model()
+
+
+def parse_targets(value):
+    """'quality_model,classifier' -> lista validada"""
+    targets = [target.strip() for target in value.split(',') if target.strip()]
+    unknown = sorted(set(targets) - set(TARGETS))
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Modelos desconocidos: {', '.join(unknown)}")
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Búsqueda de hiperparámetros con successive halving')
+    parser.add_argument('dataset_path', help='Dataset (CSV, Parquet o directorio .npyds)')
+    parser.add_argument('--targets', type=parse_targets, default=TARGETS,
+                        help='Modelos a ajustar (coma): quality_model, classifier, regressor')
+    parser.add_argument('--candidates', type=int, default=27, help='Configuraciones de la primera ronda')
+    parser.add_argument('--eta', type=int, default=3, help='Factor de descarte entre rondas')
+    parser.add_argument('--folds', type=int, default=3, help='Folds de validación cruzada')
+    parser.add_argument('--min-rows', type=int, default=100, help='Filas de entrenamiento de la primera ronda')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Procesos (-1 = todos los núcleos)')
+    parser.add_argument('--backend', choices=['loky', 'multiprocessing', 'threading'], default='loky')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Directorio de los folds escalados')
+    parser.add_argument('--output', default=TUNED_CONFIG_PATH, help='Archivo de configuración ganadora')
+    parser.add_argument('--retrain', action='store_true',
+                        help='Re-entrenar la red de los recomendadores con la configuración ganadora')
+    args = parser.parse_args()
+
+    if args.eta < 2:
+        parser.error('--eta debe ser al menos 2')
+
+    df = load_dataset(args.dataset_path)
+    fingerprint = dataset_fingerprint(df)
+    results = {}
+
+    for target in args.targets:
+        start = time.perf_counter()
+        print(f"🔎 Ajustando {target}...")
+        results[target] = tune_target(
+            df.copy(), target,
+            n_candidates=args.candidates,
+            eta=args.eta,
+            n_folds=args.folds,
+            min_rows=args.min_rows,
+            n_jobs=args.n_jobs,
+            backend=args.backend,
+            seed=args.seed,
+            cache_dir=args.cache_dir
+        )
+        results[target]['search_seconds'] = round(time.perf_counter() - start, 3)
+        print(f"✓ {target}: {results[target]['params']} ({results[target]['metric']} {results[target]['score']:.4f})")
+
+    path = write_tuned_config(results, fingerprint, args.output)
+    print(f"💾 Configuración guardada en: {path}")
+
+    if args.retrain:
+        if args.output != TUNED_CONFIG_PATH:
+            print("⚠️  --retrain usa la configuración de models/tuned_config.json")
+        retrain_recommenders(args.dataset_path)
+        print("✓ Modelos de los recomendadores re-entrenados")
+
+
+if __name__ == '__main__':
+    main()
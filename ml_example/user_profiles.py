@@ -0,0 +1,226 @@
+"""
+Perfiles de usuario en caché (tags y roadmaps completados)
+Sin esto, cada petición personalizada reconstruye el perfil del usuario: busca
+las filas de sus roadmaps completados, junta sus tags desde el índice y les
+suma los nodos completados. Con un `user_id` en user_data, el servidor guarda
+el perfil ya construido y una petición repetida lo reutiliza tal cual.
+
+Cada perfil guarda:
+- Los ids de roadmaps completados y los nodos completados (normalizados), que
+  permiten reconstruirlo si cambia el catálogo
+- Las filas de esos roadmaps y los ids de sus tags en el vocabulario del
+  TagIndex, como arrays int32 ordenados (más los nodos que no son tags del
+  catálogo, que igual cuentan en user_tags_count)
+
+Al completar un roadmap o un nodo (record_completion, o una petición cuyas
+listas solo agregan elementos) se procesan únicamente los nuevos. Si la
+petición quita elementos, o el catálogo cambió (otra huella), el perfil se
+reconstruye. Los perfiles menos usados se expulsan al superar
+ROADMAP_PROFILE_CACHE_MB.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Memoria máxima de los perfiles por recomendador (0 desactiva el almacén)
+PROFILE_CACHE_BYTES = int(float(os.environ.get('ROADMAP_PROFILE_CACHE_MB', 64)) * 1024 * 1024)
+
+
+def _compact_ids(values):
+    """Array ordenado y sin repetir, en int32 si alcanza"""
+    values = np.unique(np.asarray(values, dtype=np.int64))
+    if len(values) == 0 or values[-1] <= np.iinfo(np.int32).max:
+        return values.astype(np.int32)
+    return values
+
+
+def normalize_nodes(node_ids):
+    """Nodos completados como tags (mismo criterio que get_user_completed_nodes)"""
+    return frozenset(str(node_id).lower() for node_id in node_ids)
+
+
+class UserProfile:
+    """Perfil de un usuario para una versión del catálogo (no se modifica)"""
+
+    __slots__ = ('version', 'roadmap_ids', 'node_tags', 'rows', 'tag_ids', 'extra_tags', 'nbytes')
+
+    def __init__(self, version, roadmap_ids, node_tags, rows, tag_ids, extra_tags):
+        self.version = version
+        self.roadmap_ids = roadmap_ids
+        self.node_tags = node_tags
+        self.rows = rows
+        self.tag_ids = tag_ids
+        self.extra_tags = extra_tags
+        self.nbytes = (
+            rows.nbytes + tag_ids.nbytes
+            + sum(sys.getsizeof(value) for value in (roadmap_ids, node_tags, extra_tags))
+            + sum(sys.getsizeof(value) for value in roadmap_ids)
+            + sum(sys.getsizeof(value) for value in node_tags)
+        )
+
+    def tags(self, tag_index):
+        """Conjunto de tags del usuario (el de get_user_completed_nodes)"""
+        vocabulary = tag_index.vocabulary
+        return {vocabulary[tag_id] for tag_id in self.tag_ids} | set(self.extra_tags)
+
+
+def build_profile(tag_index, roadmap_rows, version, roadmap_ids, node_tags, base=None):
+    """
+    Construir un perfil, o extender `base` con lo que le falte
+
+    Args:
+        tag_index: TagIndex del catálogo
+        roadmap_rows: Función ids de roadmap -> posiciones de fila
+        version: Versión del catálogo (ver PersonalizedRecommender._profile_version)
+        roadmap_ids: Todos los roadmaps completados (frozenset)
+        node_tags: Todos los nodos completados, normalizados (frozenset)
+        base: Perfil de la misma versión cuyos roadmaps y nodos están incluidos
+            en los nuevos; solo se procesa la diferencia
+    """
+    if base is None:
+        new_ids, new_nodes = roadmap_ids, node_tags
+        rows, tag_ids, extra_tags = [], [], frozenset()
+    else:
+        new_ids, new_nodes = roadmap_ids - base.roadmap_ids, node_tags - base.node_tags
+        rows, tag_ids, extra_tags = [base.rows], [base.tag_ids], base.extra_tags
+
+    if new_ids:
+        new_rows = roadmap_rows(list(new_ids))
+        rows.append(new_rows)
+        tag_ids.append(tag_index.rows_tag_ids(new_rows))
+
+    if new_nodes:
+        known, unknown = tag_index.known_tag_ids(new_nodes)
+        tag_ids.append(known)
+        extra_tags = extra_tags | frozenset(unknown)
+
+    return UserProfile(
+        version, roadmap_ids, node_tags,
+        _compact_ids(np.concatenate(rows) if rows else []),
+        _compact_ids(np.concatenate(tag_ids) if tag_ids else []),
+        extra_tags
+    )
+
+
+class UserProfileStore:
+    """Perfiles por user_id con expulsión LRU bajo un límite de memoria, seguro entre hilos"""
+
+    def __init__(self, max_bytes=PROFILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.rebuilds = 0
+        self.evictions = 0
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Perfil guardado del usuario (sin validar la versión), o None"""
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            if profile is not None:
+                self._profiles.move_to_end(user_id)
+            return profile
+
+    def put(self, user_id, profile):
+        """Guardar un perfil, expulsando los menos usados si se supera la memoria"""
+        if profile.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._profiles.pop(user_id, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._profiles[user_id] = profile
+            self.nbytes += profile.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._profiles.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+
+    def resolve(self, user_id, version, build, roadmap_ids=None, node_ids=None):
+        """
+        Perfil de un usuario para una petición
+
+        Args:
+            build: build_profile con el índice y la búsqueda de filas ya fijados
+            roadmap_ids / node_ids: Listas de la petición; None usa las guardadas
+
+        Returns:
+            UserProfile: El guardado si coincide, extendido si la petición solo
+                agrega roadmaps o nodos, o reconstruido
+        """
+        profile = self.get(user_id)
+        if roadmap_ids is None:
+            roadmap_ids = profile.roadmap_ids if profile is not None else frozenset()
+        else:
+            roadmap_ids = frozenset(roadmap_ids)
+        if node_ids is None:
+            node_tags = profile.node_tags if profile is not None else frozenset()
+        else:
+            node_tags = normalize_nodes(node_ids)
+
+        return self._update(user_id, profile, version, build, roadmap_ids, node_tags)
+
+    def record_completion(self, user_id, version, build, roadmap_ids=(), node_ids=()):
+        """Agregar roadmaps y/o nodos completados al perfil del usuario"""
+        profile = self.get(user_id)
+        old_ids = profile.roadmap_ids if profile is not None else frozenset()
+        old_nodes = profile.node_tags if profile is not None else frozenset()
+
+        return self._update(
+            user_id, profile, version, build,
+            old_ids | frozenset(roadmap_ids), old_nodes | normalize_nodes(node_ids)
+        )
+
+    def _update(self, user_id, profile, version, build, roadmap_ids, node_tags):
+        """Reutilizar, extender o reconstruir el perfil y guardarlo"""
+        if profile is not None and profile.version == version:
+            if profile.roadmap_ids == roadmap_ids and profile.node_tags == node_tags:
+                with self._lock:
+                    self.hits += 1
+                return profile
+
+            if profile.roadmap_ids <= roadmap_ids and profile.node_tags <= node_tags:
+                profile = build(version, roadmap_ids, node_tags, base=profile)
+                with self._lock:
+                    self.updates += 1
+                self.put(user_id, profile)
+                return profile
+
+        with self._lock:
+            if profile is None:
+                self.misses += 1
+            else:
+                self.rebuilds += 1
+        profile = build(version, roadmap_ids, node_tags)
+        self.put(user_id, profile)
+        return profile
+
+    def clear(self):
+        """Vaciar el almacén (mantiene los contadores)"""
+        with self._lock:
+            self._profiles.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Contadores del almacén"""
+        with self._lock:
+            lookups = self.hits + self.updates + self.rebuilds + self.misses
+            return {
+                'size': len(self._profiles),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'incremental_updates': self.updates,
+                'rebuilds': self.rebuilds,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }